@@ -0,0 +1,95 @@
+"""
+Agendador adaptativo guiado pelo rate limit do GitHub
+
+Substitui a pausa aleatoria fixa: as requisicoes saem assim que houver
+orcamento e o agendador so espera quando o orcamento restante chega a margem
+de seguranca, antes que o GitHub responda 403/429.
+"""
+
+import asyncio
+import threading
+import time
+from datetime import datetime
+
+# Campo incluido nas queries GraphQL quando o agendador adaptativo esta ativo
+CAMPO_RATE_LIMIT_GRAPHQL = "rateLimit { cost remaining resetAt }"
+
+
+def extrair_rate_limit_rest(response):
+    """(restante, reset_epoch, custo) a partir dos headers X-RateLimit-*"""
+    restante = response.headers.get('X-RateLimit-Remaining')
+    reset = response.headers.get('X-RateLimit-Reset')
+    if restante is None or reset is None:
+        return None
+    return int(restante), float(reset), 1
+
+
+def extrair_rate_limit_graphql(response):
+    """(restante, reset_epoch, custo) a partir do campo rateLimit da resposta"""
+    try:
+        rate_limit = response.json()['data']['rateLimit']
+        reset = datetime.fromisoformat(rate_limit['resetAt'].replace('Z', '+00:00')).timestamp()
+        return int(rate_limit['remaining']), reset, int(rate_limit['cost'])
+    except (ValueError, KeyError, TypeError):
+        # Respostas de erro nao trazem o campo; o GraphQL tambem envia os headers
+        return extrair_rate_limit_rest(response)
+
+
+class AgendadorRateLimit:
+    """Controla o ritmo das requisicoes a partir do orcamento do pool de tokens.
+
+    Enquanto algum token tiver folga acima da margem as requisicoes saem sem
+    espera; caso contrario o agendador aguarda o proximo reset. No modo fixo
+    (`adaptativo=False`) so repassa as respostas ao pool.
+    """
+
+    def __init__(self, pool_tokens, margem=50, intervalo_minimo=0.0, adaptativo=True):
+        self.pool_tokens = pool_tokens
+        self.margem = margem
+        self.intervalo_minimo = intervalo_minimo
+        self.adaptativo = adaptativo
+        self.bloqueado_ate = 0.0
+        self._ultimo_envio = 0.0
+        self._lock = threading.Lock()
+
+    def _espera_necessaria(self, agora):
+        if agora < self.bloqueado_ate:
+            return self.bloqueado_ate - agora
+
+        espera = max(0.0, self._ultimo_envio + self.intervalo_minimo - agora)
+
+        folga, proximo_reset = self.pool_tokens.melhor_folga()
+        if folga <= self.margem:
+            espera = max(espera, proximo_reset - agora + 1)
+
+        return espera
+
+    def _tentar_reservar(self):
+        with self._lock:
+            agora = time.time()
+            espera = self._espera_necessaria(agora)
+            if espera <= 0:
+                self._ultimo_envio = agora
+            return espera
+
+    def aguardar(self):
+        if not self.adaptativo:
+            return
+        while (espera := self._tentar_reservar()) > 0:
+            time.sleep(espera)
+
+    async def aguardar_async(self):
+        if not self.adaptativo:
+            return
+        while (espera := self._tentar_reservar()) > 0:
+            await asyncio.sleep(espera)
+
+    def observar(self, response):
+        """Repassa a resposta ao pool e respeita o Retry-After de limites secundarios."""
+        self.pool_tokens.registrar_resposta(response)
+
+        if response.status_code in (403, 429):
+            retry_after = response.headers.get('Retry-After')
+            if retry_after is not None:
+                with self._lock:
+                    self.bloqueado_ate = max(self.bloqueado_ate, time.time() + float(retry_after))
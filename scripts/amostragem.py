@@ -0,0 +1,145 @@
+"""
+Amostragem sequencial adaptativa: cada celula (tipo_api, usuario, consulta)
+recebe repeticoes ate o intervalo de confianca da mediana (ou da media) ficar
+estreito o bastante; o orcamento que sobra vai para as celulas mais ruidosas
+"""
+
+import bisect
+import csv
+import math
+import os
+from statistics import NormalDist
+
+
+def _quantil_t(confianca, graus):
+    """Quantil bicaudal da t de Student pela expansao de Cornish-Fisher
+    (erro < 0,5% para graus >= 5, sem depender do scipy)"""
+    z = NormalDist().inv_cdf(0.5 + confianca / 2)
+    return (z + (z**3 + z) / (4 * graus) + (5 * z**5 + 16 * z**3 + 3 * z) / (96 * graus**2))
+
+
+class EstatisticaCorrente:
+    """Media e variancia (Welford) e amostras ordenadas, atualizadas a cada valor"""
+
+    def __init__(self):
+        self.n = 0
+        self.media = 0.0
+        self._m2 = 0.0
+        self.ordenadas = []
+
+    def adicionar(self, valor):
+        self.n += 1
+        delta = valor - self.media
+        self.media += delta / self.n
+        self._m2 += delta * (valor - self.media)
+        bisect.insort(self.ordenadas, valor)
+
+    def mediana(self):
+        meio = self.n // 2
+        if self.n % 2:
+            return self.ordenadas[meio]
+        return (self.ordenadas[meio - 1] + self.ordenadas[meio]) / 2
+
+    def meia_largura_media(self, confianca):
+        if self.n < 2:
+            return math.inf
+        return _quantil_t(confianca, self.n - 1) * math.sqrt(self._m2 / (self.n - 1) / self.n)
+
+    def meia_largura_mediana(self, confianca):
+        """IC livre de distribuicao pelas estatisticas de ordem (aproximacao
+        normal da binomial): metade da distancia entre os postos j e k"""
+        if self.n < 2:
+            return math.inf
+        z = NormalDist().inv_cdf(0.5 + confianca / 2)
+        j = max(math.floor(self.n / 2 - z * math.sqrt(self.n) / 2), 1)
+        k = min(math.ceil(self.n / 2 + z * math.sqrt(self.n) / 2) + 1, self.n)
+        return (self.ordenadas[k - 1] - self.ordenadas[j - 1]) / 2
+
+
+class AmostragemSequencial:
+    """Decide a proxima celula a medir.
+
+    Cada celula recebe `minimo` tentativas; depois disso para quando a meia
+    largura do IC de `estatistica` ('mediana' ou 'media') dividida pela
+    estimativa fica abaixo de `precisao`. Enquanto houver `orcamento` (total
+    de tentativas) a proxima tentativa vai para a celula ainda aberta de
+    maior meia largura relativa, ate `maximo` tentativas por celula.
+    Tentativas com erro contam no orcamento, mas nao entram na estatistica.
+    """
+
+    def __init__(self, celulas, minimo, maximo, orcamento, precisao, estatistica='mediana', confianca=0.95):
+        if estatistica not in ('mediana', 'media'):
+            raise ValueError(f"Estatistica desconhecida: {estatistica}")
+        self.celulas = list(celulas)
+        self.minimo = minimo
+        self.maximo = maximo
+        self.orcamento = orcamento
+        self.precisao = precisao
+        self.estatistica = estatistica
+        self.confianca = confianca
+        self.tentativas = {celula: 0 for celula in self.celulas}
+        self.amostras = {celula: EstatisticaCorrente() for celula in self.celulas}
+
+    def adicionar(self, celula, tempo_ms=None):
+        """Registra uma tentativa; `tempo_ms` None para respostas com erro"""
+        self.tentativas[celula] += 1
+        if tempo_ms is not None:
+            self.amostras[celula].adicionar(tempo_ms)
+
+    def estimativa(self, celula):
+        amostras = self.amostras[celula]
+        if amostras.n == 0:
+            return None
+        return amostras.mediana() if self.estatistica == 'mediana' else amostras.media
+
+    def meia_largura(self, celula):
+        amostras = self.amostras[celula]
+        if self.estatistica == 'mediana':
+            return amostras.meia_largura_mediana(self.confianca)
+        return amostras.meia_largura_media(self.confianca)
+
+    def precisao_relativa(self, celula):
+        estimativa = self.estimativa(celula)
+        if not estimativa:
+            return math.inf
+        return self.meia_largura(celula) / estimativa
+
+    def convergiu(self, celula):
+        return self.tentativas[celula] >= self.minimo and self.precisao_relativa(celula) <= self.precisao
+
+    def usadas(self):
+        return sum(self.tentativas.values())
+
+    def proxima(self):
+        """Celula da proxima tentativa, ou None quando todas convergiram,
+        atingiram o maximo ou o orcamento acabou"""
+        if self.usadas() >= self.orcamento:
+            return None
+
+        # Fase inicial: todas as celulas ate o minimo, em rodizio (a ordem
+        # recebida desempata), para as celulas dividirem a mesma janela de tempo
+        iniciais = [celula for celula in self.celulas if self.tentativas[celula] < self.minimo]
+        if iniciais:
+            return min(iniciais, key=self.tentativas.get)
+
+        abertas = [celula for celula in self.celulas
+                   if self.tentativas[celula] < self.maximo and not self.convergiu(celula)]
+        if not abertas:
+            return None
+        return max(abertas, key=self.precisao_relativa)
+
+
+def ler_tentativas(caminho_csv):
+    """{(usuario, consulta): [tempo_ms ou None, ...]} das linhas ja gravadas,
+    para retomar a amostragem (None nas respostas com erro)"""
+    tentativas = {}
+    if not os.path.exists(caminho_csv):
+        return tentativas
+
+    with open(caminho_csv, newline='', encoding='utf-8') as f:
+        for linha in csv.DictReader(f):
+            sucesso = linha['status_code'] in ('200', '304')
+            tempo_ms = float(linha['tempo_resposta_ms']) if sucesso else None
+            tentativas.setdefault((linha['usuario'], linha['consulta']), []).append(tempo_ms)
+
+    return tentativas
@@ -2,6 +2,8 @@
 Analise Estatistica: REST vs GraphQL
 """
 
+import os
+
 import pandas as pd
 import numpy as np
 from scipy import stats
@@ -11,14 +13,117 @@ from collections import Counter
 import warnings
 warnings.filterwarnings('ignore')
 
+from histograma import PERCENTIS_CAUDA, HistogramasLatencia, caminho_histogramas
+
+METRICAS_PRINCIPAIS = ['tempo_resposta_ms', 'tamanho_resposta_kb']
+
+# 304: resposta revalidada pelo cache condicional do coletor REST (sem corpo)
+STATUS_VALIDOS = [200, 304]
+
+# Fases da latencia registradas pelos coletores (DNS, conexao, TLS, TTFB, download)
+FASES_LATENCIA = ['dns_ms', 'conexao_ms', 'tls_ms', 'ttfb_ms', 'download_ms']
+
+# Colunas que so existem em coletas mais recentes
+METRICAS_OPCIONAIS = (['tamanho_requisicao_kb', 'tamanho_fio_kb', 'tamanho_cabecalhos_kb'] + FASES_LATENCIA +
+                      ['decodificacao_ms', 'memoria_objeto_kb'])
+
+ROTULOS_METRICAS = {
+    'tempo_resposta_ms': "Tempo de Resposta (ms)",
+    'tamanho_resposta_kb': "Tamanho da Resposta (KB)",
+    'tamanho_requisicao_kb': "Tamanho da Requisicao (KB)",
+    'tamanho_fio_kb': "Tamanho no Fio (KB, comprimido)",
+    'tamanho_cabecalhos_kb': "Tamanho dos Headers (KB)",
+    'dns_ms': "Fase DNS (ms)",
+    'conexao_ms': "Fase Conexao TCP (ms)",
+    'tls_ms': "Fase TLS (ms)",
+    'ttfb_ms': "Fase TTFB (ms)",
+    'download_ms': "Fase Download (ms)",
+    'decodificacao_ms': "Decodificacao JSON no Cliente (ms)",
+    'memoria_objeto_kb': "Memoria do Objeto Decodificado (KB)",
+}
+
+# Variancia quase nula: um unico valor em pelo menos esta fracao das amostras
+# (tls_ms 0 em HTTP, dns_ms 0 com pool aquecido). Essas celulas ficam so na
+# estatistica descritiva: testes e Cohen's d sobre elas nao significam nada
+FRACAO_VALOR_DOMINANTE = 0.95
+
+# Colunas lidas do Parquet (as demais, como usuario e timestamp, nao entram na analise)
+COLUNAS_ANALISE = (['consulta', 'tipo_api', 'status_code', 'cache', 'bytes_economizados_kb', 'cota_economizada',
+                    'content_encoding', 'protocolo', 'decodificador_json'] + METRICAS_PRINCIPAIS + METRICAS_OPCIONAIS)
+
+
+def execucoes_parquet(diretorio):
+    """Execucoes (particoes execucao=...) do dataset, da mais antiga para a mais recente"""
+    return sorted(nome.split('=', 1)[1] for nome in os.listdir(diretorio) if nome.startswith('execucao='))
+
+
+def ler_metricas(caminho, tipo_api, execucao=None):
+    """Metricas de uma API: CSV inteiro, ou do dataset Parquet do coletor
+    (DIRETORIO_PARQUET) so as COLUNAS_ANALISE das particoes de `tipo_api` e
+    de `execucao` (por padrao a mais recente), filtradas antes da leitura"""
+    if not os.path.isdir(caminho):
+        return pd.read_csv(caminho)
+
+    import pyarrow.dataset as ds
+
+    execucao = execucao or execucoes_parquet(caminho)[-1]
+    dataset = ds.dataset(caminho, format='parquet', partitioning='hive')
+    colunas = [coluna for coluna in COLUNAS_ANALISE if coluna in dataset.schema.names]
+    filtro = (ds.field('tipo_api') == tipo_api) & (ds.field('execucao') == execucao)
+    df = dataset.to_table(columns=colunas, filter=filtro).to_pandas()
+    # Categoricas voltam como texto, como no CSV (groupby sem categorias vazias)
+    for coluna in df.select_dtypes('category').columns:
+        df[coluna] = df[coluna].astype(object)
+    return df
+
+
 class AnalisadorRESTvsGraphQL:
     
-    def __init__(self, arquivo_rest, arquivo_graphql):
-        self.df_rest = pd.read_csv(arquivo_rest)
-        self.df_graphql = pd.read_csv(arquivo_graphql)
+    def __init__(self, arquivo_rest, arquivo_graphql, arquivo_lotes=None, arquivo_carga=None,
+                 arquivos_histogramas=None, arquivo_tamanhos_pagina=None, execucao=None):
+        # CSVs ou o diretorio Parquet do coletor (o mesmo nos dois argumentos)
+        self.df_rest = ler_metricas(arquivo_rest, 'REST', execucao)
+        self.df_graphql = ler_metricas(arquivo_graphql, 'GraphQL', execucao)
+        # Requisicoes do modo lote do graphQL.py (uma linha por round-trip)
+        self.df_lotes = pd.read_csv(arquivo_lotes) if arquivo_lotes else None
+        # Coleta em malha aberta do coletor.py (TAXAS_CHEGADA)
+        self.df_carga = pd.read_csv(arquivo_carga, parse_dates=['timestamp']) if arquivo_carga else None
+        # Histogramas HDR (.hdr.json) de uma ou mais coletas, mesclados sem perda
+        self.histogramas = None
+        if arquivos_histogramas:
+            self.histogramas = HistogramasLatencia(None)
+            for arquivo in arquivos_histogramas:
+                self.histogramas.mesclar(HistogramasLatencia.carregar(arquivo))
+        # Varredura de tamanhos de pagina do coletor.py (TAMANHOS_PAGINA)
+        self.df_tamanhos_pagina = pd.read_csv(arquivo_tamanhos_pagina) if arquivo_tamanhos_pagina else None
         self.df_combinado = None
         self.resultados = {}
+        self.resultados_lotes = []
+        self.resultados_cache = []
+        self.resultados_fio = []
+        self.resultados_protocolo = []
+        self.resultados_carga = []
+        self.resultados_cauda = []
+        self.resultados_tamanho_pagina = []
+        self.resultados_decodificacao = []
+        self.so_descritivas = []
         self.alertas = []
+        self.metricas = METRICAS_PRINCIPAIS + self._metricas_disponiveis()
+    
+    def _metricas_disponiveis(self):
+        """Metricas opcionais presentes (e preenchidas) nos dois arquivos"""
+        metricas = []
+        for metrica in METRICAS_OPCIONAIS:
+            if metrica in self.df_rest.columns and metrica in self.df_graphql.columns:
+                if self.df_rest[metrica].notna().any() and self.df_graphql[metrica].notna().any():
+                    metricas.append(metrica)
+        return metricas
+
+    @staticmethod
+    def _variancia_quase_nula(dados):
+        if len(dados) < 2 or np.std(dados, ddof=1) == 0:
+            return True
+        return dados.value_counts(normalize=True).iloc[0] >= FRACAO_VALOR_DOMINANTE
         
     def validar_qualidade_dados(self):
         print("=" * 80)
@@ -76,11 +181,11 @@ class AnalisadorRESTvsGraphQL:
                     print(f"      {alerta}")
         
         # 3. Verificar taxa de sucesso
-        print("\n3. Verificando taxa de sucesso (status 200)...")
+        print("\n3. Verificando taxa de sucesso (status 200/304)...")
         for tipo_api in ['REST', 'GraphQL']:
             df_api = self.df_rest if tipo_api == 'REST' else self.df_graphql
             total = len(df_api)
-            sucesso = len(df_api[df_api['status_code'] == 200])
+            sucesso = len(df_api[df_api['status_code'].isin(STATUS_VALIDOS)])
             taxa = (sucesso / total * 100) if total > 0 else 0
             
             print(f"   {tipo_api}: {sucesso}/{total} ({taxa:.1f}%)")
@@ -105,13 +210,13 @@ class AnalisadorRESTvsGraphQL:
         print("1. PRÉ-PROCESSAMENTO DOS DADOS")
         print("=" * 80)
         
-        rest_valido = self.df_rest[self.df_rest['status_code'] == 200].copy()
-        graphql_valido = self.df_graphql[self.df_graphql['status_code'] == 200].copy()
+        rest_valido = self.df_rest[self.df_rest['status_code'].isin(STATUS_VALIDOS)].copy()
+        graphql_valido = self.df_graphql[self.df_graphql['status_code'].isin(STATUS_VALIDOS)].copy()
         
         print(f"\nDados REST originais: {len(self.df_rest)} registros")
-        print(f"Dados REST validos (status 200): {len(rest_valido)} registros ({len(rest_valido)/len(self.df_rest)*100:.1f}%)")
+        print(f"Dados REST validos (status 200/304): {len(rest_valido)} registros ({len(rest_valido)/len(self.df_rest)*100:.1f}%)")
         print(f"\nDados GraphQL originais: {len(self.df_graphql)} registros")
-        print(f"Dados GraphQL validos (status 200): {len(graphql_valido)} registros ({len(graphql_valido)/len(self.df_graphql)*100:.1f}%)")
+        print(f"Dados GraphQL validos (status 200/304): {len(graphql_valido)} registros ({len(graphql_valido)/len(self.df_graphql)*100:.1f}%)")
         
         self.df_combinado = pd.concat([rest_valido, graphql_valido], ignore_index=True)
         
@@ -127,7 +232,7 @@ class AnalisadorRESTvsGraphQL:
         print("=" * 80)
         
         consultas = ['C1', 'C2', 'C3']
-        metricas = ['tempo_resposta_ms', 'tamanho_resposta_kb']
+        metricas = self.metricas
         
         for consulta in consultas:
             print(f"\n{'─' * 80}")
@@ -138,8 +243,8 @@ class AnalisadorRESTvsGraphQL:
                 print(f"\n  Metrica: {metrica.replace('_', ' ').title()}")
                 print("  " + "─" * 76)
                 
-                rest_data = df_rest[df_rest['consulta'] == consulta][metrica]
-                graphql_data = df_graphql[df_graphql['consulta'] == consulta][metrica]
+                rest_data = df_rest[df_rest['consulta'] == consulta][metrica].dropna()
+                graphql_data = df_graphql[df_graphql['consulta'] == consulta][metrica].dropna()
                 
                 if len(rest_data) == 0 or len(graphql_data) == 0:
                     print(f"  ATENCAO: Dados insuficientes para {consulta} - {metrica}")
@@ -156,14 +261,21 @@ class AnalisadorRESTvsGraphQL:
                 print(f"\n  GraphQL:")
                 self._imprimir_estatisticas(stats_graphql)
                 
+                so_descritiva = self._variancia_quase_nula(rest_data) or self._variancia_quase_nula(graphql_data)
+                if so_descritiva:
+                    print(f"\n  Variancia quase nula: {metrica} fica fora dos testes e do Cohen's d")
+                
                 # Armazenar resultados
                 key = f"{consulta}_{metrica}"
                 self.resultados[key] = {
                     'rest': stats_rest,
                     'graphql': stats_graphql,
                     'rest_data': rest_data.values,
-                    'graphql_data': graphql_data.values
+                    'graphql_data': graphql_data.values,
+                    'so_descritiva': so_descritiva
                 }
+                if so_descritiva:
+                    self.so_descritivas.append(key)
     
     def _calcular_estatisticas(self, data, nome):
         """Calcula todas as estatisticas descritivas"""
@@ -216,7 +328,7 @@ class AnalisadorRESTvsGraphQL:
         print("=" * 80)
         
         consultas = ['C1', 'C2', 'C3']
-        metricas = ['tempo_resposta_ms', 'tamanho_resposta_kb']
+        metricas = self.metricas
         
         self.resultados_normalidade = {}
         
@@ -228,7 +340,7 @@ class AnalisadorRESTvsGraphQL:
             for metrica in metricas:
                 key = f"{consulta}_{metrica}"
                 
-                if key not in self.resultados:
+                if key not in self.resultados or self.resultados[key]['so_descritiva']:
                     continue
                 
                 rest_data = self.resultados[key]['rest_data']
@@ -270,7 +382,7 @@ class AnalisadorRESTvsGraphQL:
         print("H₁: μ_REST > μ_GraphQL (REST e maior - teste unilateral à direita)")
         
         consultas = ['C1', 'C2', 'C3']
-        metricas = ['tempo_resposta_ms', 'tamanho_resposta_kb']
+        metricas = self.metricas
         
         self.resultados_hipotese = {}
         
@@ -337,7 +449,7 @@ class AnalisadorRESTvsGraphQL:
         print("\nATENCAO: Cohen's d > 3 indica possivel problema nos dados!")
         
         consultas = ['C1', 'C2', 'C3']
-        metricas = ['tempo_resposta_ms', 'tamanho_resposta_kb']
+        metricas = self.metricas
         
         self.resultados_efeito = {}
         
@@ -349,7 +461,7 @@ class AnalisadorRESTvsGraphQL:
             for metrica in metricas:
                 key = f"{consulta}_{metrica}"
                 
-                if key not in self.resultados:
+                if key not in self.resultados or self.resultados[key]['so_descritiva']:
                     continue
                 
                 rest_data = self.resultados[key]['rest_data']
@@ -362,11 +474,13 @@ class AnalisadorRESTvsGraphQL:
                 
                 # Desvio padrao pooled
                 pooled_std = np.sqrt(((n1 - 1) * s1**2 + (n2 - 1) * s2**2) / (n1 + n2 - 2))
-                cohens_d = (mean1 - mean2) / pooled_std if pooled_std > 0 else float('inf')
+                cohens_d = (mean1 - mean2) / pooled_std if pooled_std > 0 else np.nan
                 
                 # Interpretacao CORRIGIDA
                 abs_d = abs(cohens_d)
-                if abs_d < 0.2:
+                if np.isnan(cohens_d):
+                    interpretacao = "INDEFINIDO (desvio padrao pooled nulo)"
+                elif abs_d < 0.2:
                     interpretacao = "PEQUENO"
                 elif abs_d < 0.5:
                     interpretacao = "MÉDIO"
@@ -472,6 +586,308 @@ class AnalisadorRESTvsGraphQL:
                 if not (consulta == 'C1' and tipo_api == 'GraphQL'):
                     print()
     
+    def analisar_cache(self):
+        """Caminho em cache (304) contra respostas completas do coletor REST"""
+        print("\n" + "=" * 80)
+        print("8. CACHE CONDICIONAL REST (ETag / If-None-Match)")
+        print("=" * 80)
+        
+        dados = self.df_rest[self.df_rest['cache'].notna()]
+        
+        for consulta in ['C1', 'C2', 'C3']:
+            dados_consulta = dados[dados['consulta'] == consulta]
+            if len(dados_consulta) == 0:
+                continue
+            
+            revalidados = dados_consulta[dados_consulta['status_code'] == 304]
+            completos = dados_consulta[dados_consulta['status_code'] == 200]
+            resultado = {
+                'consulta': consulta,
+                'taxa_revalidacao': len(revalidados) / len(dados_consulta) * 100,
+                'tempo_304_ms': revalidados['tempo_resposta_ms'].mean() if len(revalidados) else np.nan,
+                'tempo_200_ms': completos['tempo_resposta_ms'].mean() if len(completos) else np.nan,
+                'kb_economizados': dados_consulta['bytes_economizados_kb'].sum(),
+                'cota_economizada': int(dados_consulta['cota_economizada'].sum())
+            }
+            self.resultados_cache.append(resultado)
+            
+            print(f"\n{consulta}:")
+            print(f"  Respostas 304: {len(revalidados)}/{len(dados_consulta)} ({resultado['taxa_revalidacao']:.1f}%)")
+            print(f"  Tempo medio 304: {resultado['tempo_304_ms']:.2f} ms | 200: {resultado['tempo_200_ms']:.2f} ms")
+            print(f"  Economia: {resultado['kb_economizados']:.2f} KB e {resultado['cota_economizada']} requisicoes de rate limit")
+    
+    def analisar_tamanho_fio(self):
+        """RQ2 medida de tres formas: corpo decodificado, corpo no fio e fio + headers"""
+        print("\n" + "=" * 80)
+        print("9. TAMANHO DECODIFICADO vs TAMANHO NO FIO")
+        print("=" * 80)
+        
+        df = self.df_combinado[self.df_combinado['tamanho_fio_kb'].notna()].copy()
+        df['total_fio_kb'] = df['tamanho_fio_kb'] + df['tamanho_cabecalhos_kb']
+        medidas = [('tamanho_resposta_kb', 'Decodificado'), ('tamanho_fio_kb', 'No fio'), ('total_fio_kb', 'Fio + headers')]
+        
+        for tipo_api in ['REST', 'GraphQL']:
+            codificacoes = df[df['tipo_api'] == tipo_api]['content_encoding'].value_counts()
+            print(f"\n{tipo_api} Content-Encoding: {', '.join(f'{nome}={int(n)}' for nome, n in codificacoes.items())}")
+        
+        for consulta in ['C1', 'C2', 'C3']:
+            dados = df[df['consulta'] == consulta]
+            if dados['tipo_api'].nunique() < 2:
+                continue
+            
+            print(f"\n{consulta}:")
+            resultado = {'consulta': consulta}
+            for coluna, rotulo in medidas:
+                medias = dados.groupby('tipo_api')[coluna].mean()
+                menor = medias.idxmin()
+                resultado[coluna] = menor
+                print(f"  {rotulo:<14} REST={medias['REST']:.2f} KB | GraphQL={medias['GraphQL']:.2f} KB -> menor: {menor}")
+            self.resultados_fio.append(resultado)
+    
+    def analisar_por_protocolo(self):
+        """Tempo de resposta de cada API separado pela versao HTTP usada"""
+        print("\n" + "=" * 80)
+        print("10. RESULTADOS POR PROTOCOLO HTTP")
+        print("=" * 80)
+        
+        df = self.df_combinado[self.df_combinado['protocolo'].notna()]
+        
+        for consulta in ['C1', 'C2', 'C3']:
+            dados = df[df['consulta'] == consulta]
+            if len(dados) == 0:
+                continue
+            
+            print(f"\n{consulta}:")
+            for (tipo_api, protocolo), grupo in dados.groupby(['tipo_api', 'protocolo']):
+                tempo = grupo['tempo_resposta_ms']
+                resultado = {
+                    'consulta': consulta,
+                    'tipo_api': tipo_api,
+                    'protocolo': protocolo,
+                    'n': len(grupo),
+                    'media': tempo.mean(),
+                    'mediana': tempo.median()
+                }
+                self.resultados_protocolo.append(resultado)
+                print(f"  {tipo_api:<8} {protocolo:<9} N={len(grupo):<5} media={tempo.mean():.2f} ms | mediana={tempo.median():.2f} ms")
+    
+    def analisar_carga_aberta(self):
+        """Latencia sob carga em malha aberta: tempo corrigido (desde o envio
+        previsto) contra o tempo de servico, que esconde a fila"""
+        print("\n" + "=" * 80)
+        print("11. CARGA EM MALHA ABERTA (capacidade)")
+        print("=" * 80)
+        
+        print(f"\n  {'API':<8} {'Alvo':>6} {'Obtida':>7} {'Erros':>6} {'Atraso envio':>13} "
+              f"{'p50':>9} {'p90':>9} {'p99':>9} {'p99 servico':>12}")
+        print("  " + "-" * 86)
+        
+        for (tipo_api, taxa), grupo in self.df_carga.groupby(['tipo_api', 'taxa_alvo']):
+            # Linhas sem status (timeouts, conexoes recusadas) contam como erro
+            validos = grupo[grupo['status_code'].isin(STATUS_VALIDOS)]
+            if len(validos) == 0:
+                print(f"  {tipo_api:<8} {taxa:>6} {0:>7.2f} {100:>5.1f}%  (nenhuma resposta valida)")
+                continue
+            
+            # Vazao da API dentro da janela da taxa (as duas APIs dividem a taxa alvo)
+            janela = self.df_carga[self.df_carga['taxa_alvo'] == taxa]
+            duracao = (janela['timestamp'].max() - janela['timestamp'].min()).total_seconds()
+            corrigido = np.percentile(validos['tempo_resposta_ms'], [50, 90, 99])
+            resultado = {
+                'tipo_api': tipo_api,
+                'taxa_alvo': taxa,
+                'vazao': len(validos) / duracao if duracao > 0 else np.nan,
+                'erros': (1 - len(validos) / len(grupo)) * 100,
+                'atraso_envio_ms': validos['atraso_envio_ms'].mean(),
+                'p50': corrigido[0],
+                'p90': corrigido[1],
+                'p99': corrigido[2],
+                'p99_servico': np.percentile(validos['tempo_servico_ms'], 99)
+            }
+            self.resultados_carga.append(resultado)
+            
+            print(f"  {tipo_api:<8} {taxa:>6} {resultado['vazao']:>7.2f} {resultado['erros']:>5.1f}% "
+                  f"{resultado['atraso_envio_ms']:>10.2f} ms {resultado['p50']:>9.2f} {resultado['p90']:>9.2f} "
+                  f"{resultado['p99']:>9.2f} {resultado['p99_servico']:>12.2f}")
+        
+        print("\n  Taxas em req/s (alvo: total das duas APIs); percentis em ms a partir do envio previsto")
+    
+    def analisar_cauda_latencia(self):
+        """Percentis de cauda a partir dos histogramas HDR (todas as amostras de
+        todas as coletas, nao so as linhas dos CSVs lidos)"""
+        print("\n" + "=" * 80)
+        print("12. CAUDA DA LATENCIA (histogramas HDR)")
+        print("=" * 80)
+        
+        rotulos = [f"p{p:g}" for p in PERCENTIS_CAUDA] + ['max']
+        print(f"\n  {'':<12} {'N':>7} " + " ".join(f"{rotulo:>10}" for rotulo in rotulos))
+        print("  " + "-" * 76)
+        
+        for consulta in ['C1', 'C2', 'C3']:
+            for tipo_api in ['REST', 'GraphQL']:
+                histograma = self.histogramas.agrupar(tipo_api, consulta)
+                if histograma.total == 0:
+                    continue
+                
+                valores = [histograma.percentil(p) for p in PERCENTIS_CAUDA] + [histograma.maximo / 1000]
+                self.resultados_cauda.append({
+                    'consulta': consulta,
+                    'tipo_api': tipo_api,
+                    'n': histograma.total,
+                    'percentis': dict(zip(rotulos, valores))
+                })
+                print(f"  {consulta + ' ' + tipo_api:<12} {histograma.total:>7} " +
+                      " ".join(f"{valor:>10.2f}" for valor in valores))
+        
+        print("\n  Valores em ms (erro relativo <= 0,1%)")
+    
+    def analisar_decodificacao(self):
+        """Quanto do tempo fim a fim (rede + parsing) e decodificacao do JSON
+        no cliente, e quanta memoria o documento ocupa depois de decodificado"""
+        print("\n" + "=" * 80)
+        print("14. DECODIFICACAO JSON NO CLIENTE")
+        print("=" * 80)
+        
+        df = self.df_combinado[self.df_combinado['decodificacao_ms'].notna()]
+        print(f"\n  {'':<12} {'JSON':<7} {'N':>6} {'Rede (ms)':>10} {'Parse (ms)':>11} {'% fim a fim':>12} "
+              f"{'Corpo (KB)':>11} {'Objeto (KB)':>12}")
+        print("  " + "-" * 86)
+        
+        for (consulta, tipo_api, decodificador), grupo in df.groupby(['consulta', 'tipo_api', 'decodificador_json']):
+            rede = grupo['tempo_resposta_ms'].mean()
+            decodificacao = grupo['decodificacao_ms'].mean()
+            resultado = {
+                'consulta': consulta,
+                'tipo_api': tipo_api,
+                'decodificador': decodificador,
+                'n': len(grupo),
+                'rede_ms': rede,
+                'decodificacao_ms': decodificacao,
+                'fracao': decodificacao / (rede + decodificacao) * 100,
+                'corpo_kb': grupo['tamanho_resposta_kb'].mean(),
+                'objeto_kb': grupo['memoria_objeto_kb'].mean()
+            }
+            self.resultados_decodificacao.append(resultado)
+            print(f"  {consulta + ' ' + tipo_api:<12} {decodificador:<7} {len(grupo):>6} {rede:>10.2f} "
+                  f"{decodificacao:>11.3f} {resultado['fracao']:>11.2f}% {resultado['corpo_kb']:>11.2f} "
+                  f"{resultado['objeto_kb']:>12.2f}")
+        
+        print("\n  Parse medido fora do tempo de resposta; % fim a fim = parse / (rede + parse)")
+    
+    @staticmethod
+    def _ajustar_reta(itens, valores):
+        regressao = stats.linregress(itens, valores)
+        return {'intercepto': regressao.intercept, 'inclinacao': regressao.slope, 'r2': regressao.rvalue ** 2}
+    
+    @staticmethod
+    def _ponto_equilibrio(rest, graphql):
+        """Itens a partir dos quais a API de menor custo por item passa a
+        vencer; None se as retas nao se cruzam com itens > 0"""
+        if rest['inclinacao'] == graphql['inclinacao']:
+            return None, None
+        itens = (graphql['intercepto'] - rest['intercepto']) / (rest['inclinacao'] - graphql['inclinacao'])
+        if itens <= 0:
+            return None, None
+        return itens, 'GraphQL' if graphql['inclinacao'] < rest['inclinacao'] else 'REST'
+    
+    def analisar_tamanho_pagina(self):
+        """Latencia e bytes em funcao dos itens devolvidos (first/per_page):
+        custo fixo (intercepto), custo por item (inclinacao) e o ponto de
+        equilibrio entre as APIs"""
+        print("\n" + "=" * 80)
+        print("13. TAMANHO DE PAGINA (latencia e bytes por item)")
+        print("=" * 80)
+        
+        dados = self.df_tamanhos_pagina[self.df_tamanhos_pagina['status_code'].isin(STATUS_VALIDOS)]
+        
+        for consulta in sorted(dados['consulta'].unique()):
+            da_consulta = dados[dados['consulta'] == consulta]
+            print(f"\n{consulta}:")
+            print(f"  {'Pagina':>7} " + " ".join(f"{api + ' itens':>14} {api + ' ms':>12} {api + ' KB':>12}"
+                                                 for api in ['REST', 'GraphQL']))
+            for tamanho_pagina, grupo in da_consulta.groupby('tamanho_pagina'):
+                colunas = []
+                for tipo_api in ['REST', 'GraphQL']:
+                    da_api = grupo[grupo['tipo_api'] == tipo_api]
+                    colunas.append(f"{da_api['itens'].mean():>14.1f} {da_api['tempo_resposta_ms'].median():>12.2f} "
+                                   f"{da_api['tamanho_resposta_kb'].median():>12.2f}")
+                print(f"  {tamanho_pagina:>7} " + " ".join(colunas))
+            
+            ajustes = {}
+            for tipo_api in ['REST', 'GraphQL']:
+                da_api = da_consulta[da_consulta['tipo_api'] == tipo_api]
+                if da_api['itens'].nunique() < 2:
+                    continue
+                ajustes[tipo_api] = {
+                    'tempo': self._ajustar_reta(da_api['itens'], da_api['tempo_resposta_ms']),
+                    'bytes': self._ajustar_reta(da_api['itens'], da_api['tamanho_resposta_kb'] * 1024)
+                }
+                tempo, tamanho = ajustes[tipo_api]['tempo'], ajustes[tipo_api]['bytes']
+                print(f"  {tipo_api:<8} tempo = {tempo['intercepto']:.2f} ms + {tempo['inclinacao']:.3f} ms/item "
+                      f"(R2={tempo['r2']:.2f}) | bytes = {tamanho['intercepto']:.0f} B + "
+                      f"{tamanho['inclinacao']:.0f} B/item (R2={tamanho['r2']:.2f})")
+            
+            if len(ajustes) < 2:
+                print("  Dados insuficientes para comparar (menos de 2 tamanhos por API)")
+                continue
+            
+            resultado = {'consulta': consulta, 'ajustes': ajustes, 'max_itens': da_consulta['itens'].max()}
+            for metrica, unidade in [('tempo', 'latencia'), ('bytes', 'bytes')]:
+                itens, vencedora = self._ponto_equilibrio(ajustes['REST'][metrica], ajustes['GraphQL'][metrica])
+                resultado[f'equilibrio_{metrica}'] = (itens, vencedora)
+                if itens is None:
+                    melhor = min(ajustes, key=lambda api: ajustes[api][metrica]['intercepto'] + ajustes[api][metrica]['inclinacao'])
+                    print(f"  Equilibrio de {unidade}: as retas nao se cruzam; {melhor} vence em toda a faixa")
+                else:
+                    faixa = "dentro" if itens <= resultado['max_itens'] else "fora"
+                    print(f"  Equilibrio de {unidade}: ~{itens:.1f} itens ({faixa} da faixa medida); "
+                          f"acima disso vence {vencedora}")
+            self.resultados_tamanho_pagina.append(resultado)
+        
+        print("\n  Ajuste linear sobre os itens efetivamente devolvidos (mediana por tamanho na tabela)")
+    
+    def analisar_lotes(self):
+        """Latencia por item e vazao de cada tamanho de lote GraphQL contra
+        N chamadas REST sequenciais"""
+        print("\n" + "=" * 80)
+        print("7. LOTES GraphQL vs CHAMADAS REST")
+        print("=" * 80)
+        
+        lotes = self.df_lotes[self.df_lotes['status_code'] == 200]
+        rest = self.df_rest[self.df_rest['status_code'].isin(STATUS_VALIDOS)]['tempo_resposta_ms']
+        
+        if len(lotes) == 0 or len(rest) == 0:
+            print("\n  Dados insuficientes")
+            return
+        
+        tempo_rest = rest.mean()
+        print(f"\nREST: {tempo_rest:.2f} ms por chamada | {1000 / tempo_rest:.2f} consultas/s (sequencial)")
+        print(f"\n  {'Lote':>5} {'Req.':>6} {'Round-trip (ms)':>16} {'Por item (ms)':>14} {'Itens/s':>9} {'N x REST (ms)':>14} {'Ganho':>7}")
+        print("  " + "-" * 76)
+        
+        for tamanho_lote, grupo in lotes.groupby('tamanho_lote'):
+            itens_por_requisicao = grupo['itens'].mean()
+            round_trip = grupo['tempo_resposta_ms'].mean()
+            por_item = grupo['tempo_por_item_ms'].mean()
+            vazao = grupo['itens'].sum() / grupo['tempo_resposta_ms'].sum() * 1000
+            tempo_n_rest = itens_por_requisicao * tempo_rest
+            
+            resultado = {
+                'tamanho_lote': tamanho_lote,
+                'requisicoes': len(grupo),
+                'round_trip_ms': round_trip,
+                'por_item_ms': por_item,
+                'vazao': vazao,
+                'n_rest_ms': tempo_n_rest,
+                'ganho': tempo_n_rest / round_trip
+            }
+            self.resultados_lotes.append(resultado)
+            
+            print(f"  {tamanho_lote:>5} {len(grupo):>6} {round_trip:>16.2f} {por_item:>14.2f} {vazao:>9.2f} "
+                  f"{tempo_n_rest:>14.2f} {resultado['ganho']:>6.2f}x")
+        
+        print("\n  Ganho: tempo de N chamadas REST sequenciais / round-trip do lote com N consultas")
+    
     def gerar_relatorio_honesto(self):
         print("\n" + "=" * 80)
         print("6. GERANDO RELATÓRIO COMPLETO E HONESTO")
@@ -523,13 +939,13 @@ class AnalisadorRESTvsGraphQL:
             relatorio.append(f"CONSULTA {consulta}")
             relatorio.append("-" * 80)
             
-            for metrica in ['tempo_resposta_ms', 'tamanho_resposta_kb']:
+            for metrica in self.metricas:
                 key = f"{consulta}_{metrica}"
                 
                 if key not in self.resultados_hipotese:
                     continue
                 
-                metrica_label = "Tempo de Resposta (ms)" if metrica == "tempo_resposta_ms" else "Tamanho da Resposta (KB)"
+                metrica_label = ROTULOS_METRICAS[metrica]
                 relatorio.append(f"\n{metrica_label}:")
                 
                 # Medias e valores unicos
@@ -556,6 +972,102 @@ class AnalisadorRESTvsGraphQL:
                     
                     if efeito['alerta_extremo']:
                         relatorio.append(f"  ALERTA: Cohen's d extremo - possivel comparacao injusta!")
+
+        if self.so_descritivas:
+            relatorio.append("")
+            relatorio.append("")
+            relatorio.append("METRICAS SO DESCRITIVAS (variancia quase nula, fora dos testes)")
+            relatorio.append("-" * 80)
+            for key in self.so_descritivas:
+                consulta, metrica = key.split('_', 1)
+                resultado = self.resultados[key]
+                relatorio.append(f"  {consulta} {ROTULOS_METRICAS[metrica]}: media REST {resultado['rest']['media']:.2f} "
+                                 f"| media GraphQL {resultado['graphql']['media']:.2f}")
+
+        if self.resultados_lotes:
+            relatorio.append("")
+            relatorio.append("")
+            relatorio.append("LOTES GraphQL vs CHAMADAS REST")
+            relatorio.append("-" * 80)
+            for resultado in self.resultados_lotes:
+                relatorio.append(f"Lote {resultado['tamanho_lote']}: {resultado['round_trip_ms']:.2f} ms por requisicao, "
+                                 f"{resultado['por_item_ms']:.2f} ms por item, {resultado['vazao']:.2f} itens/s, "
+                                 f"{resultado['ganho']:.2f}x mais rapido que N chamadas REST")
+        
+        if self.resultados_cache:
+            relatorio.append("")
+            relatorio.append("")
+            relatorio.append("CACHE CONDICIONAL REST")
+            relatorio.append("-" * 80)
+            for resultado in self.resultados_cache:
+                relatorio.append(f"{resultado['consulta']}: {resultado['taxa_revalidacao']:.1f}% respostas 304, "
+                                 f"{resultado['tempo_304_ms']:.2f} ms (304) vs {resultado['tempo_200_ms']:.2f} ms (200), "
+                                 f"{resultado['kb_economizados']:.2f} KB e {resultado['cota_economizada']} de cota economizados")
+        
+        if self.resultados_fio:
+            relatorio.append("")
+            relatorio.append("")
+            relatorio.append("RQ2 POR FORMA DE MEDIR O TAMANHO (API com menor media)")
+            relatorio.append("-" * 80)
+            for resultado in self.resultados_fio:
+                relatorio.append(f"{resultado['consulta']}: decodificado={resultado['tamanho_resposta_kb']}, "
+                                 f"no fio={resultado['tamanho_fio_kb']}, fio + headers={resultado['total_fio_kb']}")
+        
+        if self.resultados_protocolo:
+            relatorio.append("")
+            relatorio.append("")
+            relatorio.append("TEMPO DE RESPOSTA POR PROTOCOLO HTTP")
+            relatorio.append("-" * 80)
+            for resultado in self.resultados_protocolo:
+                relatorio.append(f"{resultado['consulta']} {resultado['tipo_api']} {resultado['protocolo']}: "
+                                 f"N={resultado['n']}, media={resultado['media']:.2f} ms, mediana={resultado['mediana']:.2f} ms")
+        
+        if self.resultados_carga:
+            relatorio.append("")
+            relatorio.append("")
+            relatorio.append("CARGA EM MALHA ABERTA (latencia desde o envio previsto)")
+            relatorio.append("-" * 80)
+            for resultado in self.resultados_carga:
+                relatorio.append(f"{resultado['tipo_api']} a {resultado['taxa_alvo']} req/s: vazao={resultado['vazao']:.2f} req/s, "
+                                 f"erros={resultado['erros']:.1f}%, p50={resultado['p50']:.2f} ms, "
+                                 f"p99={resultado['p99']:.2f} ms (servico: {resultado['p99_servico']:.2f} ms)")
+        
+        if self.resultados_cauda:
+            relatorio.append("")
+            relatorio.append("")
+            relatorio.append("CAUDA DA LATENCIA (histogramas HDR, ms)")
+            relatorio.append("-" * 80)
+            for resultado in self.resultados_cauda:
+                percentis = ", ".join(f"{rotulo}={valor:.2f}" for rotulo, valor in resultado['percentis'].items())
+                relatorio.append(f"{resultado['consulta']} {resultado['tipo_api']} (N={resultado['n']}): {percentis}")
+        
+        if self.resultados_tamanho_pagina:
+            relatorio.append("")
+            relatorio.append("")
+            relatorio.append("TAMANHO DE PAGINA (custo fixo + custo por item)")
+            relatorio.append("-" * 80)
+            for resultado in self.resultados_tamanho_pagina:
+                for tipo_api, ajuste in resultado['ajustes'].items():
+                    relatorio.append(f"{resultado['consulta']} {tipo_api}: {ajuste['tempo']['intercepto']:.2f} ms + "
+                                     f"{ajuste['tempo']['inclinacao']:.3f} ms/item, {ajuste['bytes']['intercepto']:.0f} B + "
+                                     f"{ajuste['bytes']['inclinacao']:.0f} B/item")
+                for metrica, unidade in [('tempo', 'latencia'), ('bytes', 'bytes')]:
+                    itens, vencedora = resultado[f'equilibrio_{metrica}']
+                    if itens is None:
+                        relatorio.append(f"{resultado['consulta']} equilibrio de {unidade}: sem cruzamento")
+                    else:
+                        relatorio.append(f"{resultado['consulta']} equilibrio de {unidade}: ~{itens:.1f} itens "
+                                         f"(acima vence {vencedora})")
+        
+        if self.resultados_decodificacao:
+            relatorio.append("")
+            relatorio.append("")
+            relatorio.append("DECODIFICACAO JSON NO CLIENTE")
+            relatorio.append("-" * 80)
+            for resultado in self.resultados_decodificacao:
+                relatorio.append(f"{resultado['consulta']} {resultado['tipo_api']} ({resultado['decodificador']}): "
+                                 f"parse={resultado['decodificacao_ms']:.3f} ms ({resultado['fracao']:.2f}% do fim a fim), "
+                                 f"objeto={resultado['objeto_kb']:.2f} KB para {resultado['corpo_kb']:.2f} KB de corpo")
         
         # LIMITAÇÕES (NOVO!)
         relatorio.append("")
@@ -639,6 +1151,30 @@ class AnalisadorRESTvsGraphQL:
         
         self.analisar_correlacao()
         
+        if self.df_lotes is not None:
+            self.analisar_lotes()
+        
+        if 'cache' in self.df_rest.columns and self.df_rest['cache'].notna().any():
+            self.analisar_cache()
+        
+        if 'tamanho_fio_kb' in self.metricas:
+            self.analisar_tamanho_fio()
+        
+        if 'protocolo' in self.df_combinado.columns and self.df_combinado['protocolo'].notna().any():
+            self.analisar_por_protocolo()
+        
+        if self.df_carga is not None:
+            self.analisar_carga_aberta()
+        
+        if self.histogramas is not None:
+            self.analisar_cauda_latencia()
+        
+        if self.df_tamanhos_pagina is not None:
+            self.analisar_tamanho_pagina()
+        
+        if 'decodificacao_ms' in self.metricas:
+            self.analisar_decodificacao()
+        
         self.gerar_relatorio_honesto()
         
         print("\n" + "=" * 80)
@@ -659,6 +1195,12 @@ def main():
     arquivo_rest = '../dados/metricas_rest.csv'
     arquivo_graphql = '../dados/metricas_graphql.csv'
     
+    # Coleta gravada em Parquet (coletor.DIRETORIO_PARQUET): lida no lugar dos CSVs
+    diretorio_parquet = '../dados/metricas_parquet'
+    if os.path.isdir(diretorio_parquet) and execucoes_parquet(diretorio_parquet):
+        print(f"Parquet: {diretorio_parquet} (execucao {execucoes_parquet(diretorio_parquet)[-1]})")
+        arquivo_rest = arquivo_graphql = diretorio_parquet
+    
     if not os.path.exists(arquivo_rest) or not os.path.exists(arquivo_graphql):
         print("ERRO: Arquivos CSV nao encontrados!")
         print(f"Procurando: {arquivo_rest} e {arquivo_graphql}")
@@ -668,7 +1210,34 @@ def main():
     print(f"   REST: {arquivo_rest}")
     print(f"   GraphQL: {arquivo_graphql}")
     
-    analisador = AnalisadorRESTvsGraphQL(arquivo_rest, arquivo_graphql)
+    arquivo_lotes = '../dados/metricas_graphql_lote_requisicoes.csv'
+    if os.path.exists(arquivo_lotes):
+        print(f"   Lotes GraphQL: {arquivo_lotes}")
+    else:
+        arquivo_lotes = None
+    
+    arquivo_carga = '../dados/metricas_carga_aberta.csv'
+    if os.path.exists(arquivo_carga):
+        print(f"   Carga em malha aberta: {arquivo_carga}")
+    else:
+        arquivo_carga = None
+    
+    arquivo_tamanhos_pagina = '../dados/metricas_tamanho_pagina.csv'
+    if os.path.exists(arquivo_tamanhos_pagina):
+        print(f"   Tamanhos de pagina: {arquivo_tamanhos_pagina}")
+    else:
+        arquivo_tamanhos_pagina = None
+    
+    # Histogramas das coletas atuais mais os de outras coletas passados na
+    # linha de comando (p.ex. python analise_estatistica.py antiga/metricas_rest.hdr.json)
+    arquivos_histogramas = [caminho_histogramas(arquivo)
+                            for arquivo in ('../dados/metricas_rest.csv', '../dados/metricas_graphql.csv')]
+    arquivos_histogramas = [arquivo for arquivo in arquivos_histogramas if os.path.exists(arquivo)] + sys.argv[1:]
+    for arquivo in arquivos_histogramas:
+        print(f"   Histogramas: {arquivo}")
+    
+    analisador = AnalisadorRESTvsGraphQL(arquivo_rest, arquivo_graphql, arquivo_lotes, arquivo_carga,
+                                         arquivos_histogramas, arquivo_tamanhos_pagina)
     
     analisador.executar_analise_completa()
 
@@ -0,0 +1,114 @@
+"""
+Cache em disco para requisicoes condicionais (ETag / Last-Modified)
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import threading
+
+
+class CacheCondicional:
+    """Guarda, por URL, os validadores e o corpo da ultima resposta 200.
+
+    `cabecalhos(url)` devolve If-None-Match / If-Modified-Since para a proxima
+    requisicao; numa resposta 304 o corpo salvo continua valido e `corpo(url)`
+    o devolve. Cada corpo fica num arquivo proprio (`<caminho>.corpos/<sha1>`,
+    pelo conteudo, escrito uma vez); o JSON em `caminho` e so o indice de
+    validadores, regravado de forma atomica a cada `salvar_a_cada` respostas
+    novas e na saida do processo.
+    """
+
+    def __init__(self, caminho, salvar_a_cada=50):
+        self.caminho = caminho
+        self.diretorio_corpos = f"{caminho}.corpos"
+        self.salvar_a_cada = salvar_a_cada
+        self.entradas = {}
+        self._pendentes = 0
+        self._lock = threading.Lock()
+        self._lock_arquivo = threading.Lock()
+
+        if os.path.exists(caminho):
+            with open(caminho, encoding='utf-8') as f:
+                # Entradas do formato antigo (corpo dentro do indice) sao ignoradas
+                self.entradas = {url: entrada for url, entrada in json.load(f).items() if 'sha1' in entrada}
+        atexit.register(self.salvar)
+
+    def cabecalhos(self, url):
+        with self._lock:
+            entrada = self.entradas.get(url)
+        if entrada is None:
+            return {}
+
+        headers = {}
+        if entrada['etag']:
+            headers['If-None-Match'] = entrada['etag']
+        if entrada['last_modified']:
+            headers['If-Modified-Since'] = entrada['last_modified']
+        return headers
+
+    def tamanho(self, url):
+        """Bytes do corpo salvo (o que uma resposta 304 deixou de trafegar)"""
+        with self._lock:
+            entrada = self.entradas.get(url)
+        return entrada['tamanho'] if entrada else 0
+
+    def corpo(self, url):
+        """Corpo salvo, ou None se a URL nao esta no cache (ou o arquivo sumiu)"""
+        with self._lock:
+            entrada = self.entradas.get(url)
+        if entrada is None:
+            return None
+        try:
+            with open(os.path.join(self.diretorio_corpos, entrada['sha1']), encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def descartar(self, url):
+        with self._lock:
+            if self.entradas.pop(url, None) is not None:
+                self._pendentes += 1
+
+    def atualizar(self, url, response):
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if response.status_code != 200 or not (etag or last_modified):
+            return
+
+        # O corpo vai para o disco antes do indice apontar para ele
+        sha1 = hashlib.sha1(response.content).hexdigest()
+        arquivo = os.path.join(self.diretorio_corpos, sha1)
+        if not os.path.exists(arquivo):
+            os.makedirs(self.diretorio_corpos, exist_ok=True)
+            temporario = f"{arquivo}.{threading.get_ident()}.tmp"
+            with open(temporario, 'w', encoding='utf-8') as f:
+                f.write(response.text)
+            os.replace(temporario, arquivo)
+
+        with self._lock:
+            self.entradas[url] = {'etag': etag, 'last_modified': last_modified, 'sha1': sha1,
+                                  'tamanho': len(response.text.encode('utf-8'))}
+            self._pendentes += 1
+            salvar = self._pendentes >= self.salvar_a_cada
+        if salvar:
+            self.salvar()
+
+    def salvar(self):
+        # O retrato do indice e tirado ja com o arquivo reservado: duas
+        # gravacoes seguidas nunca terminam com a mais antiga no disco
+        with self._lock_arquivo:
+            with self._lock:
+                if not self._pendentes:
+                    return
+                indice = json.dumps(self.entradas)
+                self._pendentes = 0
+
+            temporario = f"{self.caminho}.tmp"
+            os.makedirs(os.path.dirname(os.path.abspath(self.caminho)), exist_ok=True)
+            with open(temporario, 'w', encoding='utf-8') as f:
+                f.write(indice)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporario, self.caminho)
@@ -0,0 +1,106 @@
+"""
+Gerador de carga em malha aberta (taxa de chegada constante ou Poisson)
+
+Na coleta normal (malha fechada) a proxima requisicao so sai depois da
+resposta anterior, entao respostas lentas reduzem a taxa de envio e o tempo
+de fila nunca aparece no tempo medido (coordinated omission). Aqui os envios
+seguem um cronograma fixo, independente das respostas, e a latencia e medida
+a partir do instante previsto de envio.
+"""
+
+import asyncio
+import random
+import time
+
+from transporte import criar_cliente_async, medir_fases, ms_desde
+
+DISTRIBUICOES_CHEGADA = ('fixa', 'poisson')
+
+
+def instantes_chegada(taxa, duracao, distribuicao='poisson', rng=random):
+    """Instantes previstos de envio (segundos desde o inicio) para `taxa` req/s"""
+    if distribuicao not in DISTRIBUICOES_CHEGADA:
+        raise ValueError(f"Distribuicao invalida: {distribuicao} (use {' ou '.join(DISTRIBUICOES_CHEGADA)})")
+
+    instantes = []
+    instante = 0.0 if distribuicao == 'fixa' else rng.expovariate(taxa)
+    while instante < duracao:
+        instantes.append(instante)
+        instante += 1 / taxa if distribuicao == 'fixa' else rng.expovariate(taxa)
+    return instantes
+
+
+async def _disparar(client, consulta, inicio, instante, executar, registrar, limite, agendador):
+    previsto = inicio + round(instante * 1e9)
+    # O tempo esperando uma vaga (max_em_voo) conta como fila: a latencia
+    # corrigida parte do instante previsto, nao do envio real
+    async with limite:
+        response = erro = None
+        with medir_fases() as rastreador:
+            envio = time.perf_counter_ns()
+            try:
+                response = await executar(client, *consulta)
+            except Exception as e:
+                # Falhas (timeouts sob sobrecarga) viram linhas de erro: descarta-las
+                # tiraria do dataset justamente as requisicoes mais lentas
+                erro = e
+            fim = time.perf_counter_ns()
+
+        if agendador is not None and response is not None:
+            agendador.observar(response)
+        registrar(consulta, {
+            'instante_previsto_s': instante,
+            'atraso_envio_ms': (envio - previsto) / 1e6,
+            'tempo_servico_ms': (fim - envio) / 1e6,
+            'tempo_resposta_ms': (fim - previsto) / 1e6,
+            'erro': None if erro is None else f"{type(erro).__name__}: {erro}"
+        }, response, rastreador.resultado())
+
+
+async def _executar_carga(consultas, instantes, executar, registrar, max_em_voo, opcoes_cliente, obter_agendador):
+    limite = asyncio.Semaphore(max_em_voo)
+    tarefas = set()
+
+    async with criar_cliente_async(**opcoes_cliente) as client:
+        inicio = time.perf_counter_ns()
+        for i, instante in enumerate(instantes):
+            espera = instante - ms_desde(inicio) / 1000
+            if espera > 0:
+                await asyncio.sleep(espera)
+
+            consulta = consultas[i % len(consultas)]
+            tarefa = asyncio.create_task(
+                _disparar(client, consulta, inicio, instante, executar, registrar, limite, obter_agendador(consulta))
+            )
+            tarefas.add(tarefa)
+            tarefa.add_done_callback(tarefas.discard)
+
+        await asyncio.gather(*tarefas)
+
+
+def executar_carga_aberta(consultas, instantes, executar, registrar, max_em_voo=200, timeout=30,
+                          modo_conexao='warm', tamanho_pool=100, keepalive_expiry=30, agendador=None,
+                          compressao=None, protocolo='http1', cassete=None):
+    """Envia `consultas[i % len(consultas)]` no instante `instantes[i]`.
+
+    `executar(client, *consulta)` devolve a resposta de uma unica tentativa
+    (retries entrariam no tempo de servico); `registrar(consulta, medidas,
+    response, fases)` recebe instante_previsto_s, atraso_envio_ms,
+    tempo_servico_ms, tempo_resposta_ms (a partir do instante previsto) e
+    erro; em falhas, `response` e None e os tempos vao ate a falha. O
+    agendador so observa as respostas: em malha aberta o ritmo e o
+    cronograma, nunca o rate limit.
+    """
+    opcoes_cliente = {
+        'modo': modo_conexao,
+        # O pool nunca pode ser o limite de concorrencia: a espera por uma
+        # conexao livre ficaria dentro de tempo_servico_ms, escondendo a fila
+        'tamanho_pool': max(tamanho_pool, max_em_voo),
+        'keepalive_expiry': keepalive_expiry,
+        'timeout': timeout,
+        'compressao': compressao,
+        'protocolo': protocolo,
+        'cassete': cassete
+    }
+    obter_agendador = agendador if callable(agendador) else (lambda consulta: agendador)
+    asyncio.run(_executar_carga(consultas, instantes, executar, registrar, max_em_voo, opcoes_cliente, obter_agendador))
@@ -0,0 +1,341 @@
+"""
+Cassete de requisicoes: grava cada par requisicao/resposta dos coletores num
+arquivo so de anexacao, com indice, e serve as respostas de volta sem rede,
+para repetir coletas, parsers e analises de forma deterministica
+
+Formato: registros [tamanho_meta, tamanho_corpo] (2 x uint32) + metadados JSON
+(headers, status, versao HTTP, fases e duracao medidas) + corpo como trafegou
+na rede (comprimido com zlib quando veio sem Content-Encoding). O indice
+(<arquivo>.idx, uma linha JSON por registro) leva a chave de cada requisicao
+ao registro e e reconstruido a partir do arquivo se faltar ou estiver atrasado.
+
+Uso:
+    python cassete.py arquivo.cassete        # resumo (e reindexacao, se preciso)
+"""
+
+import asyncio
+import atexit
+import hashlib
+import json
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+import zlib
+
+import httpx
+
+from transporte import FASES, ms_desde, rastreador_atual
+
+MODOS_CASSETE = ('gravar', 'reproduzir')
+
+# original: cada resposta demora a duracao gravada e reporta as fases gravadas;
+# maxima: respostas imediatas (fases zeradas)
+VELOCIDADES_CASSETE = ('original', 'maxima')
+
+# Headers com credenciais nunca vao para o arquivo
+CABECALHOS_OMITIDOS = ('authorization', 'cookie')
+
+_CABECALHO_REGISTRO = struct.Struct('!II')
+
+
+def chave_requisicao(request):
+    """Metodo, caminho com query e corpo; host e headers (token, cache
+    condicional) ficam de fora para o cassete valer com outra GITHUB_BASE_URL"""
+    conteudo = f"{request.method} {request.url.raw_path.decode('ascii')}\n".encode() + request.content
+    return hashlib.blake2b(conteudo, digest_size=12).hexdigest()
+
+
+def _cabecalhos(headers, omitir=()):
+    return [[nome.decode('latin-1'), valor.decode('latin-1')]
+            for nome, valor in headers.raw if nome.decode('latin-1').lower() not in omitir]
+
+
+def _ler_registro(arquivo):
+    """(metadados, corpo) do registro na posicao atual, ou None no fim do arquivo"""
+    cabecalho = arquivo.read(_CABECALHO_REGISTRO.size)
+    if len(cabecalho) < _CABECALHO_REGISTRO.size:
+        return None
+    tamanho_meta, tamanho_corpo = _CABECALHO_REGISTRO.unpack(cabecalho)
+    meta = json.loads(arquivo.read(tamanho_meta))
+    corpo = arquivo.read(tamanho_corpo)
+    if len(corpo) < tamanho_corpo:
+        return None
+    return meta, zlib.decompress(corpo) if meta['zlib'] else corpo
+
+
+def indexar(caminho):
+    """Reconstroi <caminho>.idx percorrendo o arquivo; um registro truncado no
+    fim (gravacao interrompida) fica fora do indice"""
+    entradas = []
+    with open(caminho, 'rb') as arquivo:
+        while True:
+            posicao = arquivo.tell()
+            registro = _ler_registro(arquivo)
+            if registro is None:
+                break
+            entradas.append({'chave': registro[0]['chave'], 'posicao': posicao, 'tamanho': arquivo.tell() - posicao})
+
+    with open(f"{caminho}.idx", 'w', encoding='utf-8') as f:
+        for entrada in entradas:
+            f.write(json.dumps(entrada) + '\n')
+    return entradas
+
+
+def carregar_indice(caminho):
+    caminho_indice = f"{caminho}.idx"
+    entradas = []
+    if os.path.exists(caminho_indice):
+        with open(caminho_indice, encoding='utf-8') as f:
+            entradas = [json.loads(linha) for linha in f if linha.strip()]
+
+    fim = entradas[-1]['posicao'] + entradas[-1]['tamanho'] if entradas else 0
+    if fim != os.path.getsize(caminho):
+        print(f"   Indice de {caminho} desatualizado: reindexando")
+        entradas = indexar(caminho)
+    return entradas
+
+
+class Cassete:
+    """Arquivo de gravacao ou de reproducao das respostas HTTP.
+
+    Na gravacao os registros vao para uma fila escrita por uma thread
+    propria, fora do tempo medido de cada requisicao; `fechar` (tambem
+    chamado na saida do processo) esvazia a fila. Na reproducao, requisicoes
+    com a mesma chave recebem os registros na ordem gravada, recomecando do
+    primeiro quando acabam (mais repeticoes do que as gravadas).
+    """
+
+    def __init__(self, caminho, modo='gravar', velocidade='original'):
+        if modo not in MODOS_CASSETE:
+            raise ValueError(f"Modo de cassete invalido: {modo} (use {' ou '.join(MODOS_CASSETE)})")
+        if velocidade not in VELOCIDADES_CASSETE:
+            raise ValueError(f"Velocidade de cassete invalida: {velocidade} (use {' ou '.join(VELOCIDADES_CASSETE)})")
+        self.caminho = caminho
+        self.modo = modo
+        self.velocidade = velocidade
+        self.gravados = 0
+        self._lock = threading.Lock()
+
+        if modo == 'gravar':
+            self._fila = queue.Queue()
+            self._escritor = threading.Thread(target=self._escrever, daemon=True)
+            self._escritor.start()
+            atexit.register(self.fechar)
+        else:
+            if not os.path.exists(caminho):
+                raise FileNotFoundError(f"Cassete nao encontrado: {caminho}")
+            self._registros = {}
+            for entrada in carregar_indice(caminho):
+                self._registros.setdefault(entrada['chave'], []).append((entrada['posicao'], entrada['tamanho']))
+            self._proximos = {}
+            self._arquivo = open(caminho, 'rb')
+
+    def __len__(self):
+        if self.modo == 'gravar':
+            return self.gravados
+        return sum(len(registros) for registros in self._registros.values())
+
+    def gravar(self, request, response, corpo, fases, duracao_ms):
+        self._fila.put((request, response, corpo, fases, duracao_ms, time.time()))
+
+    def _escrever(self):
+        with open(self.caminho, 'ab') as dados, open(f"{self.caminho}.idx", 'a', encoding='utf-8') as indice:
+            while (item := self._fila.get()) is not None:
+                request, response, corpo, fases, duracao_ms, instante = item
+                comprimir = 'Content-Encoding' not in response.headers
+                meta = {
+                    'chave': chave_requisicao(request),
+                    'metodo': request.method,
+                    'url': str(request.url),
+                    'cabecalhos_requisicao': _cabecalhos(request.headers, CABECALHOS_OMITIDOS),
+                    'corpo_requisicao': request.content.decode('utf-8', 'replace'),
+                    'status': response.status_code,
+                    'motivo': response.extensions.get('reason_phrase', b'').decode('latin-1'),
+                    'versao_http': response.extensions.get('http_version', b'HTTP/1.1').decode('ascii'),
+                    'cabecalhos': _cabecalhos(response.headers),
+                    'fases': fases,
+                    'duracao_ms': round(duracao_ms, 3),
+                    'instante': instante,
+                    'zlib': comprimir
+                }
+                bytes_meta = json.dumps(meta, separators=(',', ':')).encode('utf-8')
+                bytes_corpo = zlib.compress(corpo) if comprimir else corpo
+
+                posicao = dados.tell()
+                dados.write(_CABECALHO_REGISTRO.pack(len(bytes_meta), len(bytes_corpo)) + bytes_meta + bytes_corpo)
+                dados.flush()
+                tamanho = _CABECALHO_REGISTRO.size + len(bytes_meta) + len(bytes_corpo)
+                indice.write(json.dumps({'chave': meta['chave'], 'posicao': posicao, 'tamanho': tamanho}) + '\n')
+                indice.flush()
+                self.gravados += 1
+
+    def proxima(self, request):
+        """(metadados, corpo) gravados para a requisicao"""
+        chave = chave_requisicao(request)
+        with self._lock:
+            registros = self._registros.get(chave)
+            if not registros:
+                raise RuntimeError(f"Requisicao nao gravada no cassete: {request.method} {request.url}")
+            indice = self._proximos.get(chave, 0)
+            self._proximos[chave] = indice + 1
+            posicao, _ = registros[indice % len(registros)]
+            self._arquivo.seek(posicao)
+            return _ler_registro(self._arquivo)
+
+    def fechar(self):
+        if self.modo == 'gravar':
+            if self._escritor.is_alive():
+                self._fila.put(None)
+                self._escritor.join()
+        else:
+            self._arquivo.close()
+
+    def transporte(self, transporte):
+        """Envolve o transporte sincrono de um cliente httpx"""
+        if self.modo == 'gravar':
+            return TransporteGravacao(transporte, self)
+        return TransporteReproducao(self)
+
+    def transporte_async(self, transporte):
+        """Envolve o transporte assincrono de um cliente httpx"""
+        if self.modo == 'gravar':
+            return TransporteGravacaoAsync(transporte, self)
+        return TransporteReproducaoAsync(self)
+
+
+def _fases_desde(rastreador, antes):
+    if rastreador is None:
+        return None
+    return {fase: round(rastreador.fases[fase] - antes[fase], 3) for fase in FASES}
+
+
+def _resposta_gravada(response, corpo):
+    # O corpo ja foi lido da rede; a resposta devolvida ao cliente o serve da memoria
+    extensoes = {nome: response.extensions[nome] for nome in ('http_version', 'reason_phrase')
+                 if nome in response.extensions}
+    return httpx.Response(response.status_code, headers=response.headers, stream=httpx.ByteStream(corpo),
+                          extensions=extensoes)
+
+
+def _resposta_reproduzida(meta, corpo):
+    return httpx.Response(
+        meta['status'],
+        headers=[(nome.encode('latin-1'), valor.encode('latin-1')) for nome, valor in meta['cabecalhos']],
+        stream=httpx.ByteStream(corpo),
+        extensions={'http_version': meta['versao_http'].encode('ascii'),
+                    'reason_phrase': meta['motivo'].encode('latin-1')}
+    )
+
+
+def _somar_fases(meta):
+    rastreador = rastreador_atual()
+    if rastreador is not None and meta['fases']:
+        for fase, valor in meta['fases'].items():
+            rastreador.fases[fase] += valor
+
+
+class TransporteGravacao(httpx.BaseTransport):
+
+    def __init__(self, transporte, cassete):
+        self._transporte = transporte
+        self._cassete = cassete
+
+    def handle_request(self, request):
+        rastreador = rastreador_atual()
+        antes = dict(rastreador.fases) if rastreador is not None else None
+        inicio = time.perf_counter_ns()
+        response = self._transporte.handle_request(request)
+        try:
+            corpo = b''.join(response.stream)
+        finally:
+            response.close()
+        self._cassete.gravar(request, response, corpo, _fases_desde(rastreador, antes), ms_desde(inicio))
+        return _resposta_gravada(response, corpo)
+
+    def close(self):
+        self._transporte.close()
+
+
+class TransporteGravacaoAsync(httpx.AsyncBaseTransport):
+
+    def __init__(self, transporte, cassete):
+        self._transporte = transporte
+        self._cassete = cassete
+
+    async def handle_async_request(self, request):
+        rastreador = rastreador_atual()
+        antes = dict(rastreador.fases) if rastreador is not None else None
+        inicio = time.perf_counter_ns()
+        response = await self._transporte.handle_async_request(request)
+        try:
+            corpo = b''.join([parte async for parte in response.stream])
+        finally:
+            await response.aclose()
+        self._cassete.gravar(request, response, corpo, _fases_desde(rastreador, antes), ms_desde(inicio))
+        return _resposta_gravada(response, corpo)
+
+    async def aclose(self):
+        await self._transporte.aclose()
+
+
+class TransporteReproducao(httpx.BaseTransport):
+
+    def __init__(self, cassete):
+        self._cassete = cassete
+
+    def handle_request(self, request):
+        request.read()
+        meta, corpo = self._cassete.proxima(request)
+        if self._cassete.velocidade == 'original':
+            time.sleep(meta['duracao_ms'] / 1000)
+            _somar_fases(meta)
+        return _resposta_reproduzida(meta, corpo)
+
+
+class TransporteReproducaoAsync(httpx.AsyncBaseTransport):
+
+    def __init__(self, cassete):
+        self._cassete = cassete
+
+    async def handle_async_request(self, request):
+        await request.aread()
+        meta, corpo = self._cassete.proxima(request)
+        if self._cassete.velocidade == 'original':
+            await asyncio.sleep(meta['duracao_ms'] / 1000)
+            _somar_fases(meta)
+        return _resposta_reproduzida(meta, corpo)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    caminho = sys.argv[1]
+    entradas = carregar_indice(caminho)
+    chaves = {}
+    for entrada in entradas:
+        chaves[entrada['chave']] = chaves.get(entrada['chave'], 0) + 1
+
+    print(f"\nCassete {caminho}")
+    print("="*80)
+    print(f"Registros: {len(entradas)} | Requisicoes distintas: {len(chaves)} | "
+          f"Tamanho: {os.path.getsize(caminho) / 1024:.1f} KB")
+
+    duracoes = {}
+    with open(caminho, 'rb') as arquivo:
+        for entrada in entradas:
+            arquivo.seek(entrada['posicao'])
+            meta, _ = _ler_registro(arquivo)
+            host = httpx.URL(meta['url']).host
+            duracoes.setdefault((meta['metodo'], host, meta['status']), []).append(meta['duracao_ms'])
+    for (metodo, host, status), valores in sorted(duracoes.items()):
+        print(f"   {metodo:<5} {host:<30} {status}: {len(valores):>6} respostas, "
+              f"{sum(valores) / len(valores):.1f}ms em media")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Checkpoint e retomada de coletas interrompidas
+"""
+
+import csv
+import json
+import os
+import random
+from datetime import datetime
+
+
+class CheckpointColeta:
+    """Guarda a semente e o plano embaralhado de consultas de cada usuario.
+
+    As consultas concluidas nao sao duplicadas aqui: o proprio CSV de metricas
+    (gravado incrementalmente, com a coluna repeticao) e a fonte de verdade,
+    lido por `ler_concluidas` na retomada.
+    """
+
+    def __init__(self, caminho, semente=None, planos=None, execucao=None):
+        self.caminho = caminho
+        self.semente = semente if semente is not None else random.randrange(2**32)
+        self.planos = planos or {}
+        # Identificador da coleta (inicio), mantido na retomada
+        self.execucao = execucao or datetime.now().strftime('%Y%m%dT%H%M%S')
+
+    @classmethod
+    def carregar(cls, caminho):
+        if not os.path.exists(caminho):
+            return None
+        with open(caminho, encoding='utf-8') as f:
+            dados = json.load(f)
+        return cls(caminho, dados['semente'], dados['planos'], dados.get('execucao'))
+
+    def embaralhar(self, usuario, consultas):
+        # Um gerador por usuario: o plano nao depende de quantos usuarios ja
+        # foram planejados antes de uma interrupcao
+        random.Random(f"{self.semente}:{usuario}").shuffle(consultas)
+
+    def plano(self, usuario):
+        if usuario not in self.planos:
+            return None
+        plano = self.planos[usuario]
+        return plano['repo'], [tuple(consulta) for consulta in plano['consultas']]
+
+    def registrar_plano(self, usuario, repo_name, consultas):
+        self.planos[usuario] = {'repo': repo_name, 'consultas': [list(c) for c in consultas]}
+        self.salvar()
+
+    def salvar(self):
+        temporario = f"{self.caminho}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump({'semente': self.semente, 'planos': self.planos, 'execucao': self.execucao}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, self.caminho)
+
+    def remover(self):
+        if os.path.exists(self.caminho):
+            os.remove(self.caminho)
+
+
+def ler_concluidas(caminho_csv):
+    """(conjunto de (usuario, consulta, repeticao) ja gravados, maior id_execucao)"""
+    concluidas = set()
+    maior_id = 0
+    if not os.path.exists(caminho_csv):
+        return concluidas, maior_id
+
+    with open(caminho_csv, newline='', encoding='utf-8') as f:
+        for linha in csv.DictReader(f):
+            if linha.get('repeticao') not in (None, ''):
+                concluidas.add((linha['usuario'], linha['consulta'], int(linha['repeticao'])))
+            maior_id = max(maior_id, int(linha['id_execucao']))
+
+    return concluidas, maior_id
@@ -0,0 +1,94 @@
+"""
+Motor de coleta assincrono com concorrencia limitada
+"""
+
+import asyncio
+import random
+import time
+
+import httpx
+
+from transporte import criar_cliente_async, medir_fases, ms_desde
+
+
+async def fazer_requisicao_com_retry_async(func, *args, max_tentativas=3):
+    for tentativa in range(max_tentativas):
+        try:
+            return await func(*args)
+        except (httpx.ConnectError, httpx.TimeoutException):
+            if tentativa < max_tentativas - 1:
+                await asyncio.sleep(5)
+            else:
+                raise
+
+
+async def _worker(fila, client, executar, registrar, pausa, obter_agendador):
+    while True:
+        consulta = await fila.get()
+        agendador = obter_agendador(consulta)
+        try:
+            # A espera pelo orcamento de rate limit fica fora do tempo medido
+            if agendador is not None:
+                await agendador.aguardar_async()
+
+            # Cada requisicao e cronometrada isoladamente, retries incluidos;
+            # o rastreador fica no contexto desta task
+            with medir_fases() as rastreador:
+                inicio = time.perf_counter_ns()
+                response = await executar(client, *consulta)
+                tempo_resposta_ms = ms_desde(inicio)
+
+            if agendador is not None:
+                agendador.observar(response)
+            registrar(consulta, tempo_resposta_ms, response, rastreador.resultado())
+        except Exception as e:
+            print(f"   Falha em {consulta}: {e}")
+        finally:
+            fila.task_done()
+
+        if (agendador is None or not agendador.adaptativo) and pausa and pausa[1] > 0:
+            await asyncio.sleep(random.uniform(*pausa))
+
+
+async def _executar_consultas(consultas, executar, registrar, concorrencia, pausa, opcoes_cliente, agendador):
+    fila = asyncio.Queue()
+    # A ordem de despacho segue a ordem embaralhada da lista
+    for consulta in consultas:
+        fila.put_nowait(consulta)
+
+    obter_agendador = agendador if callable(agendador) else (lambda consulta: agendador)
+
+    async with criar_cliente_async(**opcoes_cliente) as client:
+        workers = [
+            asyncio.create_task(_worker(fila, client, executar, registrar, pausa, obter_agendador))
+            for _ in range(max(1, concorrencia))
+        ]
+        await fila.join()
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+
+def executar_consultas_async(consultas, executar, registrar, concorrencia=10, pausa=(0, 0), timeout=30,
+                             modo_conexao='cold', tamanho_pool=10, keepalive_expiry=30, agendador=None,
+                             compressao=None, protocolo='http1', cassete=None):
+    """Executa as consultas com no maximo `concorrencia` requisicoes em voo.
+
+    `executar(client, *consulta)` e uma corrotina que
+    devolve a resposta; `registrar(consulta, tempo_resposta_ms, response, fases)` e
+    chamado no loop de eventos logo apos cada resposta, entao o id_execucao e o
+    timestamp continuam sendo atribuidos na ordem de conclusao. Com um
+    `agendador` adaptativo, o ritmo segue o rate limit e a `pausa` fixa e
+    ignorada; `agendador` tambem pode ser uma funcao consulta -> agendador
+    quando backends diferentes sao intercalados.
+    """
+    opcoes_cliente = {
+        'modo': modo_conexao,
+        'tamanho_pool': tamanho_pool,
+        'keepalive_expiry': keepalive_expiry,
+        'timeout': timeout,
+        'compressao': compressao,
+        'protocolo': protocolo,
+        'cassete': cassete
+    }
+    asyncio.run(_executar_consultas(consultas, executar, registrar, concorrencia, pausa, opcoes_cliente, agendador))
@@ -0,0 +1,1304 @@
+"""
+Nucleo de coleta compartilhado pelos backends REST e GraphQL
+
+Um backend e um modulo (scriptRest.py, graphQL.py) que expoe:
+    TIPO_API, ARQUIVO_METRICAS, CONSULTAS, FUNCAO_DESCOBERTA,
+    pool_tokens, agendador, validar_tokens(),
+    montar_requisicao(func_name, user, repo) -> (metodo, url, kwargs) e
+    extrair_repo_mais_popular(response) -> nome do repositorio ou None
+e, opcionalmente, precisa_reenviar(response) -> bool,
+observar_resposta(response) (chamado apos cada resposta, fora do tempo
+medido) e colunas_resposta(response) -> colunas extras do CSV. Backends com
+TAMANHOS_LOTE tambem expoem montar_requisicao_lote(itens) e
+separar_resposta_lote(response, quantidade), usados por executar_lotes.
+
+Executado diretamente, intercala REST e GraphQL num unico cronograma
+embaralhado por usuario, sobre o mesmo pool de conexoes, eliminando a
+diferenca de horario/rede entre as duas coletas.
+
+Coleta distribuida: com COLETA_SHARD=i/n no ambiente o processo coleta so o
+i-esimo bloco de (usuario, repeticao) em arquivos proprios
+(metricas_rest.shard-i-de-n.csv, ...), com metadados de relogio ao lado; com
+COLETA_PROCESSOS=n sobe n shards locais e mescla as saidas com
+mesclar_shards.py (que tambem junta shards vindos de outras maquinas).
+"""
+
+import functools
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import httpx
+
+from amostragem import AmostragemSequencial, ler_tentativas
+from carga_aberta import executar_carga_aberta, instantes_chegada
+from cassete import Cassete
+from checkpoint import CheckpointColeta, ler_concluidas
+from coleta_async import executar_consultas_async, fazer_requisicao_com_retry_async
+from gravador import GravadorMetricas, GravadorParquet
+from histograma import HistogramasLatencia, caminho_histogramas
+from metricas_vivo import MetricasVivo
+from relogio import medir_relogio
+from transporte import (FASES, criar_sessao, funcao_decodificar, medir_decodificacao, medir_fases, ms_desde,
+                        tamanho_requisicao_kb, tamanhos_resposta)
+from varredura import executar_varreduras
+
+USUARIOS = [
+    "bradfitz",
+    "dgtlmoon",
+    "aaronpowell",
+    "gtsteffaniak",
+    "junjiem",
+    "pawurb",
+    "stephenberry",
+    "mrgrain",
+    "me-no-dev",
+    "chitalian"
+]
+
+REPETICOES = 33
+
+# Amostragem adaptativa: com AMOSTRAGEM_ADAPTATIVA, em vez de REPETICOES fixas
+# cada celula (api, usuario, consulta) recebe REPETICOES_MINIMAS e para quando
+# a meia largura do IC 95% de ESTATISTICA_ALVO ('mediana' ou 'media') fica
+# abaixo de PRECISAO_ALVO (fracao da estimativa). O orcamento do usuario
+# continua REPETICOES por celula; o que as celulas estaveis nao usam vai para
+# as mais ruidosas, ate REPETICOES_MAXIMAS. Sempre sequencial e sem shards
+AMOSTRAGEM_ADAPTATIVA = False
+ESTATISTICA_ALVO = 'mediana'
+PRECISAO_ALVO = 0.05
+REPETICOES_MINIMAS = 10
+REPETICOES_MAXIMAS = 100
+
+# Coleta assincrona: executa a lista embaralhada de consultas com no maximo
+# CONCORRENCIA requisicoes simultaneas
+MODO_ASYNC = False
+CONCORRENCIA = 10
+PAUSA_ENTRE_REQUISICOES = (1, 3)
+
+# Ritmo: 'adaptativo' envia assim que houver orcamento de rate limit e so
+# espera perto da margem de cada backend; 'fixo' usa a PAUSA_ENTRE_REQUISICOES
+MODO_RITMO = 'adaptativo'
+
+# Conexoes: 'cold' abre uma conexao nova por requisicao (handshake incluso no
+# tempo medido); 'warm' reaproveita conexoes persistentes de um pool
+MODO_CONEXAO = 'cold'
+TAMANHO_POOL = 10
+KEEPALIVE_EXPIRY = 30
+
+# Compressao: None aceita o que o httpx souber decodificar; 'identity', 'gzip'
+# ou 'br' forcam o Accept-Encoding. tamanho_resposta_kb e sempre o corpo
+# decodificado; tamanho_fio_kb e o que trafegou na rede
+COMPRESSAO = None
+
+# Protocolo: 'http1' ou 'http2' (via ALPN; requer o pacote h2). Para medir a
+# multiplexacao, use http2 com MODO_CONEXAO='warm' e MODO_ASYNC
+PROTOCOLO_HTTP = 'http1'
+
+# Decodificacao no cliente: apos cada resposta (fora do tempo medido) o corpo
+# e decodificado de novo para medir decodificacao_ms e memoria_objeto_kb;
+# 'orjson' (requer o pacote) mostra quanto do tempo fim a fim e parsing
+DECODIFICADOR_JSON = 'json'
+
+# Malha aberta: com TAXAS_CHEGADA preenchido (req/s, p.ex. [2, 5, 10, 20]) as
+# requisicoes saem num cronograma fixo ou Poisson, independente das respostas,
+# durante DURACAO_POR_TAXA segundos por taxa; a latencia e medida a partir do
+# instante previsto de envio (sem coordinated omission). Sempre assincrono
+TAXAS_CHEGADA = []
+DISTRIBUICAO_CHEGADA = 'poisson'
+DURACAO_POR_TAXA = 60
+MAX_EM_VOO = 200
+ARQUIVO_CARGA = '../dados/metricas_carga_aberta.csv'
+
+# Varredura paginada: com MODO_VARREDURA, as consultas que listam colecoes
+# (CONSULTAS_PAGINADAS de cada backend: repositorios do usuario e issues do
+# repositorio) sao percorridas ate a ultima pagina, seguindo o Link
+# rel="next" (REST) ou o pageInfo.endCursor (GraphQL), com TAMANHO_PAGINA
+# itens por pagina (maximo 100 no GitHub); cada pagina vira uma linha. Com
+# PREFETCH_PAGINAS > 1, se as paginas restantes puderem ser previstas pela
+# primeira (REST com rel="last"), ate esse numero de paginas fica em voo;
+# cursores opacos (GraphQL) sao sempre sequenciais
+MODO_VARREDURA = False
+TAMANHO_PAGINA = 100
+PREFETCH_PAGINAS = 1
+MAX_PAGINAS = None
+REPETICOES_VARREDURA = 3
+ARQUIVO_VARREDURA = '../dados/metricas_varredura.csv'
+
+# Varredura de tamanhos: com TAMANHOS_PAGINA preenchido (p.ex. [1, 5, 10, 25,
+# 50, 100]) so a primeira pagina das CONSULTAS_PAGINADAS e pedida, com cada
+# first/per_page, REPETICOES vezes por usuario, num cronograma embaralhado;
+# a analise ajusta latencia e bytes por item de cada API
+TAMANHOS_PAGINA = []
+ARQUIVO_TAMANHOS_PAGINA = '../dados/metricas_tamanho_pagina.csv'
+
+# Cassete: com CASSETE (p.ex. '../dados/coleta.cassete') e MODO_CASSETE='gravar'
+# cada par requisicao/resposta (sem Authorization) e anexado ao arquivo, com as
+# fases e a duracao medidas; com 'reproduzir' nenhuma requisicao sai para a
+# rede (nem a validacao de tokens) e as respostas gravadas voltam na ordem, com
+# a duracao original (VELOCIDADE_CASSETE='original') ou imediatas ('maxima')
+CASSETE = None
+MODO_CASSETE = 'gravar'
+VELOCIDADE_CASSETE = 'original'
+
+# Parquet: com DIRETORIO_PARQUET (p.ex. '../dados/metricas_parquet') as linhas
+# da coleta principal tambem sao gravadas em Parquet (requer pyarrow),
+# particionado por execucao, tipo_api e consulta, com categoricas em
+# dicionario e timestamp inteiro; analise_estatistica.py le so as colunas e
+# particoes que usa. O CSV continua sendo gravado (retomada e shards)
+DIRETORIO_PARQUET = None
+
+# Metricas ao vivo: com PORTA_METRICAS (p.ex. 9108) a coleta expoe em
+# http://127.0.0.1:<porta>/metrics (formato Prometheus; shard i usa porta + i)
+# vazao, percentis de latencia, bytes/s, erros e folga de rate limit por api e
+# consulta, numa janela deslizante de JANELA_METRICAS segundos; com
+# INTERVALO_PAINEL o mesmo resumo e impresso no terminal a cada tantos segundos
+PORTA_METRICAS = None
+INTERVALO_PAINEL = None
+JANELA_METRICAS = 60
+
+# Checkpoint: plano embaralhado e semente; com RETOMAR, uma coleta
+# interrompida continua de onde parou (SEMENTE=None sorteia uma nova)
+ARQUIVO_CHECKPOINT_UNIFICADO = '../dados/coleta_unificada.checkpoint.json'
+RETOMAR = True
+SEMENTE = None
+
+# Respostas: com DIRETORIO_RESPOSTAS definido (p.ex. '../dados/respostas'),
+# o corpo de cada resposta e salvo em <diretorio>/<tipo_api>/<consulta>/
+# <usuario>-<repeticao>.json para o perfil de campos (perfil_campos.py)
+DIRETORIO_RESPOSTAS = None
+
+# Shards: COLETA_SHARD='i/n' coleta a fatia i de n (usuarios x repeticoes em
+# blocos contiguos); COLETA_NO identifica a maquina. Sem COLETA_SHARD,
+# COLETA_PROCESSOS > 1 abre os shards como subprocessos deste script, cada um
+# com uma fatia de GITHUB_TOKENS, e mescla os resultados ao final. O relogio
+# de cada shard e medido (NTP, ou header Date) no inicio e no fim da coleta;
+# COLETA_EXECUCAO (repassado aos shards locais) identifica a coleta no Parquet
+SHARD = os.environ.get('COLETA_SHARD')
+NO = os.environ.get('COLETA_NO', socket.gethostname())
+PROCESSOS = int(os.environ.get('COLETA_PROCESSOS', 1))
+SERVIDOR_NTP = 'pool.ntp.org'
+
+CAMPOS_CSV = ['id_execucao', 'usuario', 'consulta', 'repeticao', 'tipo_api', 'tempo_resposta_ms',
+              'tamanho_resposta_kb', 'tamanho_requisicao_kb', 'status_code', 'timestamp', 'observacoes', 'modo_conexao',
+              *FASES, 'cache', 'bytes_economizados_kb', 'cota_economizada',
+              'tamanho_fio_kb', 'tamanho_cabecalhos_kb', 'content_encoding', 'protocolo',
+              'decodificacao_ms', 'memoria_objeto_kb', 'decodificador_json']
+
+# Modo lote: metricas por consulta logica (CAMPOS_CSV + lote) e por requisicao HTTP
+CAMPOS_LOTE = ['id_lote', 'tamanho_lote']
+CAMPOS_CSV_LOTES = ['id_lote', 'tamanho_lote', 'itens', 'consultas', 'tempo_resposta_ms', 'tempo_por_item_ms',
+                    'tamanho_resposta_kb', 'tamanho_requisicao_kb', 'status_code', 'timestamp', 'modo_conexao', *FASES,
+                    'tamanho_fio_kb', 'tamanho_cabecalhos_kb', 'content_encoding', 'protocolo']
+
+CAMPOS_CSV_CARGA = ['id_execucao', 'taxa_alvo', 'distribuicao', 'usuario', 'consulta', 'tipo_api',
+                    'instante_previsto_s', 'atraso_envio_ms', 'tempo_servico_ms', 'tempo_resposta_ms',
+                    'tamanho_resposta_kb', 'status_code', 'erro', 'timestamp', 'modo_conexao', 'protocolo', *FASES]
+
+CAMPOS_CSV_VARREDURA = ['id_execucao', 'id_varredura', 'usuario', 'consulta', 'tipo_api', 'repeticao', 'pagina',
+                        'itens', 'tamanho_pagina', 'janela_prefetch', 'tempo_resposta_ms', 'tempo_acumulado_ms',
+                        'tamanho_resposta_kb', 'tamanho_requisicao_kb', 'status_code', 'timestamp', 'modo_conexao',
+                        *FASES, 'tamanho_fio_kb', 'tamanho_cabecalhos_kb', 'content_encoding', 'protocolo',
+                        'decodificacao_ms', 'memoria_objeto_kb', 'decodificador_json']
+
+CAMPOS_CSV_TAMANHO_PAGINA = ['id_execucao', 'usuario', 'consulta', 'tipo_api', 'repeticao', 'tamanho_pagina', 'itens',
+                             'tempo_resposta_ms', 'tamanho_resposta_kb', 'tamanho_requisicao_kb', 'status_code',
+                             'timestamp', 'modo_conexao', *FASES, 'tamanho_fio_kb', 'tamanho_cabecalhos_kb',
+                             'content_encoding', 'protocolo', 'decodificacao_ms', 'memoria_objeto_kb',
+                             'decodificador_json']
+
+backends = {}
+gravadores = {}
+# Histogramas HDR de latencia por (api, consulta, usuario), salvos ao lado
+# de cada CSV de metricas (arquivo .hdr.json)
+histogramas = {}
+checkpoint = None
+concluidas = set()
+id_execucao = 1
+sessao = None
+medidas_relogio = []
+cassete = None
+metricas_vivo = None
+gravador_parquet = None
+# Amostragem adaptativa: tentativas ja gravadas (retomada) e amostragem de cada usuario
+tentativas_gravadas = {}
+amostragens = {}
+
+
+def abrir_cassete():
+    """Abre CASSETE uma vez por processo (um arquivo por shard)"""
+    global cassete
+
+    if not CASSETE:
+        return None
+    if cassete is None:
+        cassete = Cassete(arquivo_shard(CASSETE), MODO_CASSETE, VELOCIDADE_CASSETE)
+        if MODO_CASSETE == 'gravar':
+            print(f"Gravando cassete em: {cassete.caminho}")
+        else:
+            print(f"Reproduzindo cassete: {cassete.caminho} ({len(cassete)} respostas, velocidade {VELOCIDADE_CASSETE})")
+    return cassete
+
+
+def folga_rate_limit():
+    """{api: requisicoes restantes somando os tokens validos}"""
+    return {tipo_api: sum(restante for _, valido, restante, _ in backend.pool_tokens.resumo() if valido)
+            for tipo_api, backend in backends.items()}
+
+
+def iniciar_metricas_vivo():
+    """Liga o endpoint e o painel uma vez por processo, se configurados"""
+    global metricas_vivo
+
+    if metricas_vivo is not None or not (PORTA_METRICAS or INTERVALO_PAINEL):
+        return
+    metricas_vivo = MetricasVivo(JANELA_METRICAS, folga_rate_limit)
+    if PORTA_METRICAS:
+        porta = PORTA_METRICAS + (fatia_shard() or (0,))[0]
+        metricas_vivo.servir(porta)
+        print(f"Metricas ao vivo em: http://127.0.0.1:{porta}/metrics")
+    if INTERVALO_PAINEL:
+        metricas_vivo.mostrar_periodicamente(INTERVALO_PAINEL)
+
+
+def registrar_vivo(tipo_api, consulta_tipo, tempo_resposta_ms, response):
+    # response None: falha sem resposta (timeout, conexao), contada como erro
+    if metricas_vivo is not None:
+        if response is None:
+            metricas_vivo.registrar(tipo_api, consulta_tipo, tempo_resposta_ms, 0, 'falha')
+        else:
+            metricas_vivo.registrar(tipo_api, consulta_tipo, tempo_resposta_ms, len(response.content),
+                                    response.status_code)
+
+
+def parar_metricas_vivo():
+    """Desliga endpoint e painel no fim do modo de coleta, com um ultimo painel"""
+    global metricas_vivo
+
+    if metricas_vivo is None:
+        return
+    if INTERVALO_PAINEL and metricas_vivo.series:
+        print(metricas_vivo.painel())
+    metricas_vivo.parar()
+    metricas_vivo = None
+
+
+def encerrar_metricas_vivo(executar):
+    # Todo modo de coleta desliga as metricas ao vivo ao sair, inclusive por
+    # retorno antecipado, erro ou Ctrl-C
+    @functools.wraps(executar)
+    def executar_e_encerrar(*args, **kwargs):
+        try:
+            return executar(*args, **kwargs)
+        finally:
+            parar_metricas_vivo()
+    return executar_e_encerrar
+
+
+def reproduzindo_cassete():
+    return bool(CASSETE) and MODO_CASSETE == 'reproduzir'
+
+
+def validar_backend(backend):
+    # Reproduzindo um cassete os tokens nao sao usados (nem checados na rede)
+    if reproduzindo_cassete():
+        print("Reproducao de cassete: tokens nao validados")
+        return True
+    return backend.validar_tokens()
+
+
+def _requisitar_com_retry(backend, montar, max_tentativas=3):
+    tentativa = 0
+    reenviado = False
+    while True:
+        # A requisicao e remontada a cada tentativa (token novo do pool)
+        metodo, url, kwargs = montar()
+        try:
+            response = sessao.request(metodo, url, **kwargs)
+        except (httpx.ConnectError, httpx.TimeoutException):
+            tentativa += 1
+            if tentativa >= max_tentativas:
+                raise
+            time.sleep(5)
+            continue
+
+        # O reenvio (uma vez) passa pelo mesmo tratamento de falhas; so
+        # falhas de rede consomem tentativas
+        if not reenviado and _precisa_reenviar(backend, response):
+            reenviado = True
+            continue
+        return response
+
+
+def fazer_requisicao_com_retry(backend, func_name, user, repo, max_tentativas=3):
+    return _requisitar_com_retry(backend, lambda: backend.montar_requisicao(func_name, user, repo), max_tentativas)
+
+
+def _precisa_reenviar(backend, response):
+    # Hook opcional do backend (p.ex. persisted query desconhecida pelo servidor)
+    return hasattr(backend, 'precisa_reenviar') and backend.precisa_reenviar(response)
+
+
+async def _enviar_async(client, backend, montar):
+    metodo, url, kwargs = montar()
+    response = await client.request(metodo, url, **kwargs)
+    if _precisa_reenviar(backend, response):
+        metodo, url, kwargs = montar()
+        response = await client.request(metodo, url, **kwargs)
+    return response
+
+
+async def executar_tentativa_async(client, tipo_api, consulta_tipo, func_name, user, repo, repeticao):
+    """Uma unica tentativa, sem retry (malha aberta: falhas viram linhas de erro)"""
+    backend = backends[tipo_api]
+    return await _enviar_async(client, backend, lambda: backend.montar_requisicao(func_name, user, repo))
+
+
+async def executar_consulta_async(client, tipo_api, consulta_tipo, func_name, user, repo, repeticao):
+    backend = backends[tipo_api]
+    montar = lambda: backend.montar_requisicao(func_name, user, repo)
+    return await fazer_requisicao_com_retry_async(_enviar_async, client, backend, montar)
+
+
+def observar_resposta(backend, response):
+    if hasattr(backend, 'observar_resposta'):
+        backend.observar_resposta(response)
+
+
+def colunas_resposta(backend, response):
+    return backend.colunas_resposta(response) if hasattr(backend, 'colunas_resposta') else {}
+
+
+def concluir_requisicao(backend, response):
+    observar_resposta(backend, response)
+    backend.agendador.observar(response)
+    if not backend.agendador.adaptativo:
+        time.sleep(random.uniform(*PAUSA_ENTRE_REQUISICOES))
+
+
+def registrar_metrica(tipo_api, user, consulta_tipo, repeticao, tempo_resposta_ms, response, fases=None):
+    global id_execucao
+
+    linha = {
+        'id_execucao': id_execucao,
+        'usuario': user,
+        'consulta': consulta_tipo,
+        'repeticao': repeticao,
+        'tipo_api': tipo_api,
+        'tempo_resposta_ms': round(tempo_resposta_ms, 2),
+        **tamanhos_resposta(response),
+        'tamanho_requisicao_kb': tamanho_requisicao_kb(response),
+        'status_code': response.status_code,
+        'timestamp': datetime.now().isoformat(),
+        'observacoes': 'OK' if response.status_code in (200, 304) else f'Erro {response.status_code}',
+        'modo_conexao': MODO_CONEXAO,
+        **(fases or dict.fromkeys(FASES)),
+        **colunas_resposta(backends[tipo_api], response),
+        **medir_decodificacao(response, DECODIFICADOR_JSON)
+    }
+    gravadores[tipo_api].escrever(linha)
+    if gravador_parquet is not None:
+        gravador_parquet.escrever(linha)
+    registrar_histograma(tipo_api, consulta_tipo, user, tempo_resposta_ms, response)
+    registrar_vivo(tipo_api, consulta_tipo, tempo_resposta_ms, response)
+    salvar_resposta(tipo_api, consulta_tipo, user, repeticao, response)
+
+    id_execucao += 1
+
+
+def registrar_histograma(tipo_api, consulta_tipo, user, tempo_resposta_ms, response):
+    if response.status_code in (200, 304):
+        histogramas[tipo_api].registrar(tipo_api, consulta_tipo, user, tempo_resposta_ms)
+
+
+def salvar_resposta(tipo_api, consulta_tipo, user, repeticao, response):
+    # 304 (cache condicional) nao tem corpo; erros nao entram no perfil
+    if not DIRETORIO_RESPOSTAS or response.status_code != 200:
+        return
+    pasta = os.path.join(DIRETORIO_RESPOSTAS, tipo_api, consulta_tipo)
+    os.makedirs(pasta, exist_ok=True)
+    with open(os.path.join(pasta, f"{user}-{repeticao}.json"), 'wb') as f:
+        f.write(response.content)
+
+
+def abrir_histogramas(tipo_api, caminho_csv, retomando=False):
+    # Na retomada o CSV e a fonte de verdade (o .hdr.json pode estar atrasado)
+    if retomando:
+        histogramas[tipo_api] = HistogramasLatencia.de_csv(caminho_csv)
+    else:
+        histogramas[tipo_api] = HistogramasLatencia(caminho_histogramas(caminho_csv))
+
+
+def salvar_histogramas():
+    for histogramas_api in histogramas.values():
+        histogramas_api.salvar()
+
+
+def fatia_shard():
+    """(indice, total) de COLETA_SHARD, ou None fora do modo distribuido"""
+    if not SHARD:
+        return None
+    indice, total = (int(parte) for parte in SHARD.split('/'))
+    if not 0 <= indice < total:
+        raise ValueError(f"COLETA_SHARD invalido: {SHARD} (use i/n com 0 <= i < n)")
+    return indice, total
+
+
+def arquivo_shard(caminho):
+    """metricas_rest.csv -> metricas_rest.shard-0-de-4.csv (inalterado sem shard)"""
+    fatia = fatia_shard()
+    if fatia is None:
+        return caminho
+    pasta, nome = os.path.split(caminho)
+    base, _, extensao = nome.partition('.')
+    sufixo = f".shard-{fatia[0]}-de-{fatia[1]}"
+    return os.path.join(pasta, f"{base}{sufixo}.{extensao}" if extensao else f"{base}{sufixo}")
+
+
+def arquivo_meta(caminho_csv):
+    """Metadados do shard (no e medidas de relogio) gravados ao lado do CSV"""
+    return caminho_csv.replace('.csv', '.meta.json')
+
+
+def repeticoes_do_shard(usuario):
+    """Repeticoes de `usuario` que cabem a este shard: a lista (usuario,
+    repeticao) achatada e dividida em blocos contiguos, entao cada shard faz a
+    descoberta de poucos usuarios"""
+    fatia = fatia_shard()
+    if fatia is None:
+        return range(REPETICOES)
+    indice, total = fatia
+    unidades = len(USUARIOS) * REPETICOES
+    inicio, fim = indice * unidades // total, (indice + 1) * unidades // total
+    base = USUARIOS.index(usuario) * REPETICOES
+    return range(max(inicio - base, 0), max(min(fim - base, REPETICOES), 0))
+
+
+def registrar_relogio(lista_backends):
+    """Mede o desvio do relogio local e regrava os metadados de cada CSV do shard"""
+    medida = medir_relogio(SERVIDOR_NTP, sessao, lista_backends[0].BASE_URL)
+    medidas_relogio.append(medida)
+    incerteza = 'n/d' if medida['incerteza_ms'] is None else f"+-{medida['incerteza_ms']:.1f}ms"
+    print(f"Relogio ({medida['metodo']}): offset {medida['offset_s'] * 1000:.1f}ms ({incerteza})")
+
+    for backend in lista_backends:
+        caminho = arquivo_meta(arquivo_shard(backend.ARQUIVO_METRICAS))
+        with open(caminho, 'w', encoding='utf-8') as f:
+            json.dump({'shard': SHARD, 'no': NO, 'relogio': medidas_relogio}, f, indent=2)
+
+
+def carregar_relogio(lista_backends):
+    """Medidas de relogio ja gravadas por uma execucao anterior do shard"""
+    caminho = arquivo_meta(arquivo_shard(lista_backends[0].ARQUIVO_METRICAS))
+    if not os.path.exists(caminho):
+        return []
+    with open(caminho, encoding='utf-8') as f:
+        return json.load(f)['relogio']
+
+
+def executar_shards_locais(lista_backends):
+    """Sobe PROCESSOS shards deste mesmo script, cada um com sua fatia de
+    tokens, e mescla as saidas. A configuracao dos filhos e a do arquivo (e
+    do ambiente), nao alteracoes feitas em memoria neste processo."""
+    import mesclar_shards
+
+    tokens = os.environ.get('GITHUB_TOKENS', '').split(',') if os.environ.get('GITHUB_TOKENS') else \
+        list(lista_backends[0].TOKENS)
+    if len(tokens) < PROCESSOS:
+        print(f"ATENCAO: {len(tokens)} token(s) para {PROCESSOS} processos; os shards vao dividir o rate limit")
+
+    execucao = os.environ.get('COLETA_EXECUCAO', datetime.now().strftime('%Y%m%dT%H%M%S'))
+    processos = []
+    for indice in range(PROCESSOS):
+        ambiente = {**os.environ, 'COLETA_SHARD': f"{indice}/{PROCESSOS}", 'COLETA_PROCESSOS': '1',
+                    'COLETA_EXECUCAO': execucao}
+        if len(tokens) >= PROCESSOS:
+            ambiente['GITHUB_TOKENS'] = ','.join(tokens[indice::PROCESSOS])
+        processos.append(subprocess.Popen([sys.executable, sys.argv[0]], env=ambiente))
+
+    codigos = [processo.wait() for processo in processos]
+    if any(codigos):
+        print(f"\nERRO: shards com falha (codigos {codigos}); rode de novo para retomar")
+        sys.exit(1)
+
+    print("\nMesclando shards...")
+    for backend in lista_backends:
+        mesclar_shards.mesclar(mesclar_shards.listar_shards(backend.ARQUIVO_METRICAS), backend.ARQUIVO_METRICAS)
+
+
+def registrar_consulta_async(consulta, tempo_resposta_ms, response, fases):
+    tipo_api, consulta_tipo, func_name, user, repo, repeticao = consulta
+    registrar_metrica(tipo_api, user, consulta_tipo, repeticao, tempo_resposta_ms, response, fases)
+    observar_resposta(backends[tipo_api], response)
+
+
+def descobrir_repo(backend, usuario):
+    backend.agendador.aguardar()
+    response = fazer_requisicao_com_retry(backend, backend.FUNCAO_DESCOBERTA, usuario, None)
+    concluir_requisicao(backend, response)
+    return backend.extrair_repo_mais_popular(response)
+
+
+def planejar_usuario(usuario):
+    """Descobre o repositorio mais popular em cada backend e monta a lista
+    embaralhada (unica para todos os backends) de consultas"""
+    repos = {}
+    consultas = []
+    for tipo_api, backend in backends.items():
+        repo_name = descobrir_repo(backend, usuario)
+        if repo_name is None:
+            continue
+        repos[tipo_api] = repo_name
+
+        for i in repeticoes_do_shard(usuario):
+            for consulta_tipo, func_name in backend.CONSULTAS:
+                repo = None if func_name == backend.FUNCAO_DESCOBERTA else repo_name
+                consultas.append((tipo_api, consulta_tipo, func_name, usuario, repo, i))
+
+    if not consultas:
+        return None
+
+    checkpoint.embaralhar(usuario, consultas)
+    checkpoint.registrar_plano(usuario, repos, consultas)
+
+    return consultas
+
+
+def coletar_usuario(usuario):
+    print(f"\nProcessando usuario: {usuario}")
+
+    plano = checkpoint.plano(usuario)
+    if plano is None:
+        consultas = planejar_usuario(usuario)
+        if not consultas:
+            return
+    else:
+        # Plano salvo: a consulta de descoberta nao e repetida
+        repos, consultas = plano
+
+    if AMOSTRAGEM_ADAPTATIVA:
+        coletar_usuario_adaptativo(usuario, consultas)
+        return
+
+    total = len(consultas)
+    consultas = [c for c in consultas if (c[0], c[3], c[1], c[5]) not in concluidas]
+    if len(consultas) < total:
+        print(f"   Retomando: {total - len(consultas)}/{total} consultas ja concluidas")
+
+    if MODO_ASYNC:
+        executar_consultas_async(
+            consultas,
+            executar_consulta_async,
+            registrar_consulta_async,
+            concorrencia=CONCORRENCIA,
+            pausa=PAUSA_ENTRE_REQUISICOES,
+            modo_conexao=MODO_CONEXAO,
+            tamanho_pool=TAMANHO_POOL,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+            compressao=COMPRESSAO,
+            protocolo=PROTOCOLO_HTTP,
+            cassete=cassete,
+            agendador=lambda consulta: backends[consulta[0]].agendador
+        )
+        return
+
+    for tipo_api, consulta_tipo, func_name, user, repo, repeticao in consultas:
+        backend = backends[tipo_api]
+        backend.agendador.aguardar()
+
+        with medir_fases() as rastreador:
+            inicio = time.perf_counter_ns()
+            response = fazer_requisicao_com_retry(backend, func_name, user, repo)
+            tempo_resposta_ms = ms_desde(inicio)
+        registrar_metrica(tipo_api, user, consulta_tipo, repeticao, tempo_resposta_ms, response, rastreador.resultado())
+
+        concluir_requisicao(backend, response)
+
+
+def coletar_usuario_adaptativo(usuario, consultas):
+    """Repete as celulas do plano do usuario ate cada IC ficar estreito o
+    bastante ou o orcamento (REPETICOES por celula) acabar; a repeticao de
+    cada linha e o numero da tentativa na celula"""
+    celulas = {}
+    for tipo_api, consulta_tipo, func_name, user, repo, _ in consultas:
+        celulas.setdefault((tipo_api, consulta_tipo), (func_name, repo))
+
+    amostragem = AmostragemSequencial(
+        celulas,
+        minimo=REPETICOES_MINIMAS,
+        maximo=REPETICOES_MAXIMAS,
+        orcamento=REPETICOES * len(celulas),
+        precisao=PRECISAO_ALVO,
+        estatistica=ESTATISTICA_ALVO
+    )
+    amostragens[usuario] = amostragem
+
+    for tipo_api, consulta_tipo in celulas:
+        for tempo_ms in tentativas_gravadas.get((tipo_api, usuario, consulta_tipo), []):
+            amostragem.adicionar((tipo_api, consulta_tipo), tempo_ms)
+    if amostragem.usadas():
+        print(f"   Retomando: {amostragem.usadas()} tentativas ja gravadas")
+
+    while (celula := amostragem.proxima()) is not None:
+        tipo_api, consulta_tipo = celula
+        func_name, repo = celulas[celula]
+        backend = backends[tipo_api]
+        backend.agendador.aguardar()
+
+        with medir_fases() as rastreador:
+            inicio = time.perf_counter_ns()
+            response = fazer_requisicao_com_retry(backend, func_name, usuario, repo)
+            tempo_resposta_ms = ms_desde(inicio)
+        registrar_metrica(tipo_api, usuario, consulta_tipo, amostragem.tentativas[celula], tempo_resposta_ms,
+                          response, rastreador.resultado())
+        amostragem.adicionar(celula, tempo_resposta_ms if response.status_code in (200, 304) else None)
+
+        concluir_requisicao(backend, response)
+
+    for celula in celulas:
+        estimativa = amostragem.estimativa(celula)
+        situacao = 'convergiu' if amostragem.convergiu(celula) else 'aberta'
+        precisao = amostragem.precisao_relativa(celula) * 100
+        print(f"   {celula[0]} {celula[1]}: {amostragem.tentativas[celula]} repeticoes | "
+              f"{ESTATISTICA_ALVO} {estimativa or 0:.1f}ms +/- {precisao:.1f}% ({situacao})")
+
+
+@encerrar_metricas_vivo
+def executar_coleta(lista_backends):
+    global checkpoint, concluidas, gravador_parquet, id_execucao, sessao
+
+    if TAXAS_CHEGADA:
+        return executar_carga(lista_backends)
+
+    if MODO_VARREDURA:
+        return executar_varredura(lista_backends)
+
+    if TAMANHOS_PAGINA:
+        return executar_tamanhos_pagina(lista_backends)
+
+    if AMOSTRAGEM_ADAPTATIVA and (fatia_shard() is not None or PROCESSOS > 1):
+        print("ERRO: AMOSTRAGEM_ADAPTATIVA nao se divide em shards (as repeticoes sao decididas durante a coleta)")
+        sys.exit(1)
+
+    if PROCESSOS > 1 and fatia_shard() is None:
+        return executar_shards_locais(lista_backends)
+
+    backends.clear()
+    backends.update({backend.TIPO_API: backend for backend in lista_backends})
+
+    for tipo_api, backend in backends.items():
+        backend.agendador.adaptativo = MODO_RITMO == 'adaptativo'
+        print(f"\n{tipo_api}:")
+        if not validar_backend(backend):
+            print("ERRO: Tokens invalidos.")
+            sys.exit(1)
+
+    consultas_por_usuario = sum(len(backend.CONSULTAS) for backend in backends.values())
+    repeticoes = sum(len(repeticoes_do_shard(usuario)) for usuario in USUARIOS)
+    print(f"\nUsuarios: {len(USUARIOS)} | Repeticoes: {REPETICOES} | Total: {repeticoes * consultas_por_usuario}")
+    if AMOSTRAGEM_ADAPTATIVA:
+        print(f"Amostragem adaptativa: {ESTATISTICA_ALVO} +/- {PRECISAO_ALVO * 100:.0f}% (IC 95%) | "
+              f"{REPETICOES_MINIMAS}-{REPETICOES_MAXIMAS} repeticoes por celula | Total e o orcamento maximo")
+        if MODO_ASYNC:
+            print("   MODO_ASYNC ignorado: cada tentativa depende das anteriores")
+    if fatia_shard() is not None:
+        print(f"Shard: {SHARD} no {NO} ({repeticoes}/{len(USUARIOS) * REPETICOES} repeticoes)")
+    print(f"Modo de conexao: {MODO_CONEXAO} (pool: {TAMANHO_POOL}) | Ritmo: {MODO_RITMO}")
+    print(f"Protocolo: {PROTOCOLO_HTTP} | Compressao: {COMPRESSAO or 'padrao'} | JSON: {DECODIFICADOR_JSON}")
+    abrir_cassete()
+    iniciar_metricas_vivo()
+    funcao_decodificar(DECODIFICADOR_JSON)
+
+    if len(backends) == 1:
+        arquivo_checkpoint = arquivo_shard(lista_backends[0].ARQUIVO_METRICAS).replace('.csv', '.checkpoint.json')
+    else:
+        arquivo_checkpoint = arquivo_shard(ARQUIVO_CHECKPOINT_UNIFICADO)
+
+    checkpoint = CheckpointColeta.carregar(arquivo_checkpoint) if RETOMAR else None
+    retomando = checkpoint is not None
+
+    concluidas = set()
+    id_execucao = 1
+    tentativas_gravadas.clear()
+    amostragens.clear()
+    if retomando:
+        for tipo_api, backend in backends.items():
+            concluidas_api, ultimo_id = ler_concluidas(arquivo_shard(backend.ARQUIVO_METRICAS))
+            concluidas.update((tipo_api,) + chave for chave in concluidas_api)
+            id_execucao = max(id_execucao, ultimo_id + 1)
+            if AMOSTRAGEM_ADAPTATIVA:
+                for chave, tentativas in ler_tentativas(arquivo_shard(backend.ARQUIVO_METRICAS)).items():
+                    tentativas_gravadas[(tipo_api,) + chave] = tentativas
+        print(f"Retomando coleta (semente {checkpoint.semente}): {len(concluidas)} consultas ja gravadas")
+    else:
+        # Shards de uma mesma coleta compartilham a execucao (particao Parquet)
+        checkpoint = CheckpointColeta(arquivo_checkpoint, SEMENTE, execucao=os.environ.get('COLETA_EXECUCAO'))
+        checkpoint.salvar()
+
+    gravadores.clear()
+    histogramas.clear()
+    for tipo_api, backend in backends.items():
+        arquivo = arquivo_shard(backend.ARQUIVO_METRICAS)
+        print(f"Gravando metricas {tipo_api} em: {arquivo}")
+        gravadores[tipo_api] = GravadorMetricas(arquivo, CAMPOS_CSV, anexar=retomando)
+        abrir_histogramas(tipo_api, arquivo, retomando)
+    gravador_parquet = None
+    if DIRETORIO_PARQUET:
+        gravador_parquet = GravadorParquet(DIRETORIO_PARQUET, checkpoint.execucao, CAMPOS_CSV)
+        print(f"Gravando Parquet em: {DIRETORIO_PARQUET}/execucao={checkpoint.execucao}")
+
+    # Um unico pool de conexoes para todos os backends
+    sessao = criar_sessao(MODO_CONEXAO, TAMANHO_POOL, KEEPALIVE_EXPIRY, compressao=COMPRESSAO,
+                          protocolo=PROTOCOLO_HTTP, cassete=cassete)
+
+    medidas_relogio.clear()
+    if fatia_shard() is not None:
+        if retomando:
+            medidas_relogio.extend(carregar_relogio(lista_backends))
+        registrar_relogio(lista_backends)
+
+    try:
+        for usuario in USUARIOS:
+            if repeticoes_do_shard(usuario):
+                coletar_usuario(usuario)
+        if fatia_shard() is not None:
+            registrar_relogio(lista_backends)
+    finally:
+        # Ctrl-C ou erro: as linhas ja produzidas continuam no disco e o
+        # checkpoint permite retomar
+        for gravador in gravadores.values():
+            gravador.fechar()
+        if gravador_parquet is not None:
+            gravador_parquet.fechar()
+        salvar_histogramas()
+        sessao.close()
+
+    checkpoint.remover()
+
+    for tipo_api, gravador in gravadores.items():
+        if gravador.total == 0:
+            print(f"\n{tipo_api}: nenhuma metrica coletada.")
+            continue
+        print(f"\n{tipo_api} - Total: {gravador.total} | Sucesso: {gravador.sucesso} ({gravador.sucesso/gravador.total*100:.1f}%)")
+    if amostragens:
+        usadas = sum(amostragem.usadas() for amostragem in amostragens.values())
+        orcamento = sum(amostragem.orcamento for amostragem in amostragens.values())
+        celulas = [amostragem.convergiu(celula) for amostragem in amostragens.values() for celula in amostragem.celulas]
+        print(f"\nAmostragem adaptativa: {usadas}/{orcamento} requisicoes do orcamento "
+              f"({(1 - usadas / orcamento) * 100:.1f}% economizadas) | {sum(celulas)}/{len(celulas)} celulas convergiram")
+    print("Experimento concluido.")
+
+
+def registrar_lote(id_lote, tamanho_lote, itens, tempo_resposta_ms, response, fases=None):
+    global id_execucao
+
+    tipo_api = itens[0][0]
+    partes = backends[tipo_api].separar_resposta_lote(response, len(itens))
+    timestamp = datetime.now().isoformat()
+
+    for (_, consulta_tipo, func_name, user, repo, repeticao), (sucesso, tamanho) in zip(itens, partes):
+        gravadores[tipo_api].escrever({
+            'id_execucao': id_execucao,
+            'usuario': user,
+            'consulta': consulta_tipo,
+            'repeticao': repeticao,
+            'tipo_api': tipo_api,
+            # Cada consulta logica espera o round-trip inteiro do lote
+            'tempo_resposta_ms': round(tempo_resposta_ms, 2),
+            'tamanho_resposta_kb': round(tamanho / 1024, 2),
+            'tamanho_requisicao_kb': tamanho_requisicao_kb(response, len(itens)),
+            'status_code': response.status_code,
+            'timestamp': timestamp,
+            'observacoes': 'OK' if sucesso else f'Erro no lote {id_lote}',
+            'modo_conexao': MODO_CONEXAO,
+            'id_lote': id_lote,
+            'tamanho_lote': tamanho_lote,
+            **(fases or dict.fromkeys(FASES))
+        })
+        if sucesso:
+            registrar_histograma(tipo_api, consulta_tipo, user, tempo_resposta_ms, response)
+        id_execucao += 1
+
+    gravadores['lotes'].escrever({
+        'id_lote': id_lote,
+        'tamanho_lote': tamanho_lote,
+        'itens': len(itens),
+        'consultas': '+'.join(item[1] for item in itens),
+        'tempo_resposta_ms': round(tempo_resposta_ms, 2),
+        'tempo_por_item_ms': round(tempo_resposta_ms / len(itens), 2),
+        **tamanhos_resposta(response),
+        'tamanho_requisicao_kb': tamanho_requisicao_kb(response),
+        'status_code': response.status_code,
+        'timestamp': timestamp,
+        'modo_conexao': MODO_CONEXAO,
+        **(fases or dict.fromkeys(FASES))
+    })
+    registrar_vivo(tipo_api, f"lote{tamanho_lote}", tempo_resposta_ms, response)
+
+
+def _montar_lote(backend, itens):
+    return lambda: backend.montar_requisicao_lote([(func_name, user, repo) for _, _, func_name, user, repo, _ in itens])
+
+
+async def executar_lote_async(client, id_lote, tamanho_lote, itens):
+    backend = backends[itens[0][0]]
+    return await fazer_requisicao_com_retry_async(_enviar_async, client, backend, _montar_lote(backend, itens))
+
+
+def registrar_lote_async(lote, tempo_resposta_ms, response, fases):
+    registrar_lote(*lote, tempo_resposta_ms, response, fases)
+    observar_resposta(backends[lote[2][0][0]], response)
+
+
+def listar_consultas(backend):
+    """Todas as consultas logicas (REPETICOES por usuario) de um backend, sem embaralhar"""
+    consultas = []
+    for usuario in USUARIOS:
+        repo_name = descobrir_repo(backend, usuario)
+        if repo_name is None:
+            print(f"   {backend.TIPO_API} {usuario}: nenhum repositorio encontrado")
+            continue
+
+        for i in range(REPETICOES):
+            for consulta_tipo, func_name in backend.CONSULTAS:
+                repo = None if func_name == backend.FUNCAO_DESCOBERTA else repo_name
+                consultas.append((backend.TIPO_API, consulta_tipo, func_name, usuario, repo, i))
+    return consultas
+
+
+def planejar_lotes(backend):
+    """Consultas logicas de todos os usuarios, embaralhadas e divididas em lotes
+    de cada tamanho de backend.TAMANHOS_LOTE; os lotes de tamanhos diferentes
+    sao intercalados para dividirem a mesma janela de tempo"""
+    consultas = listar_consultas(backend)
+
+    rng = random.Random(SEMENTE)
+    lotes = []
+    for tamanho_lote in backend.TAMANHOS_LOTE:
+        embaralhadas = consultas[:]
+        rng.shuffle(embaralhadas)
+        for inicio in range(0, len(embaralhadas), tamanho_lote):
+            # Ordenar pela funcao: mesma composicao -> mesmo documento (cache e persisted query)
+            itens = tuple(sorted(embaralhadas[inicio:inicio + tamanho_lote], key=lambda c: c[2]))
+            lotes.append((len(lotes) + 1, tamanho_lote, itens))
+
+    rng.shuffle(lotes)
+    return lotes
+
+
+@encerrar_metricas_vivo
+def executar_lotes(backend):
+    """Modo lote: cada requisicao HTTP carrega varias consultas logicas.
+    Sem checkpoint; uma coleta interrompida recomeca do zero."""
+    global id_execucao, sessao
+
+    backends.clear()
+    backends[backend.TIPO_API] = backend
+
+    backend.agendador.adaptativo = MODO_RITMO == 'adaptativo'
+    if not validar_backend(backend):
+        print("ERRO: Tokens invalidos.")
+        sys.exit(1)
+
+    print(f"\nUsuarios: {len(USUARIOS)} | Repeticoes: {REPETICOES} | Tamanhos de lote: {backend.TAMANHOS_LOTE}")
+    print(f"Modo de conexao: {MODO_CONEXAO} (pool: {TAMANHO_POOL}) | Ritmo: {MODO_RITMO}")
+    print(f"Protocolo: {PROTOCOLO_HTTP} | Compressao: {COMPRESSAO or 'padrao'}")
+    abrir_cassete()
+    iniciar_metricas_vivo()
+    print(f"Gravando metricas por consulta em: {backend.ARQUIVO_METRICAS_LOTE}")
+    print(f"Gravando metricas por requisicao em: {backend.ARQUIVO_LOTES}")
+
+    id_execucao = 1
+    gravadores.clear()
+    gravadores[backend.TIPO_API] = GravadorMetricas(backend.ARQUIVO_METRICAS_LOTE, CAMPOS_CSV + CAMPOS_LOTE)
+    gravadores['lotes'] = GravadorMetricas(backend.ARQUIVO_LOTES, CAMPOS_CSV_LOTES)
+    histogramas.clear()
+    abrir_histogramas(backend.TIPO_API, backend.ARQUIVO_METRICAS_LOTE)
+
+    sessao = criar_sessao(MODO_CONEXAO, TAMANHO_POOL, KEEPALIVE_EXPIRY, compressao=COMPRESSAO,
+                          protocolo=PROTOCOLO_HTTP, cassete=cassete)
+
+    try:
+        lotes = planejar_lotes(backend)
+        print(f"Lotes planejados: {len(lotes)}")
+
+        if MODO_ASYNC:
+            executar_consultas_async(
+                lotes,
+                executar_lote_async,
+                registrar_lote_async,
+                concorrencia=CONCORRENCIA,
+                pausa=PAUSA_ENTRE_REQUISICOES,
+                modo_conexao=MODO_CONEXAO,
+                tamanho_pool=TAMANHO_POOL,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+                compressao=COMPRESSAO,
+                protocolo=PROTOCOLO_HTTP,
+                cassete=cassete,
+                agendador=backend.agendador
+            )
+        else:
+            for id_lote, tamanho_lote, itens in lotes:
+                backend.agendador.aguardar()
+
+                with medir_fases() as rastreador:
+                    inicio = time.perf_counter_ns()
+                    response = _requisitar_com_retry(backend, _montar_lote(backend, itens))
+                    tempo_resposta_ms = ms_desde(inicio)
+                registrar_lote(id_lote, tamanho_lote, itens, tempo_resposta_ms, response, rastreador.resultado())
+
+                concluir_requisicao(backend, response)
+    finally:
+        for gravador in gravadores.values():
+            gravador.fechar()
+        salvar_histogramas()
+        sessao.close()
+
+    consultas = gravadores[backend.TIPO_API]
+    if consultas.total == 0:
+        print("\nNenhuma metrica coletada.")
+        return
+    print(f"\nConsultas: {consultas.total} | Sucesso: {consultas.sucesso} ({consultas.sucesso/consultas.total*100:.1f}%)")
+    print(f"Requisicoes HTTP: {gravadores['lotes'].total}")
+    print("Experimento concluido.")
+
+
+def registrar_carga(taxa, consulta, medidas, response, fases):
+    global id_execucao
+
+    tipo_api, consulta_tipo, func_name, user, repo, repeticao = consulta
+    gravadores['carga'].escrever({
+        'id_execucao': id_execucao,
+        'taxa_alvo': taxa,
+        'distribuicao': DISTRIBUICAO_CHEGADA,
+        'usuario': user,
+        'consulta': consulta_tipo,
+        'tipo_api': tipo_api,
+        'instante_previsto_s': round(medidas['instante_previsto_s'], 4),
+        'atraso_envio_ms': round(medidas['atraso_envio_ms'], 2),
+        'tempo_servico_ms': round(medidas['tempo_servico_ms'], 2),
+        'tempo_resposta_ms': round(medidas['tempo_resposta_ms'], 2),
+        'tamanho_resposta_kb': round(len(response.content) / 1024, 2) if response is not None else None,
+        'status_code': response.status_code if response is not None else None,
+        'erro': medidas['erro'],
+        'timestamp': datetime.now().isoformat(),
+        'modo_conexao': MODO_CONEXAO,
+        'protocolo': response.http_version if response is not None else None,
+        **(fases or dict.fromkeys(FASES))
+    })
+    id_execucao += 1
+    registrar_vivo(tipo_api, consulta_tipo, medidas['tempo_resposta_ms'], response)
+    if response is None:
+        return
+
+    observar_resposta(backends[tipo_api], response)
+
+
+@encerrar_metricas_vivo
+def executar_carga(lista_backends):
+    """Varre TAXAS_CHEGADA em malha aberta com as consultas de todos os backends"""
+    global id_execucao, sessao
+
+    backends.clear()
+    backends.update({backend.TIPO_API: backend for backend in lista_backends})
+
+    for tipo_api, backend in backends.items():
+        backend.agendador.adaptativo = MODO_RITMO == 'adaptativo'
+        print(f"\n{tipo_api}:")
+        if not validar_backend(backend):
+            print("ERRO: Tokens invalidos.")
+            sys.exit(1)
+
+    print(f"\nTaxas (req/s): {TAXAS_CHEGADA} | Chegadas: {DISTRIBUICAO_CHEGADA} | {DURACAO_POR_TAXA}s por taxa")
+    print(f"Modo de conexao: {MODO_CONEXAO} (pool: {MAX_EM_VOO}) | Max. em voo: {MAX_EM_VOO} | Sem retries")
+    print(f"Protocolo: {PROTOCOLO_HTTP} | Compressao: {COMPRESSAO or 'padrao'}")
+    abrir_cassete()
+    iniciar_metricas_vivo()
+    print(f"Gravando metricas em: {ARQUIVO_CARGA}")
+
+    rng = random.Random(SEMENTE)
+    sessao = criar_sessao(MODO_CONEXAO, TAMANHO_POOL, KEEPALIVE_EXPIRY, compressao=COMPRESSAO,
+                          protocolo=PROTOCOLO_HTTP, cassete=cassete)
+    try:
+        consultas = []
+        for backend in backends.values():
+            consultas.extend(listar_consultas(backend))
+    finally:
+        sessao.close()
+
+    if not consultas:
+        print("\nNenhuma consulta planejada.")
+        return
+
+    total = sum(len(instantes_chegada(taxa, DURACAO_POR_TAXA, 'fixa')) for taxa in TAXAS_CHEGADA)
+    folga = sum(folga_rate_limit().values())
+    if total > folga:
+        print(f"ATENCAO: ~{total} requisicoes previstas para ~{folga} de orcamento de rate limit")
+
+    id_execucao = 1
+    gravadores.clear()
+    gravadores['carga'] = GravadorMetricas(ARQUIVO_CARGA, CAMPOS_CSV_CARGA)
+
+    try:
+        for taxa in TAXAS_CHEGADA:
+            instantes = instantes_chegada(taxa, DURACAO_POR_TAXA, DISTRIBUICAO_CHEGADA, rng)
+            rng.shuffle(consultas)
+            print(f"\nTaxa {taxa} req/s: {len(instantes)} requisicoes")
+
+            executar_carga_aberta(
+                consultas,
+                instantes,
+                executar_tentativa_async,
+                functools.partial(registrar_carga, taxa),
+                max_em_voo=MAX_EM_VOO,
+                modo_conexao=MODO_CONEXAO,
+                tamanho_pool=MAX_EM_VOO,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+                agendador=lambda consulta: backends[consulta[0]].agendador,
+                compressao=COMPRESSAO,
+                protocolo=PROTOCOLO_HTTP,
+                cassete=cassete
+            )
+    finally:
+        gravadores['carga'].fechar()
+
+    gravador = gravadores['carga']
+    if gravador.total:
+        print(f"\nTotal: {gravador.total} | Sucesso: {gravador.sucesso} ({gravador.sucesso/gravador.total*100:.1f}%)")
+    print("Experimento concluido.")
+
+
+def registrar_pagina(id_varredura, varredura, pagina, medidas, response, fases):
+    global id_execucao
+
+    tipo_api, consulta_tipo, func_name, user, repo, repeticao = varredura
+    gravadores['varredura'].escrever({
+        'id_execucao': id_execucao,
+        'id_varredura': id_varredura,
+        'usuario': user,
+        'consulta': consulta_tipo,
+        'tipo_api': tipo_api,
+        'repeticao': repeticao,
+        'pagina': pagina,
+        'itens': medidas['itens'],
+        'tamanho_pagina': TAMANHO_PAGINA,
+        'janela_prefetch': medidas['janela_prefetch'],
+        'tempo_resposta_ms': round(medidas['tempo_resposta_ms'], 2),
+        'tempo_acumulado_ms': round(medidas['tempo_acumulado_ms'], 2),
+        **tamanhos_resposta(response),
+        'tamanho_requisicao_kb': tamanho_requisicao_kb(response),
+        'status_code': response.status_code,
+        'timestamp': datetime.now().isoformat(),
+        'modo_conexao': MODO_CONEXAO,
+        **(fases or dict.fromkeys(FASES)),
+        **medir_decodificacao(response, DECODIFICADOR_JSON)
+    })
+    id_execucao += 1
+    registrar_vivo(tipo_api, consulta_tipo, medidas['tempo_resposta_ms'], response)
+
+    observar_resposta(backends[tipo_api], response)
+
+
+def planejar_varreduras():
+    """Varreduras (tipo_api, consulta, func_name, usuario, repo, repeticao) de
+    todos os backends, embaralhadas para dividirem a mesma janela de tempo"""
+    varreduras = []
+    for usuario in USUARIOS:
+        for backend in backends.values():
+            repo_name = descobrir_repo(backend, usuario)
+            if repo_name is None:
+                print(f"   {backend.TIPO_API} {usuario}: nenhum repositorio encontrado")
+                continue
+
+            for i in range(REPETICOES_VARREDURA):
+                for consulta_tipo, func_name in backend.CONSULTAS_PAGINADAS:
+                    repo = None if func_name == backend.FUNCAO_DESCOBERTA else repo_name
+                    varreduras.append((backend.TIPO_API, consulta_tipo, func_name, usuario, repo, i))
+
+    random.Random(SEMENTE).shuffle(varreduras)
+    return varreduras
+
+
+@encerrar_metricas_vivo
+def executar_varredura(lista_backends):
+    """Modo varredura: percorre todas as paginas das consultas paginadas.
+    Sem checkpoint; uma coleta interrompida recomeca do zero."""
+    global id_execucao, sessao
+
+    backends.clear()
+    backends.update({backend.TIPO_API: backend for backend in lista_backends})
+
+    for tipo_api, backend in backends.items():
+        backend.agendador.adaptativo = MODO_RITMO == 'adaptativo'
+        print(f"\n{tipo_api}:")
+        if not validar_backend(backend):
+            print("ERRO: Tokens invalidos.")
+            sys.exit(1)
+
+    print(f"\nUsuarios: {len(USUARIOS)} | Repeticoes: {REPETICOES_VARREDURA} | Itens por pagina: {TAMANHO_PAGINA}")
+    print(f"Prefetch: {PREFETCH_PAGINAS} pagina(s) | Max. paginas: {MAX_PAGINAS or 'todas'}")
+    print(f"Modo de conexao: {MODO_CONEXAO} (pool: {TAMANHO_POOL}) | Ritmo: {MODO_RITMO}")
+    print(f"Protocolo: {PROTOCOLO_HTTP} | Compressao: {COMPRESSAO or 'padrao'} | JSON: {DECODIFICADOR_JSON}")
+    abrir_cassete()
+    iniciar_metricas_vivo()
+    print(f"Gravando metricas em: {ARQUIVO_VARREDURA}")
+    funcao_decodificar(DECODIFICADOR_JSON)
+
+    sessao = criar_sessao(MODO_CONEXAO, TAMANHO_POOL, KEEPALIVE_EXPIRY, compressao=COMPRESSAO,
+                          protocolo=PROTOCOLO_HTTP, cassete=cassete)
+    try:
+        varreduras = planejar_varreduras()
+    finally:
+        sessao.close()
+    print(f"Varreduras planejadas: {len(varreduras)}")
+
+    id_execucao = 1
+    gravadores.clear()
+    gravadores['varredura'] = GravadorMetricas(ARQUIVO_VARREDURA, CAMPOS_CSV_VARREDURA)
+
+    try:
+        executar_varreduras(
+            varreduras,
+            lambda varredura: backends[varredura[0]],
+            lambda client, backend, montar: fazer_requisicao_com_retry_async(_enviar_async, client, backend, montar),
+            registrar_pagina,
+            tamanho_pagina=TAMANHO_PAGINA,
+            prefetch=PREFETCH_PAGINAS,
+            max_paginas=MAX_PAGINAS,
+            pausa=PAUSA_ENTRE_REQUISICOES,
+            modo_conexao=MODO_CONEXAO,
+            tamanho_pool=TAMANHO_POOL,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+            compressao=COMPRESSAO,
+            protocolo=PROTOCOLO_HTTP,
+            cassete=cassete
+        )
+    finally:
+        gravadores['varredura'].fechar()
+
+    gravador = gravadores['varredura']
+    if gravador.total:
+        print(f"\nPaginas: {gravador.total} | Sucesso: {gravador.sucesso} ({gravador.sucesso/gravador.total*100:.1f}%)")
+    print("Experimento concluido.")
+
+
+def registrar_tamanho_pagina(consulta, tempo_resposta_ms, response, fases):
+    global id_execucao
+
+    tipo_api, consulta_tipo, func_name, user, repo, repeticao, tamanho_pagina = consulta
+    gravadores['tamanho_pagina'].escrever({
+        'id_execucao': id_execucao,
+        'usuario': user,
+        'consulta': consulta_tipo,
+        'tipo_api': tipo_api,
+        'repeticao': repeticao,
+        'tamanho_pagina': tamanho_pagina,
+        # Itens devolvidos: colecoes menores que a pagina limitam o que chega
+        'itens': backends[tipo_api].itens_pagina(func_name, response),
+        'tempo_resposta_ms': round(tempo_resposta_ms, 2),
+        **tamanhos_resposta(response),
+        'tamanho_requisicao_kb': tamanho_requisicao_kb(response),
+        'status_code': response.status_code,
+        'timestamp': datetime.now().isoformat(),
+        'modo_conexao': MODO_CONEXAO,
+        **(fases or dict.fromkeys(FASES)),
+        **medir_decodificacao(response, DECODIFICADOR_JSON)
+    })
+    id_execucao += 1
+    registrar_vivo(tipo_api, consulta_tipo, tempo_resposta_ms, response)
+
+
+def planejar_tamanhos_pagina():
+    consultas = []
+    for usuario in USUARIOS:
+        for backend in backends.values():
+            repo_name = descobrir_repo(backend, usuario)
+            if repo_name is None:
+                print(f"   {backend.TIPO_API} {usuario}: nenhum repositorio encontrado")
+                continue
+
+            for i in range(REPETICOES):
+                for tamanho_pagina in TAMANHOS_PAGINA:
+                    for consulta_tipo, func_name in backend.CONSULTAS_PAGINADAS:
+                        repo = None if func_name == backend.FUNCAO_DESCOBERTA else repo_name
+                        consultas.append((backend.TIPO_API, consulta_tipo, func_name, usuario, repo, i, tamanho_pagina))
+
+    random.Random(SEMENTE).shuffle(consultas)
+    return consultas
+
+
+@encerrar_metricas_vivo
+def executar_tamanhos_pagina(lista_backends):
+    """Modo varredura de tamanhos: a primeira pagina de cada consulta paginada
+    com cada tamanho de TAMANHOS_PAGINA. Sem checkpoint."""
+    global id_execucao, sessao
+
+    backends.clear()
+    backends.update({backend.TIPO_API: backend for backend in lista_backends})
+
+    for tipo_api, backend in backends.items():
+        backend.agendador.adaptativo = MODO_RITMO == 'adaptativo'
+        print(f"\n{tipo_api}:")
+        if not validar_backend(backend):
+            print("ERRO: Tokens invalidos.")
+            sys.exit(1)
+
+    print(f"\nUsuarios: {len(USUARIOS)} | Repeticoes: {REPETICOES} | Tamanhos de pagina: {TAMANHOS_PAGINA}")
+    print(f"Modo de conexao: {MODO_CONEXAO} (pool: {TAMANHO_POOL}) | Ritmo: {MODO_RITMO}")
+    print(f"Protocolo: {PROTOCOLO_HTTP} | Compressao: {COMPRESSAO or 'padrao'} | JSON: {DECODIFICADOR_JSON}")
+    abrir_cassete()
+    iniciar_metricas_vivo()
+    print(f"Gravando metricas em: {ARQUIVO_TAMANHOS_PAGINA}")
+    funcao_decodificar(DECODIFICADOR_JSON)
+
+    id_execucao = 1
+    gravadores.clear()
+    gravadores['tamanho_pagina'] = GravadorMetricas(ARQUIVO_TAMANHOS_PAGINA, CAMPOS_CSV_TAMANHO_PAGINA)
+
+    sessao = criar_sessao(MODO_CONEXAO, TAMANHO_POOL, KEEPALIVE_EXPIRY, compressao=COMPRESSAO,
+                          protocolo=PROTOCOLO_HTTP, cassete=cassete)
+
+    try:
+        consultas = planejar_tamanhos_pagina()
+        print(f"Consultas planejadas: {len(consultas)}")
+
+        for consulta in consultas:
+            tipo_api, consulta_tipo, func_name, user, repo, repeticao, tamanho_pagina = consulta
+            backend = backends[tipo_api]
+            montar = lambda: backend.montar_requisicao_pagina(func_name, user, repo, tamanho_pagina)
+            backend.agendador.aguardar()
+
+            with medir_fases() as rastreador:
+                inicio = time.perf_counter_ns()
+                response = _requisitar_com_retry(backend, montar)
+                tempo_resposta_ms = ms_desde(inicio)
+            registrar_tamanho_pagina(consulta, tempo_resposta_ms, response, rastreador.resultado())
+
+            concluir_requisicao(backend, response)
+    finally:
+        gravadores['tamanho_pagina'].fechar()
+        sessao.close()
+
+    gravador = gravadores['tamanho_pagina']
+    if gravador.total:
+        print(f"\nTotal: {gravador.total} | Sucesso: {gravador.sucesso} ({gravador.sucesso/gravador.total*100:.1f}%)")
+    print("Experimento concluido.")
+
+
+def main():
+    import graphQL
+    import scriptRest
+
+    print("\nColeta Unificada REST + GraphQL - Coleta de Dados")
+    print("="*80)
+
+    executar_coleta([scriptRest, graphQL])
+
+
+if __name__ == "__main__":
+    main()
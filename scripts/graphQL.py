@@ -1,103 +1,107 @@
-import requests
-import time
-import csv
-import random
+import httpx
+import hashlib
+import json
+import re
 import sys
-from datetime import datetime
+import os
+from functools import lru_cache
 
-API_URL = "https://api.github.com/graphql"
+import coletor
+from agendador import CAMPO_RATE_LIMIT_GRAPHQL, AgendadorRateLimit, extrair_rate_limit_graphql
+from tokens import PoolTokens
+
+# GITHUB_BASE_URL permite apontar para o servidor_mock.py local
+BASE_URL = os.environ.get('GITHUB_BASE_URL', "https://api.github.com").rstrip('/')
+API_URL = f"{BASE_URL}/graphql"
 
 TOKENS = [
     "SEU_TOKEN_AQUI",
 ]
 
-current_token_index = 0
+# Tokens tambem podem vir do ambiente (separados por virgula), p.ex. em CI
+if os.environ.get('GITHUB_TOKENS'):
+    TOKENS = os.environ['GITHUB_TOKENS'].split(',')
+
+# Cada requisicao recebe o token com mais orcamento restante
+pool_tokens = PoolTokens(TOKENS, extrair_rate_limit_graphql)
 
 def get_headers():
-    global current_token_index
-    if not TOKENS or TOKENS[0] == "SEU_TOKEN_AQUI":
-        print("ERRO: Configure seu token GitHub no inicio do script.")
-        sys.exit(1)
-    
-    token = TOKENS[current_token_index]
-    current_token_index = (current_token_index + 1) % len(TOKENS)
+    # Tokens configurados sao checados em validar_tokens; reproduzindo um
+    # cassete nenhum token e necessario (o Authorization nem entra na chave)
+    token = 'cassete' if coletor.reproduzindo_cassete() else pool_tokens.obter()
     return {
         "Authorization": f"Bearer {token}",
         "Content-Type": "application/json",
         "Cache-Control": "no-cache"
     }
 
-USUARIOS = [
-    "bradfitz",
-    "dgtlmoon",
-    "aaronpowell",
-    "gtsteffaniak",
-    "junjiem",
-    "pawurb",
-    "stephenberry",
-    "mrgrain",
-    "me-no-dev",
-    "chitalian"
-]
+TIPO_API = 'GraphQL'
+ARQUIVO_METRICAS = '../dados/metricas_graphql.csv'
+
+# Modo lote: com TAMANHOS_LOTE preenchido (p.ex. [1, 5, 10, 25]), consultas
+# logicas de usuarios diferentes sao agrupadas com aliases num unico documento
+# por requisicao; os tamanhos sao intercalados na mesma coleta. Metricas por
+# consulta logica e por requisicao HTTP vao para arquivos proprios
+TAMANHOS_LOTE = []
+ARQUIVO_METRICAS_LOTE = '../dados/metricas_graphql_lote_consultas.csv'
+ARQUIVO_LOTES = '../dados/metricas_graphql_lote_requisicoes.csv'
+
+# Usuarios, repeticoes, concorrencia e modos de conexao/ritmo ficam em coletor.py
+
+# Orcamento de rate limit reservado e espacamento minimo entre envios
+MARGEM_RATE_LIMIT = 50
+INTERVALO_MINIMO = 0.0
 
-REPETICOES = 33
+agendador = AgendadorRateLimit(pool_tokens, MARGEM_RATE_LIMIT, INTERVALO_MINIMO)
 
 def validar_tokens():
     if not TOKENS or TOKENS[0] == "SEU_TOKEN_AQUI":
         print("ERRO: Lista de tokens vazia ou nao configurada.")
         return False
-    
-    tokens_validos = 0
-    for i, token in enumerate(TOKENS):
-        try:
-            test_query = '{ viewer { login } }'
-            response = requests.post(
-                API_URL,
-                headers={
-                    "Authorization": f"Bearer {token}",
-                    "Content-Type": "application/json"
-                },
-                json={"query": test_query},
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if 'data' in data and 'viewer' in data['data']:
-                    tokens_validos += 1
-        except Exception:
-            pass
-    
+
+    tokens_validos = pool_tokens.validar(checar_token)
+    print(f"Tokens validos: {tokens_validos}/{len(TOKENS)}")
+
     if tokens_validos == 0:
         return False
-    
+
     return True
 
-def fazer_requisicao_com_retry(url, headers, data, max_tentativas=3):
-    for tentativa in range(max_tentativas):
-        try:
-            return requests.post(url, headers=headers, json=data, timeout=30)
-        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
-            if tentativa < max_tentativas - 1:
-                time.sleep(5)
-            else:
-                raise
-
-def query_repos(username):
-    return f"""
-    {{
-      user(login: "{username}") {{
-        repositories(first: 10, privacy: PUBLIC, orderBy: {{field: STARGAZERS, direction: DESC}}) {{
-          nodes {{
+def checar_token(token):
+    test_query = '{ viewer { login } ' + CAMPO_RATE_LIMIT_GRAPHQL + ' }'
+    # Fora da sessao da coleta: a validacao nao entra no pool medido nem no cassete
+    response = httpx.post(
+        API_URL,
+        headers={
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        },
+        json={"query": test_query},
+        timeout=10
+    )
+
+    if response.status_code == 200:
+        data = response.json()
+        if 'data' in data and 'viewer' in data['data']:
+            return True, response
+    return False, response
+
+# Documentos estaticos, montados uma unica vez; usuario e repositorio vao
+# nas variaveis
+QUERY_REPOS = """
+    query Repos($login: String!) {
+      user(login: $login) {
+        repositories(first: 10, privacy: PUBLIC, orderBy: {field: STARGAZERS, direction: DESC}) {
+          nodes {
             name
             description
             url
             homepageUrl
             stargazerCount
             forkCount
-            watchers {{
+            watchers {
               totalCount
-            }}
+            }
             createdAt
             updatedAt
             pushedAt
@@ -105,49 +109,48 @@ def query_repos(username):
             isFork
             isArchived
             isDisabled
-            primaryLanguage {{
+            primaryLanguage {
               name
               color
-            }}
-            licenseInfo {{
+            }
+            licenseInfo {
               name
               spdxId
-            }}
-            owner {{
+            }
+            owner {
               login
               avatarUrl
-            }}
-            defaultBranchRef {{
+            }
+            defaultBranchRef {
               name
-            }}
-            issues {{
+            }
+            issues {
               totalCount
-            }}
-            pullRequests {{
+            }
+            pullRequests {
               totalCount
-            }}
+            }
             diskUsage
             hasIssuesEnabled
             hasWikiEnabled
-          }}
-        }}
-      }}
-    }}
+          }
+        }
+      }
+    }
     """
 
-def query_repo_details(username, repo_name):
-    return f"""
-    {{
-      repository(owner: "{username}", name: "{repo_name}") {{
+QUERY_REPO_DETAILS = """
+    query RepoDetails($owner: String!, $name: String!) {
+      repository(owner: $owner, name: $name) {
         name
         description
         url
         homepageUrl
         stargazerCount
         forkCount
-        watchers {{
+        watchers {
           totalCount
-        }}
+        }
         createdAt
         updatedAt
         pushedAt
@@ -155,72 +158,71 @@ def query_repo_details(username, repo_name):
         isFork
         isArchived
         isTemplate
-        primaryLanguage {{
+        primaryLanguage {
           name
           color
-        }}
-        languages(first: 10) {{
-          edges {{
+        }
+        languages(first: 10) {
+          edges {
             size
-            node {{
+            node {
               name
               color
-            }}
-          }}
-        }}
-        licenseInfo {{
+            }
+          }
+        }
+        licenseInfo {
           name
           key
           spdxId
           url
-        }}
-        owner {{
+        }
+        owner {
           login
           avatarUrl
           url
-        }}
-        defaultBranchRef {{
+        }
+        defaultBranchRef {
           name
-          target {{
-            ... on Commit {{
+          target {
+            ... on Commit {
               oid
               messageHeadline
               committedDate
-            }}
-          }}
-        }}
-        repositoryTopics(first: 10) {{
-          nodes {{
-            topic {{
+            }
+          }
+        }
+        repositoryTopics(first: 10) {
+          nodes {
+            topic {
               name
-            }}
-          }}
-        }}
-        issues {{
+            }
+          }
+        }
+        issues {
           totalCount
-        }}
-        pullRequests {{
+        }
+        pullRequests {
           totalCount
-        }}
-        releases {{
+        }
+        releases {
           totalCount
-        }}
+        }
         diskUsage
         hasIssuesEnabled
         hasProjectsEnabled
         hasWikiEnabled
         openGraphImageUrl
         usesCustomOpenGraphImage
-      }}
-    }}
+      }
+    }
     """
 
-def query_repo_issues(username, repo_name):
-    return f"""
-    {{
-      repository(owner: "{username}", name: "{repo_name}") {{
-        issues(first: 10, orderBy: {{field: CREATED_AT, direction: DESC}}) {{
-          nodes {{
+QUERY_REPO_ISSUES = """
+    query RepoIssues($owner: String!, $name: String!) {
+      repository(owner: $owner, name: $name) {
+        issues(first: 10, orderBy: {field: CREATED_AT, direction: DESC}) {
+          nodes {
             number
             title
             body
@@ -229,136 +231,233 @@ def query_repo_issues(username, repo_name):
             closedAt
             state
             url
-            author {{
+            author {
               login
               avatarUrl
               url
-            }}
+            }
             authorAssociation
-            labels(first: 10) {{
-              nodes {{
+            labels(first: 10) {
+              nodes {
                 name
                 color
                 description
-              }}
-            }}
-            assignees(first: 5) {{
-              nodes {{
+              }
+            }
+            assignees(first: 5) {
+              nodes {
                 login
                 avatarUrl
-              }}
-            }}
-            comments {{
+              }
+            }
+            comments {
               totalCount
-            }}
-            reactions {{
+            }
+            reactions {
               totalCount
-            }}
-            milestone {{
+            }
+            milestone {
               title
               number
               state
-            }}
+            }
             locked
             activeLockReason
-          }}
-        }}
-      }}
-    }}
+          }
+        }
+      }
+    }
     """
 
-metricas_data = []
-id_execucao = 1
+CONSULTAS = [
+    ('C1', 'query_repos'),
+    ('C2', 'query_repo_details'),
+    ('C3', 'query_repo_issues')
+]
+
+FUNCAO_DESCOBERTA = 'query_repos'
+
+DOCUMENTOS = {
+    'query_repos': QUERY_REPOS,
+    'query_repo_details': QUERY_REPO_DETAILS,
+    'query_repo_issues': QUERY_REPO_ISSUES
+}
+
+# Variante com o custo e o orcamento restante pedidos junto com os dados
+# (acrescenta algumas dezenas de bytes a cada resposta), usada no ritmo adaptativo
+def _com_rate_limit(documento):
+    return documento.replace('{', '{\n      ' + CAMPO_RATE_LIMIT_GRAPHQL, 1)
+
+DOCUMENTOS_RATE_LIMIT = {func_name: _com_rate_limit(documento) for func_name, documento in DOCUMENTOS.items()}
+
+# Varredura paginada (coletor.MODO_VARREDURA): a conexao de cada consulta
+# passa a receber $first/$after e a devolver o pageInfo
+CONSULTAS_PAGINADAS = [
+    ('C1', 'query_repos'),
+    ('C3', 'query_repo_issues')
+]
+
+CONEXOES_PAGINADAS = {
+    'query_repos': ('user', 'repositories'),
+    'query_repo_issues': ('repository', 'issues')
+}
+
+def _paginado(documento, conexao):
+    cabecalho, _, corpo = documento.partition('{')
+    cabecalho = re.sub(r'query (\w+)\((.*)\)', r'query \1Pagina(\2, $first: Int!, $after: String)', cabecalho)
+    corpo = re.sub(rf'{conexao}\(first: \d+', f'{conexao}(first: $first, after: $after', corpo, count=1)
+    corpo = re.sub(r'( *)nodes \{',
+                   lambda m: f"{m[1]}pageInfo {{\n{m[1]}  hasNextPage\n{m[1]}  endCursor\n{m[1]}}}\n{m[1]}nodes {{",
+                   corpo, count=1)
+    return f"{cabecalho}{{{corpo}"
+
+DOCUMENTOS_PAGINA = {
+    func_name: _paginado(DOCUMENTOS[func_name], conexao)
+    for func_name, (_, conexao) in CONEXOES_PAGINADAS.items()
+}
+DOCUMENTOS_PAGINA_RATE_LIMIT = {func_name: _com_rate_limit(documento) for func_name, documento in DOCUMENTOS_PAGINA.items()}
+
+HASHES_DOCUMENTOS = {
+    documento: hashlib.sha256(documento.encode('utf-8')).hexdigest()
+    for documento in [*DOCUMENTOS.values(), *DOCUMENTOS_RATE_LIMIT.values(),
+                      *DOCUMENTOS_PAGINA.values(), *DOCUMENTOS_PAGINA_RATE_LIMIT.values()]
+}
+
+# Persisted queries (protocolo APQ): o documento completo vai so na primeira
+# requisicao, junto com o hash; nas seguintes apenas o hash e as variaveis.
+# A API publica do GitHub nao suporta; use com o servidor_mock.py ou um proxy
+# compativel
+PERSISTED_QUERIES = False
+
+documentos_enviados = set()
+
+def montar_variaveis(func_name, user, repo):
+    if func_name == 'query_repos':
+        return {'login': user}
+    return {'owner': user, 'name': repo}
+
+def _corpo(documento, hash_documento, variaveis):
+    data = {"query": documento, "variables": variaveis}
+
+    if PERSISTED_QUERIES:
+        data['extensions'] = {'persistedQuery': {'version': 1, 'sha256Hash': hash_documento}}
+        if documento in documentos_enviados:
+            del data['query']
+        documentos_enviados.add(documento)
+
+    return data
+
+def montar_requisicao(func_name, user, repo):
+    documentos = DOCUMENTOS_RATE_LIMIT if agendador.adaptativo else DOCUMENTOS
+    documento = documentos[func_name]
+    data = _corpo(documento, HASHES_DOCUMENTOS[documento], montar_variaveis(func_name, user, repo))
+    return 'POST', API_URL, {'headers': get_headers(), 'json': data}
+
+def montar_requisicao_pagina(func_name, user, repo, tamanho_pagina, cursor=None):
+    """Pagina seguinte ao `cursor` (pageInfo.endCursor da anterior; None na primeira)"""
+    documentos = DOCUMENTOS_PAGINA_RATE_LIMIT if agendador.adaptativo else DOCUMENTOS_PAGINA
+    documento = documentos[func_name]
+    variaveis = {**montar_variaveis(func_name, user, repo), 'first': tamanho_pagina, 'after': cursor}
+    data = _corpo(documento, HASHES_DOCUMENTOS[documento], variaveis)
+    return 'POST', API_URL, {'headers': get_headers(), 'json': data}
+
+def _conexao(func_name, response):
+    if response.status_code != 200:
+        return None
+    raiz, conexao = CONEXOES_PAGINADAS[func_name]
+    objeto = (response.json().get('data') or {}).get(raiz)
+    return objeto[conexao] if objeto else None
+
+def proxima_pagina(func_name, response):
+    # Cursores sao opacos: a pagina seguinte so e conhecida depois da resposta,
+    # entao nao ha paginas_seguintes para pedir em paralelo
+    conexao = _conexao(func_name, response)
+    if not conexao or not conexao['pageInfo']['hasNextPage']:
+        return None
+    return conexao['pageInfo']['endCursor']
+
+def itens_pagina(func_name, response):
+    conexao = _conexao(func_name, response)
+    return len(conexao['nodes']) if conexao else 0
+
+_VARIAVEL = re.compile(r'\$(\w+)')
+
+@lru_cache(maxsize=256)
+def montar_documento_lote(func_names, com_rate_limit):
+    """Documento com um alias (c0, c1, ...) por consulta; as variaveis de cada
+    uma ganham o indice como sufixo. Cacheado por composicao do lote."""
+    definicoes = []
+    selecoes = []
+    for i, func_name in enumerate(func_names):
+        cabecalho, _, corpo = DOCUMENTOS[func_name].partition('{')
+        sufixar = lambda m, i=i: f"${m.group(1)}_{i}"
+        definicoes.append(_VARIAVEL.sub(sufixar, cabecalho[cabecalho.index('(') + 1:cabecalho.rindex(')')]))
+        selecoes.append(f"      c{i}: " + _VARIAVEL.sub(sufixar, corpo[:corpo.rindex('}')].strip()))
+
+    if com_rate_limit:
+        selecoes.insert(0, '      ' + CAMPO_RATE_LIMIT_GRAPHQL)
+
+    documento = f"query Lote({', '.join(definicoes)}) {{\n" + "\n".join(selecoes) + "\n    }"
+    return documento, hashlib.sha256(documento.encode('utf-8')).hexdigest()
+
+def montar_requisicao_lote(itens):
+    """`itens`: lista de (func_name, user, repo)"""
+    documento, hash_documento = montar_documento_lote(tuple(item[0] for item in itens), agendador.adaptativo)
+    variaveis = {}
+    for i, (func_name, user, repo) in enumerate(itens):
+        for nome, valor in montar_variaveis(func_name, user, repo).items():
+            variaveis[f"{nome}_{i}"] = valor
+
+    data = _corpo(documento, hash_documento, variaveis)
+    return 'POST', API_URL, {'headers': get_headers(), 'json': data}
+
+def separar_resposta_lote(response, quantidade):
+    """(sucesso, bytes da resposta) de cada alias do lote"""
+    if response.status_code != 200:
+        return [(False, 0)] * quantidade
+
+    result = response.json()
+    data = result.get('data') or {}
+    com_erro = {erro['path'][0] for erro in result.get('errors', []) if erro.get('path')}
+
+    partes = []
+    for i in range(quantidade):
+        alias = f"c{i}"
+        valor = data.get(alias)
+        tamanho = len(json.dumps({alias: valor}, separators=(',', ':')))
+        partes.append((valor is not None and alias not in com_erro, tamanho))
+    return partes
+
+def precisa_reenviar(response):
+    # O servidor nao conhece (ou esqueceu) o hash: reenvia com o documento completo
+    if not PERSISTED_QUERIES or b'PersistedQueryNotFound' not in response.content:
+        return False
+    documentos_enviados.clear()
+    return True
+
+def extrair_repo_mais_popular(response):
+    if response.status_code != 200:
+        return None
+
+    result = response.json()
+    if 'data' not in result or not result['data'] or not result['data']['user']:
+        return None
+
+    repos = result['data']['user']['repositories']['nodes']
+    if not repos:
+        return None
+
+    repo_mais_popular = max(repos, key=lambda x: x['stargazerCount'])
+    return repo_mais_popular['name']
 
 def main():
-    global id_execucao
-    
     print("\nScript GraphQL - Coleta de Dados")
     print("="*80)
-    
-    if not validar_tokens():
-        print("ERRO: Tokens invalidos.")
-        sys.exit(1)
-    
-    print(f"\nUsuarios: {len(USUARIOS)} | Repeticoes: {REPETICOES} | Total: {len(USUARIOS) * REPETICOES * 3}")
-    
-    for usuario in USUARIOS:
-        print(f"\nProcessando usuario: {usuario}")
-        
-        data = {"query": query_repos(usuario)}
-        response = fazer_requisicao_com_retry(API_URL, get_headers(), data)
-        time.sleep(random.uniform(1, 3))
-        
-        if response.status_code != 200:
-            continue
-        
-        result = response.json()
-        if 'data' not in result or not result['data'] or not result['data']['user']:
-            continue
-        
-        repos = result['data']['user']['repositories']['nodes']
-        if not repos:
-            continue
-        
-        repo_mais_popular = max(repos, key=lambda x: x['stargazerCount'])
-        repo_name = repo_mais_popular['name']
-        
-        consultas = []
-        for i in range(REPETICOES):
-            consultas.extend([
-                ('C1', 'query_repos', usuario, None),
-                ('C2', 'query_repo_details', usuario, repo_name),
-                ('C3', 'query_repo_issues', usuario, repo_name)
-            ])
-        
-        random.shuffle(consultas)
-        
-        total = len(consultas)
-        
-        for consulta_tipo, func_name, user, repo in consultas:
-            start_time = time.time()
-            
-            if func_name == 'query_repos':
-                query = query_repos(user)
-            elif func_name == 'query_repo_details':
-                query = query_repo_details(user, repo)
-            elif func_name == 'query_repo_issues':
-                query = query_repo_issues(user, repo)
-            
-            data = {"query": query}
-            response = fazer_requisicao_com_retry(API_URL, get_headers(), data)
-            
-            tempo_resposta_ms = (time.time() - start_time) * 1000
-            tamanho_resposta_kb = len(response.content) / 1024
-            
-            metricas_data.append({
-                'id_execucao': id_execucao,
-                'usuario': user,
-                'consulta': consulta_tipo,
-                'tipo_api': 'GraphQL',
-                'tempo_resposta_ms': round(tempo_resposta_ms, 2),
-                'tamanho_resposta_kb': round(tamanho_resposta_kb, 2),
-                'status_code': response.status_code,
-                'timestamp': datetime.now().isoformat(),
-                'observacoes': 'OK' if response.status_code == 200 else f'Erro {response.status_code}'
-            })
-            
-            id_execucao += 1
-            
-            time.sleep(random.uniform(1, 3))
-    
-    print("\nSalvando metricas em CSV...")
-    
-    with open('../dados/metricas_graphql.csv', 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['id_execucao', 'usuario', 'consulta', 'tipo_api', 'tempo_resposta_ms', 
-                      'tamanho_resposta_kb', 'status_code', 'timestamp', 'observacoes']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(metricas_data)
-    
-    sucesso = len([m for m in metricas_data if m['status_code'] == 200])
-    print(f"\nTotal: {len(metricas_data)} | Sucesso: {sucesso} ({sucesso/len(metricas_data)*100:.1f}%)")
-    print("Experimento concluido.")
+
+    if TAMANHOS_LOTE:
+        coletor.executar_lotes(sys.modules[__name__])
+    else:
+        coletor.executar_coleta([sys.modules[__name__]])
 
 if __name__ == "__main__":
     main()
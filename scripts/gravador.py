@@ -0,0 +1,215 @@
+"""
+Gravacao incremental das metricas em CSV, segura contra quedas, e copia
+colunar opcional em Parquet particionado
+"""
+
+import csv
+import io
+import os
+import time
+from datetime import datetime, timezone
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Colunas de texto repetitivo: dicionario (inteiros + tabela de valores) no Parquet
+COLUNAS_CATEGORICAS = ('usuario', 'consulta', 'tipo_api', 'observacoes', 'modo_conexao', 'cache',
+                       'content_encoding', 'protocolo', 'decodificador_json')
+COLUNAS_INTEIRAS = ('id_execucao', 'repeticao', 'status_code', 'id_lote', 'tamanho_lote')
+
+# Bytes lidos por vez ao procurar a ultima linha completa de um CSV existente
+BLOCO_REPARO = 64 * 1024
+
+# Colunas que viram diretorios (hive: execucao=.../tipo_api=.../consulta=...)
+PARTICOES_PARQUET = ('tipo_api', 'consulta')
+
+
+class GravadorMetricas:
+    """Grava cada linha assim que ela e produzida, com memoria constante.
+
+    As linhas ficam num buffer pequeno e vao para o disco sempre inteiras
+    (flush so em fronteira de linha); a cada `linhas_fsync` linhas ou
+    `intervalo_fsync` segundos o arquivo e sincronizado. Ao abrir um arquivo
+    existente, uma ultima linha incompleta (queda no meio de uma escrita) e
+    descartada, entao o CSV no disco e sempre valido.
+    """
+
+    def __init__(self, caminho, campos, anexar=False, linhas_fsync=100, intervalo_fsync=5.0):
+        self.caminho = caminho
+        self.campos = list(campos)
+        self.linhas_fsync = linhas_fsync
+        self.intervalo_fsync = intervalo_fsync
+        self.total = 0
+        self.sucesso = 0
+        self._buffer = []
+        self._pendentes = 0
+        self._ultimo_fsync = time.monotonic()
+
+        os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+
+        if anexar and os.path.exists(caminho):
+            self._reparar()
+        else:
+            with open(caminho, 'w', encoding='utf-8'):
+                pass
+
+        self._fd = os.open(caminho, os.O_WRONLY | os.O_APPEND)
+
+        if os.path.getsize(caminho) == 0:
+            self._buffer.append(self._formatar(dict(zip(self.campos, self.campos))))
+            self._descarregar(sincronizar=True)
+
+    def _reparar(self):
+        # Le so o final do arquivo, de tras para frente, ate o ultimo '\n'
+        with open(self.caminho, 'rb+') as f:
+            fim = f.seek(0, os.SEEK_END)
+            posicao = fim
+            while posicao > 0:
+                inicio = max(posicao - BLOCO_REPARO, 0)
+                f.seek(inicio)
+                bloco = f.read(posicao - inicio)
+                if posicao == fim and bloco.endswith(b'\n'):
+                    return
+                quebra = bloco.rfind(b'\n')
+                if quebra >= 0:
+                    f.truncate(inicio + quebra + 1)
+                    return
+                posicao = inicio
+            f.truncate(0)
+
+    def _formatar(self, linha):
+        saida = io.StringIO()
+        csv.DictWriter(saida, fieldnames=self.campos, extrasaction='ignore').writerow(linha)
+        return saida.getvalue()
+
+    def _descarregar(self, sincronizar=False):
+        if self._buffer:
+            dados = ''.join(self._buffer).encode('utf-8')
+            self._buffer.clear()
+            while dados:
+                escritos = os.write(self._fd, dados)
+                dados = dados[escritos:]
+
+        if sincronizar:
+            os.fsync(self._fd)
+            self._pendentes = 0
+            self._ultimo_fsync = time.monotonic()
+
+    def escrever(self, linha):
+        self._buffer.append(self._formatar(linha))
+        self._pendentes += 1
+        self.total += 1
+        # 304: revalidacao de cache bem-sucedida
+        if linha.get('status_code') in (200, 304):
+            self.sucesso += 1
+
+        if len(self._buffer) >= 16:
+            self._descarregar()
+
+        if self._pendentes >= self.linhas_fsync or time.monotonic() - self._ultimo_fsync >= self.intervalo_fsync:
+            self._descarregar(sincronizar=True)
+
+    def fechar(self):
+        if self._fd is None:
+            return
+        self._descarregar(sincronizar=True)
+        os.close(self._fd)
+        self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+class GravadorParquet:
+    """Copia colunar das metricas em <diretorio>/execucao=<id>/tipo_api=<api>/
+    consulta=<consulta>/*.parquet.
+
+    Categoricas sao gravadas como dicionario, o timestamp como inteiro de 64
+    bits (microssegundos UTC) e as demais colunas como float64. As linhas ficam
+    em memoria por particao e viram um arquivo a cada `linhas_por_arquivo`
+    linhas e no fechamento; somadas todas as particoes, nunca passam de
+    `max_linhas_em_memoria` (a maior particao e descarregada antes). O CSV
+    continua sendo a fonte de verdade (retomada, shards), entao uma queda
+    perde no maximo as linhas ainda em memoria.
+    """
+
+    def __init__(self, diretorio, execucao, campos, linhas_por_arquivo=5000, max_linhas_em_memoria=20000):
+        if pa is None:
+            raise RuntimeError("Saida Parquet requer o pacote pyarrow")
+        self.diretorio = diretorio
+        self.execucao = execucao
+        self.campos = [campo for campo in campos if campo not in PARTICOES_PARQUET]
+        self.linhas_por_arquivo = linhas_por_arquivo
+        self.max_linhas_em_memoria = max_linhas_em_memoria
+        self.total = 0
+        self._em_memoria = 0
+        self.arquivos = 0
+        self._particoes = {}
+        # Nome unico por processo: retomadas e shards anexam arquivos novos
+        self._prefixo = f"parte-{datetime.now():%Y%m%dT%H%M%S}-{os.getpid()}"
+        self.schema = pa.schema([(campo, self._tipo(campo)) for campo in self.campos])
+
+    @staticmethod
+    def _tipo(campo):
+        if campo in COLUNAS_CATEGORICAS:
+            return pa.dictionary(pa.int32(), pa.string())
+        if campo in COLUNAS_INTEIRAS:
+            return pa.int64()
+        if campo == 'timestamp':
+            return pa.timestamp('us', tz='UTC')
+        return pa.float64()
+
+    @staticmethod
+    def _valor(campo, valor):
+        if valor is None or valor == '':
+            return None
+        if campo == 'timestamp':
+            # Hora local sem fuso (isoformat do coletor) -> UTC
+            return datetime.fromisoformat(valor).astimezone(timezone.utc)
+        if campo in COLUNAS_CATEGORICAS:
+            return str(valor)
+        return valor
+
+    def escrever(self, linha):
+        particao = tuple(str(linha[campo]) for campo in PARTICOES_PARQUET)
+        linhas = self._particoes.setdefault(particao, [])
+        linhas.append(linha)
+        self.total += 1
+        self._em_memoria += 1
+        if len(linhas) >= self.linhas_por_arquivo:
+            self._descarregar(particao)
+        elif self._em_memoria >= self.max_linhas_em_memoria:
+            self._descarregar(max(self._particoes, key=lambda chave: len(self._particoes[chave])))
+
+    def _descarregar(self, particao):
+        linhas = self._particoes.pop(particao, [])
+        if not linhas:
+            return
+        self._em_memoria -= len(linhas)
+        colunas = {
+            campo: pa.array([self._valor(campo, linha.get(campo)) for linha in linhas], type=self.schema.field(campo).type)
+            for campo in self.campos
+        }
+        pasta = os.path.join(self.diretorio, f"execucao={self.execucao}",
+                             *(f"{nome}={valor}" for nome, valor in zip(PARTICOES_PARQUET, particao)))
+        os.makedirs(pasta, exist_ok=True)
+        self.arquivos += 1
+        pq.write_table(pa.table(colunas, schema=self.schema),
+                       os.path.join(pasta, f"{self._prefixo}-{self.arquivos:04d}.parquet"),
+                       compression='zstd')
+
+    def fechar(self):
+        for particao in list(self._particoes):
+            self._descarregar(particao)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
@@ -0,0 +1,166 @@
+"""
+Histogramas de latencia no estilo HDR, mesclaveis e com memoria constante
+"""
+
+import csv
+import json
+import os
+
+# 3 digitos significativos: 2048 sub-buckets por potencia de 2 (erro <= 0,1%)
+BITS_SUB_BUCKET = 11
+SUB_BUCKETS = 1 << BITS_SUB_BUCKET
+METADE_SUB_BUCKETS = SUB_BUCKETS // 2
+
+# Latencias registradas em microssegundos inteiros
+UNIDADES_POR_MS = 1000
+
+PERCENTIS_CAUDA = (50, 90, 99, 99.9)
+
+
+def _indice(valor):
+    if valor < SUB_BUCKETS:
+        return valor
+    expoente = valor.bit_length() - BITS_SUB_BUCKET
+    return (expoente + 1) * METADE_SUB_BUCKETS + (valor >> expoente) - METADE_SUB_BUCKETS
+
+
+def _maior_equivalente(indice):
+    """Maior valor que cai no mesmo bucket de `indice`"""
+    if indice < SUB_BUCKETS:
+        return indice
+    expoente = indice // METADE_SUB_BUCKETS - 1
+    sub_bucket = indice % METADE_SUB_BUCKETS + METADE_SUB_BUCKETS
+    return ((sub_bucket + 1) << expoente) - 1
+
+
+class HistogramaHDR:
+    """Contagens por bucket log-linear; o tamanho depende da faixa de
+    valores, nao do numero de amostras. Dois histogramas se mesclam somando
+    as contagens, sem perda."""
+
+    def __init__(self):
+        self.contagens = {}
+        self.total = 0
+        self.minimo = None
+        self.maximo = None
+
+    def registrar(self, tempo_ms):
+        valor = max(0, round(tempo_ms * UNIDADES_POR_MS))
+        indice = _indice(valor)
+        self.contagens[indice] = self.contagens.get(indice, 0) + 1
+        self.total += 1
+        self.minimo = valor if self.minimo is None else min(self.minimo, valor)
+        self.maximo = valor if self.maximo is None else max(self.maximo, valor)
+
+    def mesclar(self, outro):
+        for indice, contagem in outro.contagens.items():
+            self.contagens[indice] = self.contagens.get(indice, 0) + contagem
+        self.total += outro.total
+        for valor in (outro.minimo, outro.maximo):
+            if valor is not None:
+                self.minimo = valor if self.minimo is None else min(self.minimo, valor)
+                self.maximo = valor if self.maximo is None else max(self.maximo, valor)
+        return self
+
+    def percentil(self, p):
+        """Percentil em ms (limite superior do bucket, como no HdrHistogram)"""
+        if self.total == 0:
+            return None
+        alvo = max(1, -(-self.total * p // 100))
+        acumulado = 0
+        for indice in sorted(self.contagens):
+            acumulado += self.contagens[indice]
+            if acumulado >= alvo:
+                return min(_maior_equivalente(indice), self.maximo) / UNIDADES_POR_MS
+        return self.maximo / UNIDADES_POR_MS
+
+    def para_dict(self):
+        return {
+            'contagens': {str(indice): contagem for indice, contagem in sorted(self.contagens.items())},
+            'total': self.total,
+            'minimo': self.minimo,
+            'maximo': self.maximo
+        }
+
+    @classmethod
+    def de_dict(cls, dados):
+        histograma = cls()
+        histograma.contagens = {int(indice): contagem for indice, contagem in dados['contagens'].items()}
+        histograma.total = dados['total']
+        histograma.minimo = dados['minimo']
+        histograma.maximo = dados['maximo']
+        return histograma
+
+
+def caminho_histogramas(caminho_csv):
+    """Arquivo de histogramas gravado ao lado do CSV de metricas"""
+    return caminho_csv.replace('.csv', '.hdr.json')
+
+
+class HistogramasLatencia:
+    """Um HistogramaHDR por (tipo_api, consulta, usuario)"""
+
+    def __init__(self, caminho, histogramas=None):
+        self.caminho = caminho
+        self.histogramas = histogramas or {}
+
+    @staticmethod
+    def chave(tipo_api, consulta, usuario):
+        return f"{tipo_api}|{consulta}|{usuario}"
+
+    def registrar(self, tipo_api, consulta, usuario, tempo_ms):
+        chave = self.chave(tipo_api, consulta, usuario)
+        if chave not in self.histogramas:
+            self.histogramas[chave] = HistogramaHDR()
+        self.histogramas[chave].registrar(tempo_ms)
+
+    def mesclar(self, outro):
+        for chave, histograma in outro.histogramas.items():
+            self.histogramas.setdefault(chave, HistogramaHDR()).mesclar(histograma)
+        return self
+
+    def agrupar(self, tipo_api=None, consulta=None, usuario=None):
+        """Mescla os histogramas que casam com os campos informados"""
+        resultado = HistogramaHDR()
+        for chave, histograma in self.histogramas.items():
+            api_chave, consulta_chave, usuario_chave = chave.split('|', 2)
+            if tipo_api not in (None, api_chave) or consulta not in (None, consulta_chave):
+                continue
+            if usuario not in (None, usuario_chave):
+                continue
+            resultado.mesclar(histograma)
+        return resultado
+
+    @classmethod
+    def carregar(cls, caminho):
+        with open(caminho, encoding='utf-8') as f:
+            dados = json.load(f)
+        histogramas = {chave: HistogramaHDR.de_dict(h) for chave, h in dados['histogramas'].items()}
+        return cls(caminho, histogramas)
+
+    @classmethod
+    def de_csv(cls, caminho_csv, caminho=None):
+        """Reconstroi a partir do CSV (fonte de verdade ao retomar uma coleta)"""
+        histogramas = cls(caminho or caminho_histogramas(caminho_csv))
+        if not os.path.exists(caminho_csv):
+            return histogramas
+
+        with open(caminho_csv, newline='', encoding='utf-8') as f:
+            for linha in csv.DictReader(f):
+                if linha['status_code'] in ('200', '304') and linha.get('tempo_resposta_ms'):
+                    histogramas.registrar(linha['tipo_api'], linha['consulta'], linha['usuario'],
+                                          float(linha['tempo_resposta_ms']))
+        return histogramas
+
+    def salvar(self):
+        dados = {
+            'unidade': 'us',
+            'bits_sub_bucket': BITS_SUB_BUCKET,
+            'histogramas': {chave: h.para_dict() for chave, h in sorted(self.histogramas.items())}
+        }
+        temporario = f"{self.caminho}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(dados, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, self.caminho)
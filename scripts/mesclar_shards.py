@@ -0,0 +1,125 @@
+"""
+Mescla os CSVs de metricas de uma coleta distribuida (coletor.py com
+COLETA_SHARD) num unico metricas_*.csv
+
+Uso:
+    python mesclar_shards.py                 # metricas_rest e metricas_graphql em ../dados
+    python mesclar_shards.py destino.csv shard1.csv shard2.csv ...
+
+As linhas saem em ordem global de horario, com o timestamp corrigido pelo
+desvio do relogio de cada shard (interpolado entre as medidas de inicio e
+fim) e convertido para UTC; id_execucao e renumerado e a origem de cada linha
+fica nas colunas de proveniencia. Os histogramas HDR dos shards sao somados.
+"""
+
+import csv
+import glob
+import heapq
+import json
+import os
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+
+from gravador import GravadorMetricas
+from histograma import HistogramasLatencia, caminho_histogramas
+from relogio import offset_em
+
+ARQUIVOS_PADRAO = ['../dados/metricas_rest.csv', '../dados/metricas_graphql.csv']
+
+CAMPOS_PROVENIENCIA = ['shard', 'no', 'id_execucao_shard', 'timestamp_local', 'offset_relogio_ms']
+
+
+def listar_shards(caminho_csv):
+    """Shards de `caminho_csv` presentes no disco, em ordem de indice"""
+    base = caminho_csv[:-len('.csv')] if caminho_csv.endswith('.csv') else caminho_csv
+    padrao = re.compile(r'\.shard-(\d+)-de-(\d+)\.csv$')
+    arquivos = [arquivo for arquivo in glob.glob(f"{glob.escape(base)}.shard-*-de-*.csv") if padrao.search(arquivo)]
+    return sorted(arquivos, key=lambda arquivo: int(padrao.search(arquivo).group(1)))
+
+
+def ler_meta(caminho_csv):
+    caminho = caminho_csv.replace('.csv', '.meta.json')
+    if not os.path.exists(caminho):
+        print(f"   {caminho_csv}: sem metadados de relogio, timestamps usados sem correcao")
+        return {'shard': os.path.basename(caminho_csv), 'no': '', 'relogio': []}
+    with open(caminho, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _linhas_corrigidas(caminho_csv, meta):
+    """(instante corrigido, linha) na ordem do arquivo, que ja e cronologica"""
+    relogio = meta['relogio']
+    # Sem medida o fuso e o desta maquina (mesclagem local)
+    fuso = timezone(timedelta(seconds=relogio[0]['fuso_horario_s'])) if relogio else None
+
+    with open(caminho_csv, newline='', encoding='utf-8') as f:
+        for linha in csv.DictReader(f):
+            local = datetime.fromisoformat(linha['timestamp'])
+            if local.tzinfo is None:
+                local = local.replace(tzinfo=fuso) if fuso else local.astimezone()
+            instante = local.timestamp()
+            offset = offset_em(relogio, instante) if relogio else 0.0
+
+            linha['shard'] = meta['shard']
+            linha['no'] = meta['no']
+            linha['id_execucao_shard'] = linha['id_execucao']
+            linha['timestamp_local'] = linha['timestamp']
+            linha['offset_relogio_ms'] = round(offset * 1000, 1)
+            linha['timestamp'] = datetime.fromtimestamp(instante + offset, timezone.utc).isoformat()
+            yield instante + offset, linha
+
+
+def mesclar(arquivos, destino):
+    """Mescla os CSVs de shard `arquivos` em `destino` (memoria constante:
+    cada shard e lido em fluxo e intercalado por heapq.merge)"""
+    if not arquivos:
+        print(f"Nenhum shard encontrado para {destino}")
+        return 0
+
+    campos = []
+    for arquivo in arquivos:
+        with open(arquivo, newline='', encoding='utf-8') as f:
+            cabecalho = next(csv.reader(f), [])
+        campos.extend(campo for campo in cabecalho if campo not in campos)
+    campos.extend(CAMPOS_PROVENIENCIA)
+
+    metas = [ler_meta(arquivo) for arquivo in arquivos]
+    for arquivo, meta in zip(arquivos, metas):
+        for medida in meta['relogio']:
+            print(f"   {os.path.basename(arquivo)} ({meta['no']}): offset {medida['offset_s'] * 1000:.1f}ms via {medida['metodo']}")
+
+    fluxos = [_linhas_corrigidas(arquivo, meta) for arquivo, meta in zip(arquivos, metas)]
+    with GravadorMetricas(destino, campos) as gravador:
+        for id_execucao, (_, linha) in enumerate(heapq.merge(*fluxos, key=lambda item: item[0]), start=1):
+            linha['id_execucao'] = id_execucao
+            gravador.escrever(linha)
+        total = gravador.total
+
+    mesclados = HistogramasLatencia(caminho_histogramas(destino))
+    for arquivo in arquivos:
+        caminho = caminho_histogramas(arquivo)
+        if os.path.exists(caminho):
+            mesclados.mesclar(HistogramasLatencia.carregar(caminho))
+        else:
+            mesclados.mesclar(HistogramasLatencia.de_csv(arquivo))
+    mesclados.salvar()
+
+    print(f"{len(arquivos)} shard(s) -> {destino}: {total} linhas")
+    return total
+
+
+def main():
+    print("\nMesclagem de shards")
+    print("="*80)
+
+    if len(sys.argv) > 2:
+        mesclar(sys.argv[2:], sys.argv[1])
+        return
+
+    for destino in ARQUIVOS_PADRAO:
+        mesclar(listar_shards(destino), destino)
+
+
+if __name__ == "__main__":
+    main()
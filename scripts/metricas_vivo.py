@@ -0,0 +1,201 @@
+"""
+Metricas ao vivo da coleta: janela deslizante por (api, consulta) com
+requisicoes/s, percentis de latencia, bytes/s, erros e folga de rate limit,
+expostas em formato Prometheus (GET /metrics) e num painel no terminal
+"""
+
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from histograma import HistogramaHDR
+
+PERCENTIS_VIVO = (50, 95, 99)
+
+
+class _Segundo:
+    __slots__ = ('instante', 'requisicoes', 'erros', 'bytes', 'histograma')
+
+    def __init__(self, instante):
+        self.instante = instante
+        self.requisicoes = 0
+        self.erros = 0
+        self.bytes = 0
+        self.histograma = HistogramaHDR()
+
+
+class SerieDeslizante:
+    """Contadores dos ultimos `janela` segundos em baldes de 1s, mais totais
+    acumulados. `registrar` e O(1) (amortizado: cada balde sai da fila uma
+    vez); so a leitura mescla os baldes da janela."""
+
+    def __init__(self, janela):
+        self.janela = janela
+        self.baldes = deque()
+        self.inicio = None
+        self.status = {}
+        self.bytes = 0
+
+    def _descartar(self, segundo):
+        while self.baldes and self.baldes[0].instante <= segundo - self.janela:
+            self.baldes.popleft()
+
+    def registrar(self, agora, tempo_ms, tamanho, status):
+        segundo = int(agora)
+        if self.inicio is None:
+            self.inicio = agora
+        if not self.baldes or self.baldes[-1].instante != segundo:
+            self.baldes.append(_Segundo(segundo))
+            self._descartar(segundo)
+
+        balde = self.baldes[-1]
+        balde.requisicoes += 1
+        balde.bytes += tamanho
+        if status in (200, 304):
+            balde.histograma.registrar(tempo_ms)
+        else:
+            balde.erros += 1
+
+        self.status[status] = self.status.get(status, 0) + 1
+        self.bytes += tamanho
+
+    def resumo(self, agora):
+        self._descartar(int(agora))
+        histograma = HistogramaHDR()
+        requisicoes = erros = tamanho = 0
+        for balde in self.baldes:
+            histograma.mesclar(balde.histograma)
+            requisicoes += balde.requisicoes
+            erros += balde.erros
+            tamanho += balde.bytes
+
+        # No comeco da coleta a janela ainda nao esta cheia
+        duracao = max(min(self.janela, agora - self.inicio), 1.0)
+        return {
+            'requisicoes_s': requisicoes / duracao,
+            'bytes_s': tamanho / duracao,
+            'erros': erros,
+            'taxa_erros': erros / requisicoes if requisicoes else 0.0,
+            'percentis': {p: histograma.percentil(p) for p in PERCENTIS_VIVO}
+        }
+
+
+def _rotulos(**rotulos):
+    return '{' + ','.join(f'{nome}="{valor}"' for nome, valor in rotulos.items()) + '}'
+
+
+class MetricasVivo:
+    """Series por (api, consulta), seguras entre threads e tasks asyncio.
+
+    `folga()` (opcional) devolve {api: requisicoes restantes de rate limit}
+    e e chamada so na leitura.
+    """
+
+    def __init__(self, janela=60, folga=None):
+        self.janela = janela
+        self.folga = folga or dict
+        self.series = {}
+        self._lock = threading.Lock()
+        self._servidor = None
+        self._parado = threading.Event()
+
+    def registrar(self, tipo_api, consulta, tempo_ms, tamanho, status):
+        agora = time.monotonic()
+        with self._lock:
+            serie = self.series.get((tipo_api, consulta))
+            if serie is None:
+                serie = self.series[(tipo_api, consulta)] = SerieDeslizante(self.janela)
+            serie.registrar(agora, tempo_ms, tamanho, status)
+
+    def instantaneo(self):
+        """[(api, consulta, resumo da janela, respostas por status, bytes totais)]"""
+        agora = time.monotonic()
+        with self._lock:
+            return [(tipo_api, consulta, serie.resumo(agora), dict(serie.status), serie.bytes)
+                    for (tipo_api, consulta), serie in sorted(self.series.items())]
+
+    def prometheus(self):
+        series = self.instantaneo()
+        linhas = []
+
+        def metrica(nome, tipo, ajuda, valores):
+            linhas.append(f"# HELP {nome} {ajuda}")
+            linhas.append(f"# TYPE {nome} {tipo}")
+            linhas.extend(f"{nome}{rotulos} {valor}" for rotulos, valor in valores if valor is not None)
+
+        metrica('coleta_respostas_total', 'counter', 'Respostas recebidas por status HTTP',
+                [(_rotulos(api=api, consulta=consulta, status=status), total)
+                 for api, consulta, _, por_status, _ in series
+                 for status, total in sorted(por_status.items(), key=lambda item: str(item[0]))])
+        metrica('coleta_bytes_total', 'counter', 'Bytes de corpo de resposta recebidos',
+                [(_rotulos(api=api, consulta=consulta), total) for api, consulta, _, _, total in series])
+        metrica('coleta_requisicoes_por_segundo', 'gauge', f'Vazao na janela de {self.janela}s',
+                [(_rotulos(api=api, consulta=consulta), round(resumo['requisicoes_s'], 3))
+                 for api, consulta, resumo, _, _ in series])
+        metrica('coleta_bytes_por_segundo', 'gauge', f'Bytes/s de resposta na janela de {self.janela}s',
+                [(_rotulos(api=api, consulta=consulta), round(resumo['bytes_s'], 1))
+                 for api, consulta, resumo, _, _ in series])
+        metrica('coleta_taxa_erros', 'gauge', f'Fracao de respostas com erro na janela de {self.janela}s',
+                [(_rotulos(api=api, consulta=consulta), round(resumo['taxa_erros'], 4))
+                 for api, consulta, resumo, _, _ in series])
+        metrica('coleta_latencia_ms', 'gauge', f'Percentis de latencia (respostas OK) na janela de {self.janela}s',
+                [(_rotulos(api=api, consulta=consulta, quantil=p / 100), valor)
+                 for api, consulta, resumo, _, _ in series for p, valor in resumo['percentis'].items()])
+        metrica('coleta_rate_limit_restante', 'gauge', 'Requisicoes restantes somando os tokens validos',
+                [(_rotulos(api=api), restante) for api, restante in sorted(self.folga().items())])
+        return '\n'.join(linhas) + '\n'
+
+    def painel(self):
+        linhas = [f"[ao vivo {datetime.now():%H:%M:%S}] janela de {self.janela}s"]
+        for api, consulta, resumo, por_status, _ in self.instantaneo():
+            percentis = ' '.join(f"p{p} {valor:.0f}ms" if valor is not None else f"p{p} -"
+                                 for p, valor in resumo['percentis'].items())
+            linhas.append(f"   {api:<8} {consulta:<8} {resumo['requisicoes_s']:5.2f} req/s | {percentis} | "
+                          f"{resumo['bytes_s'] / 1024:7.1f} KB/s | erros {resumo['erros']} "
+                          f"({resumo['taxa_erros'] * 100:.1f}%) | total {sum(por_status.values())}")
+        folga = self.folga()
+        if folga:
+            linhas.append("   Folga de rate limit: " + ' | '.join(f"{api} {restante}" for api, restante in sorted(folga.items())))
+        return '\n'.join(linhas)
+
+    def servir(self, porta, host='127.0.0.1'):
+        """Endpoint Prometheus em http://host:porta/metrics (thread de fundo)"""
+        metricas = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                corpo = metricas.prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def log_message(self, formato, *args):
+                pass
+
+        self._servidor = ThreadingHTTPServer((host, porta), Handler)
+        self._servidor.daemon_threads = True
+        threading.Thread(target=self._servidor.serve_forever, daemon=True).start()
+
+    def mostrar_periodicamente(self, intervalo):
+        """Imprime o painel a cada `intervalo` segundos (thread de fundo)"""
+        def mostrar():
+            while not self._parado.wait(intervalo):
+                if self.series:
+                    print(self.painel(), flush=True)
+
+        threading.Thread(target=mostrar, daemon=True).start()
+
+    def parar(self):
+        """Desliga o endpoint e o painel"""
+        self._parado.set()
+        if self._servidor is not None:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+            self._servidor = None
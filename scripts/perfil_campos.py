@@ -0,0 +1,274 @@
+"""
+Perfil de campos dos payloads: quantos bytes de cada resposta REST caem fora
+dos campos que a consulta GraphQL equivalente seleciona (sobre-busca)
+
+Le as respostas salvas pelo coletor (coletor.DIRETORIO_RESPOSTAS, um arquivo
+por resposta em <diretorio>/<tipo_api>/<consulta>/) em fluxo, um evento JSON
+por vez (ijson, se instalado), e atribui os bytes de cada chave e valor ao
+caminho do campo (p.ex. '[].owner.login'; listas viram '[]'). Os bytes sao os
+do JSON compacto, independentes da formatacao e da compressao da resposta.
+
+Uso:
+    python perfil_campos.py [diretorio_respostas]
+"""
+
+import csv
+import json
+import os
+import re
+import sys
+from decimal import Decimal
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+DIRETORIO_RESPOSTAS = '../dados/respostas'
+ARQUIVO_PERFIL = '../dados/perfil_campos.csv'
+
+CAMPOS_CSV_PERFIL = ['consulta', 'tipo_api', 'caminho', 'bytes_medios', 'presenca', 'selecionado']
+
+# Campos REST equivalentes a selecao de cada documento de graphQL.py
+# (QUERY_REPOS, QUERY_REPO_DETAILS, QUERY_REPO_ISSUES). Campos GraphQL sem
+# equivalente no mesmo endpoint REST (languages, releases, pullRequests,
+# cor da linguagem...) ficam de fora; o que sobra nesta lista e o que o
+# cliente REST precisaria para montar a mesma resposta
+SELECAO_REST = {
+    'C1': [
+        '[].name', '[].description', '[].html_url', '[].homepage', '[].stargazers_count',
+        '[].forks_count', '[].watchers_count', '[].created_at', '[].updated_at', '[].pushed_at',
+        '[].private', '[].fork', '[].archived', '[].disabled', '[].language',
+        '[].license.name', '[].license.spdx_id', '[].owner.login', '[].owner.avatar_url',
+        '[].default_branch', '[].open_issues_count', '[].size', '[].has_issues', '[].has_wiki'
+    ],
+    'C2': [
+        'name', 'description', 'html_url', 'homepage', 'stargazers_count', 'forks_count',
+        'subscribers_count', 'created_at', 'updated_at', 'pushed_at', 'private', 'fork',
+        'archived', 'is_template', 'language', 'license.name', 'license.key', 'license.spdx_id',
+        'license.url', 'owner.login', 'owner.avatar_url', 'owner.html_url', 'default_branch',
+        'topics', 'open_issues_count', 'size', 'has_issues', 'has_projects', 'has_wiki'
+    ],
+    'C3': [
+        '[].number', '[].title', '[].body', '[].created_at', '[].updated_at', '[].closed_at',
+        '[].state', '[].html_url', '[].user.login', '[].user.avatar_url', '[].user.html_url',
+        '[].author_association', '[].labels[].name', '[].labels[].color', '[].labels[].description',
+        '[].assignees[].login', '[].assignees[].avatar_url', '[].comments', '[].reactions.total_count',
+        '[].milestone.title', '[].milestone.number', '[].milestone.state', '[].locked',
+        '[].active_lock_reason'
+    ]
+}
+
+
+def _eventos_json(dados):
+    """Mesmos eventos (prefixo, evento, valor) de ijson.parse, a partir de um
+    objeto ja carregado (fallback sem ijson)"""
+    def percorrer(prefixo, valor):
+        filho = f"{prefixo}.item" if prefixo else 'item'
+        if isinstance(valor, dict):
+            yield prefixo, 'start_map', None
+            for chave, item in valor.items():
+                yield prefixo, 'map_key', chave
+                yield from percorrer(f"{prefixo}.{chave}" if prefixo else chave, item)
+            yield prefixo, 'end_map', None
+        elif isinstance(valor, list):
+            yield prefixo, 'start_array', None
+            for item in valor:
+                yield from percorrer(filho, item)
+            yield prefixo, 'end_array', None
+        else:
+            yield prefixo, 'scalar', valor
+
+    yield from percorrer('', dados)
+
+
+def eventos(arquivo):
+    """Eventos JSON de um arquivo, em fluxo quando o ijson esta disponivel"""
+    if ijson is not None:
+        yield from ijson.parse(arquivo)
+    else:
+        yield from _eventos_json(json.load(arquivo))
+
+
+def caminho_campo(prefixo):
+    """'labels.item.name' -> 'labels[].name'; 'item.owner' -> '[].owner'"""
+    caminho = ''
+    for parte in prefixo.split('.') if prefixo else []:
+        if parte == 'item':
+            caminho += '[]'
+        else:
+            caminho += f".{parte}" if caminho else parte
+    return caminho
+
+
+def _bytes_escalar(valor):
+    if valor is None:
+        return 4
+    if isinstance(valor, bool):
+        return 4 if valor else 5
+    if isinstance(valor, (int, float, Decimal)):
+        return len(str(valor))
+    return len(json.dumps(valor, ensure_ascii=False).encode('utf-8'))
+
+
+def bytes_por_campo(arquivo):
+    """{caminho: bytes} de um documento: a chave (com aspas, ':' e ',') e o
+    valor escalar contam para o campo; chaves/colchetes para o container"""
+    tamanhos = {}
+    for prefixo, evento, valor in eventos(arquivo):
+        if evento == 'map_key':
+            caminho = caminho_campo(f"{prefixo}.{valor}" if prefixo else valor)
+            tamanho = _bytes_escalar(valor) + 2
+        elif evento in ('start_map', 'end_map', 'start_array', 'end_array'):
+            caminho, tamanho = caminho_campo(prefixo), 1
+        else:
+            caminho, tamanho = caminho_campo(prefixo), _bytes_escalar(valor)
+        tamanhos[caminho] = tamanhos.get(caminho, 0) + tamanho
+    return tamanhos
+
+
+def selecionado(caminho, selecao):
+    """O campo esta na selecao, dentro de um campo selecionado, ou e um
+    container (raiz, owner, [].labels...) de algum campo selecionado"""
+    if caminho == '':
+        return True
+    for campo in selecao:
+        if caminho == campo or caminho.startswith((f"{campo}.", f"{campo}[]")):
+            return True
+        if campo.startswith((f"{caminho}.", f"{caminho}[]")):
+            return True
+    return False
+
+
+class PerfilCampos:
+    """Bytes acumulados por caminho de campo sobre muitas respostas de uma
+    mesma consulta (memoria proporcional ao numero de caminhos, nao de arquivos)"""
+
+    def __init__(self):
+        self.bytes = {}
+        self.presenca = {}
+        self.documentos = 0
+
+    def adicionar(self, caminho_arquivo):
+        with open(caminho_arquivo, 'rb') as f:
+            tamanhos = bytes_por_campo(f)
+        for caminho, tamanho in tamanhos.items():
+            self.bytes[caminho] = self.bytes.get(caminho, 0) + tamanho
+            self.presenca[caminho] = self.presenca.get(caminho, 0) + 1
+        self.documentos += 1
+
+    def total_medio(self):
+        return sum(self.bytes.values()) / self.documentos if self.documentos else 0
+
+    def medio(self, caminho):
+        return self.bytes[caminho] / self.documentos
+
+    def agrupar(self, caminhos, nivel):
+        """Bytes medios somados por prefixo de `nivel` campos ('[].owner' para nivel 1)"""
+        grupos = {}
+        for caminho in caminhos:
+            prefixo, campos = '', 0
+            for parte in re.findall(r'\[\]|[^.\[\]]+', caminho):
+                if campos == nivel:
+                    break
+                if parte == '[]':
+                    prefixo += parte
+                else:
+                    prefixo += f".{parte}" if prefixo else parte
+                    campos += 1
+            grupos[prefixo] = grupos.get(prefixo, 0) + self.medio(caminho)
+        return grupos
+
+
+def carregar_perfis(diretorio):
+    """{(tipo_api, consulta): PerfilCampos} para <diretorio>/<tipo_api>/<consulta>/*.json"""
+    perfis = {}
+    for tipo_api in sorted(os.listdir(diretorio)):
+        pasta_api = os.path.join(diretorio, tipo_api)
+        if not os.path.isdir(pasta_api):
+            continue
+        for consulta in sorted(os.listdir(pasta_api)):
+            pasta = os.path.join(pasta_api, consulta)
+            perfil = PerfilCampos()
+            for nome in sorted(os.listdir(pasta)):
+                if nome.endswith('.json'):
+                    perfil.adicionar(os.path.join(pasta, nome))
+            if perfil.documentos:
+                perfis[(tipo_api, consulta)] = perfil
+    return perfis
+
+
+def salvar_perfis(perfis, caminho):
+    with open(caminho, 'w', newline='', encoding='utf-8') as f:
+        escritor = csv.DictWriter(f, fieldnames=CAMPOS_CSV_PERFIL)
+        escritor.writeheader()
+        for (tipo_api, consulta), perfil in perfis.items():
+            selecao = SELECAO_REST.get(consulta) if tipo_api == 'REST' else None
+            for caminho in sorted(perfil.bytes):
+                escritor.writerow({
+                    'consulta': consulta,
+                    'tipo_api': tipo_api,
+                    'caminho': caminho or '(raiz)',
+                    'bytes_medios': round(perfil.medio(caminho), 1),
+                    'presenca': round(perfil.presenca[caminho] / perfil.documentos, 3),
+                    'selecionado': '' if selecao is None else selecionado(caminho, selecao)
+                })
+
+
+def relatar(perfis, top=10):
+    for consulta in sorted({consulta for _, consulta in perfis}):
+        rest = perfis.get(('REST', consulta))
+        graphql = perfis.get(('GraphQL', consulta))
+        print(f"\n{consulta}")
+        print("-"*80)
+
+        if rest is not None and consulta in SELECAO_REST:
+            selecao = SELECAO_REST[consulta]
+            fora = [caminho for caminho in rest.bytes if not selecionado(caminho, selecao)]
+            bytes_fora = sum(rest.medio(caminho) for caminho in fora)
+            total = rest.total_medio()
+            print(f"REST ({rest.documentos} respostas): {total:.0f} B em media")
+            print(f"   Campos equivalentes a selecao GraphQL: {total - bytes_fora:.0f} B")
+            print(f"   Fora da selecao (sobre-busca): {bytes_fora:.0f} B ({bytes_fora / total * 100:.1f}%)")
+
+            print("   Maiores campos nao selecionados:")
+            grupos = rest.agrupar(fora, nivel=1)
+            for caminho, tamanho in sorted(grupos.items(), key=lambda item: -item[1])[:top]:
+                print(f"      {caminho:<40} {tamanho:>9.0f} B ({tamanho / total * 100:.1f}%)")
+
+        if graphql is not None:
+            print(f"GraphQL ({graphql.documentos} respostas): {graphql.total_medio():.0f} B em media")
+            extras = sum(graphql.medio(caminho) for caminho in graphql.bytes if 'rateLimit' in caminho)
+            if extras:
+                print(f"   rateLimit pedido junto: {extras:.0f} B")
+
+        if rest is not None and graphql is not None and consulta in SELECAO_REST:
+            economia = rest.total_medio() - graphql.total_medio()
+            print(f"Economia da selecao de campos: {economia:.0f} B por resposta "
+                  f"({economia / rest.total_medio() * 100:.1f}% do payload REST)")
+
+
+def main():
+    diretorio = sys.argv[1] if len(sys.argv) > 1 else DIRETORIO_RESPOSTAS
+
+    print("\nPerfil de campos dos payloads REST vs GraphQL")
+    print("="*80)
+    if ijson is None:
+        print("(ijson nao instalado: cada resposta e carregada inteira antes de percorrer)")
+
+    if not os.path.isdir(diretorio):
+        print(f"ERRO: {diretorio} nao encontrado. Colete com coletor.DIRETORIO_RESPOSTAS definido.")
+        sys.exit(1)
+
+    perfis = carregar_perfis(diretorio)
+    if not perfis:
+        print("Nenhuma resposta salva encontrada.")
+        return
+
+    relatar(perfis)
+    salvar_perfis(perfis, ARQUIVO_PERFIL)
+    print(f"\nPerfil por campo salvo em: {ARQUIVO_PERFIL}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Estimativa do desvio do relogio local, para alinhar timestamps de shards
+coletados em maquinas diferentes
+"""
+
+import socket
+import statistics
+import struct
+import time
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+
+# Segundos entre 1900-01-01 (epoca NTP) e 1970-01-01
+_EPOCA_NTP = 2208988800
+
+
+def _ntp_para_epoch(dados):
+    segundos, fracao = struct.unpack('!II', dados)
+    return segundos - _EPOCA_NTP + fracao / 2**32
+
+
+def medir_offset_ntp(servidor, amostras=4, timeout=2):
+    """(offset_s, incerteza_ms) por SNTP: offset = relogio de referencia - local.
+    Usa a amostra de menor atraso de ida e volta."""
+    medidas = []
+    for _ in range(amostras):
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.settimeout(timeout)
+            t0 = time.time()
+            s.sendto(b'\x1b' + 47 * b'\0', (servidor, 123))
+            dados, _ = s.recvfrom(48)
+            t3 = time.time()
+
+        t1 = _ntp_para_epoch(dados[32:40])
+        t2 = _ntp_para_epoch(dados[40:48])
+        atraso = (t3 - t0) - (t2 - t1)
+        medidas.append((atraso, ((t1 - t0) + (t2 - t3)) / 2))
+
+    atraso, offset = min(medidas)
+    return offset, atraso / 2 * 1000
+
+
+def medir_offset_http(sessao, url, amostras=5):
+    """(offset_s, incerteza_ms) pelo header Date das respostas (resolucao de 1s:
+    soma meio segundo para compensar o truncamento)"""
+    offsets = []
+    atrasos = []
+    for _ in range(amostras):
+        t0 = time.time()
+        response = sessao.get(url)
+        t3 = time.time()
+        data = parsedate_to_datetime(response.headers['Date']).timestamp() + 0.5
+        offsets.append(data - (t0 + t3) / 2)
+        atrasos.append(t3 - t0)
+
+    return statistics.median(offsets), 500 + max(atrasos) / 2 * 1000
+
+
+def medir_relogio(servidor_ntp=None, sessao=None, url=None):
+    """Medida do relogio local: tenta NTP e cai para o header Date via HTTP"""
+    medida = {
+        'local': time.time(),
+        'fuso_horario_s': datetime.now().astimezone().utcoffset().total_seconds()
+    }
+
+    if servidor_ntp:
+        try:
+            offset, incerteza = medir_offset_ntp(servidor_ntp)
+            return {**medida, 'offset_s': offset, 'incerteza_ms': incerteza, 'metodo': 'ntp'}
+        except (OSError, struct.error):
+            pass
+
+    if sessao is not None and url:
+        try:
+            offset, incerteza = medir_offset_http(sessao, url)
+            return {**medida, 'offset_s': offset, 'incerteza_ms': incerteza, 'metodo': 'http-date'}
+        except Exception as e:
+            print(f"   Nao foi possivel medir o relogio via HTTP: {e}")
+
+    return {**medida, 'offset_s': 0.0, 'incerteza_ms': None, 'metodo': 'nenhum'}
+
+
+def offset_em(medidas, instante):
+    """Offset interpolado linearmente entre as medidas (inicio e fim da coleta)"""
+    medidas = sorted(medidas, key=lambda m: m['local'])
+    if len(medidas) == 1 or instante <= medidas[0]['local']:
+        return medidas[0]['offset_s']
+    if instante >= medidas[-1]['local']:
+        return medidas[-1]['offset_s']
+
+    for anterior, seguinte in zip(medidas, medidas[1:]):
+        if anterior['local'] <= instante <= seguinte['local']:
+            fracao = (instante - anterior['local']) / (seguinte['local'] - anterior['local'])
+            return anterior['offset_s'] + fracao * (seguinte['offset_s'] - anterior['offset_s'])
@@ -1,193 +1,206 @@
-import requests
-import time
-import csv
-import random
+import httpx
+import json
 import sys
-from datetime import datetime
+import os
 
-API_URL = "https://api.github.com"
+import coletor
+from agendador import AgendadorRateLimit, extrair_rate_limit_rest
+from cache_http import CacheCondicional
+from tokens import PoolTokens
+
+# GITHUB_BASE_URL permite apontar para o servidor_mock.py local
+BASE_URL = os.environ.get('GITHUB_BASE_URL', "https://api.github.com").rstrip('/')
+API_URL = BASE_URL
 
 TOKENS = [
     "SEU_TOKEN_AQUI",
 ]
 
-current_token_index = 0
+# Tokens tambem podem vir do ambiente (separados por virgula), p.ex. em CI
+if os.environ.get('GITHUB_TOKENS'):
+    TOKENS = os.environ['GITHUB_TOKENS'].split(',')
+
+# Cada requisicao recebe o token com mais orcamento restante
+pool_tokens = PoolTokens(TOKENS, extrair_rate_limit_rest)
 
 def get_headers():
-    global current_token_index
-    if not TOKENS or TOKENS[0] == "SEU_TOKEN_AQUI":
-        print("ERRO: Configure seu token GitHub no inicio do script.")
-        sys.exit(1)
-    
-    token = TOKENS[current_token_index]
-    current_token_index = (current_token_index + 1) % len(TOKENS)
-    return {
+    # Tokens configurados sao checados em validar_tokens; reproduzindo um
+    # cassete nenhum token e necessario (o Authorization nem entra na chave)
+    token = 'cassete' if coletor.reproduzindo_cassete() else pool_tokens.obter()
+    headers = {
         "Authorization": f"Bearer {token}",
         "Accept": "application/vnd.github+json",
         "Cache-Control": "no-cache",
         "X-GitHub-Api-Version": "2022-11-28"
     }
+    if MODO_CACHE:
+        del headers["Cache-Control"]
+    return headers
 
-USUARIOS = [
-    "bradfitz",
-    "dgtlmoon",
-    "aaronpowell",
-    "gtsteffaniak",
-    "junjiem",
-    "pawurb",
-    "stephenberry",
-    "mrgrain",
-    "me-no-dev",
-    "chitalian"
-]
+TIPO_API = 'REST'
+ARQUIVO_METRICAS = '../dados/metricas_rest.csv'
+
+# Cache condicional: reenvia o ETag/Last-Modified da ultima resposta e o
+# servidor responde 304 sem corpo se nada mudou (no GitHub, 304 nao consome
+# rate limit). Mede o caminho de polling em cache usado em producao
+MODO_CACHE = False
+ARQUIVO_CACHE = '../dados/cache_rest.json'
 
-REPETICOES = 33
+cache = CacheCondicional(ARQUIVO_CACHE)
+
+# Usuarios, repeticoes, concorrencia e modos de conexao/ritmo ficam em coletor.py
+
+# Orcamento de rate limit reservado e espacamento minimo entre envios
+MARGEM_RATE_LIMIT = 50
+INTERVALO_MINIMO = 0.0
+
+agendador = AgendadorRateLimit(pool_tokens, MARGEM_RATE_LIMIT, INTERVALO_MINIMO)
 
 def validar_tokens():
     if not TOKENS or TOKENS[0] == "SEU_TOKEN_AQUI":
         print("ERRO: Lista de tokens vazia ou nao configurada.")
         return False
-    
-    tokens_validos = 0
-    for i, token in enumerate(TOKENS):
-        try:
-            response = requests.get(
-                f"{API_URL}/user",
-                headers={
-                    "Authorization": f"Bearer {token}",
-                    "Accept": "application/vnd.github+json"
-                },
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                tokens_validos += 1
-        except Exception:
-            pass
-    
+
+    tokens_validos = pool_tokens.validar(checar_token)
+    print(f"Tokens validos: {tokens_validos}/{len(TOKENS)}")
+
     if tokens_validos == 0:
         return False
-    
+
     return True
 
-def fazer_requisicao_com_retry(func, *args, max_tentativas=3):
-    for tentativa in range(max_tentativas):
-        try:
-            return func(*args)
-        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
-            if tentativa < max_tentativas - 1:
-                time.sleep(5)
-            else:
-                raise
-
-def fetch_popular_repos(username):
-    url = f"{API_URL}/users/{username}/repos"
-    params = {
-        'per_page': 10,
-        'sort': 'stars',
-        'direction': 'desc',
-        'type': 'public'
-    }
-    return requests.get(url, headers=get_headers(), params=params, timeout=30)
-
-def fetch_repo_details(username, repo_name):
-    url = f"{API_URL}/repos/{username}/{repo_name}"
-    return requests.get(url, headers=get_headers(), timeout=30)
-
-def fetch_repo_issues(username, repo_name):
-    url = f"{API_URL}/repos/{username}/{repo_name}/issues"
-    params = {
-        'per_page': 10,
-        'state': 'all',
-        'sort': 'created',
-        'direction': 'desc'
-    }
-    return requests.get(url, headers=get_headers(), params=params, timeout=30)
+def checar_token(token):
+    # Fora da sessao da coleta: a validacao nao entra no pool medido nem no cassete
+    response = httpx.get(
+        f"{API_URL}/user",
+        headers={
+            "Authorization": f"Bearer {token}",
+            "Accept": "application/vnd.github+json"
+        },
+        timeout=10
+    )
+    return response.status_code == 200, response
+
+PARAMS_REPOS = {
+    'per_page': 10,
+    'sort': 'stars',
+    'direction': 'desc',
+    'type': 'public'
+}
+
+PARAMS_ISSUES = {
+    'per_page': 10,
+    'state': 'all',
+    'sort': 'created',
+    'direction': 'desc'
+}
+
+CONSULTAS = [
+    ('C1', 'fetch_popular_repos'),
+    ('C2', 'fetch_repo_details'),
+    ('C3', 'fetch_repo_issues')
+]
+
+FUNCAO_DESCOBERTA = 'fetch_popular_repos'
+
+# Varredura paginada (coletor.MODO_VARREDURA): consultas que listam colecoes
+CONSULTAS_PAGINADAS = [
+    ('C1', 'fetch_popular_repos'),
+    ('C3', 'fetch_repo_issues')
+]
+
+def _url_consulta(func_name, user, repo):
+    if func_name == 'fetch_popular_repos':
+        return f"{API_URL}/users/{user}/repos", PARAMS_REPOS
+    elif func_name == 'fetch_repo_details':
+        return f"{API_URL}/repos/{user}/{repo}", None
+    elif func_name == 'fetch_repo_issues':
+        return f"{API_URL}/repos/{user}/{repo}/issues", PARAMS_ISSUES
+
+def montar_requisicao(func_name, user, repo):
+    url, params = _url_consulta(func_name, user, repo)
+
+    headers = get_headers()
+    if MODO_CACHE:
+        headers.update(cache.cabecalhos(str(httpx.URL(url, params=params))))
+    return 'GET', url, {'headers': headers, 'params': params}
+
+def montar_requisicao_pagina(func_name, user, repo, tamanho_pagina, cursor=None):
+    """Primeira pagina (cursor None) ou a URL de um Link do header"""
+    if cursor is None:
+        url, params = _url_consulta(func_name, user, repo)
+        cursor = str(httpx.URL(url, params={**params, 'per_page': tamanho_pagina}))
+
+    headers = get_headers()
+    if MODO_CACHE:
+        headers.update(cache.cabecalhos(cursor))
+    return 'GET', cursor, {'headers': headers}
+
+def proxima_pagina(func_name, response):
+    return response.links.get('next', {}).get('url')
+
+def paginas_seguintes(func_name, response):
+    """URLs de todas as paginas restantes quando o Link traz rel="last": a
+    paginacao do GitHub e por numero, entao elas podem ser pedidas em paralelo"""
+    proxima = proxima_pagina(func_name, response)
+    ultima = response.links.get('last', {}).get('url')
+    if not proxima or not ultima:
+        return []
+
+    url = httpx.URL(proxima)
+    primeira, final = int(url.params['page']), int(httpx.URL(ultima).params['page'])
+    return [str(url.copy_set_param('page', pagina)) for pagina in range(primeira, final + 1)]
+
+def itens_pagina(func_name, response):
+    if response.status_code not in (200, 304):
+        return 0
+    return len(ler_corpo(response))
 
-metricas_data = []
-id_execucao = 1
+def observar_resposta(response):
+    if MODO_CACHE:
+        cache.atualizar(str(response.request.url), response)
+
+def colunas_resposta(response):
+    if not MODO_CACHE:
+        return {}
+    if response.status_code == 304:
+        bytes_economizados = cache.tamanho(str(response.request.url))
+        return {'cache': 'revalidado', 'bytes_economizados_kb': round(bytes_economizados / 1024, 2),
+                'cota_economizada': 1}
+    return {'cache': 'completo', 'bytes_economizados_kb': 0, 'cota_economizada': 0}
+
+def precisa_reenviar(response):
+    # 304 sem o corpo salvo (cache apagado ou de outra maquina): esquece os
+    # validadores e reenvia sem If-None-Match, recebendo um 200 completo
+    if response.status_code != 304 or cache.corpo(str(response.request.url)) is not None:
+        return False
+    cache.descartar(str(response.request.url))
+    return True
+
+def ler_corpo(response):
+    if response.status_code == 304:
+        corpo = cache.corpo(str(response.request.url))
+        if corpo is None:
+            raise RuntimeError(f"Resposta 304 sem corpo no cache para {response.request.url}")
+        return json.loads(corpo)
+    return response.json()
+
+def extrair_repo_mais_popular(response):
+    if response.status_code not in (200, 304):
+        return None
+
+    repos = ler_corpo(response)
+    if not repos:
+        return None
+
+    repo_mais_popular = max(repos, key=lambda x: x['stargazers_count'])
+    return repo_mais_popular['name']
 
 def main():
-    global id_execucao
-    
     print("\nScript REST - Coleta de Dados")
     print("="*80)
-    
-    if not validar_tokens():
-        print("ERRO: Tokens invalidos.")
-        sys.exit(1)
-    
-    print(f"\nUsuarios: {len(USUARIOS)} | Repeticoes: {REPETICOES} | Total: {len(USUARIOS) * REPETICOES * 3}")
-    
-    for usuario in USUARIOS:
-        print(f"\nProcessando usuario: {usuario}")
-        
-        response = fazer_requisicao_com_retry(fetch_popular_repos, usuario)
-        time.sleep(random.uniform(1, 3))
-        
-        if response.status_code != 200:
-            continue
-        
-        repos = response.json()
-        if not repos:
-            continue
-        
-        repo_mais_popular = max(repos, key=lambda x: x['stargazers_count'])
-        repo_name = repo_mais_popular['name']
-        
-        consultas = []
-        for i in range(REPETICOES):
-            consultas.extend([
-                ('C1', 'fetch_popular_repos', usuario, None),
-                ('C2', 'fetch_repo_details', usuario, repo_name),
-                ('C3', 'fetch_repo_issues', usuario, repo_name)
-            ])
-        
-        random.shuffle(consultas)
-        
-        total = len(consultas)
-        
-        for consulta_tipo, func_name, user, repo in consultas:
-            start_time = time.time()
-            
-            if func_name == 'fetch_popular_repos':
-                response = fazer_requisicao_com_retry(fetch_popular_repos, user)
-            elif func_name == 'fetch_repo_details':
-                response = fazer_requisicao_com_retry(fetch_repo_details, user, repo)
-            elif func_name == 'fetch_repo_issues':
-                response = fazer_requisicao_com_retry(fetch_repo_issues, user, repo)
-            
-            tempo_resposta_ms = (time.time() - start_time) * 1000
-            tamanho_resposta_kb = len(response.content) / 1024
-            
-            metricas_data.append({
-                'id_execucao': id_execucao,
-                'usuario': user,
-                'consulta': consulta_tipo,
-                'tipo_api': 'REST',
-                'tempo_resposta_ms': round(tempo_resposta_ms, 2),
-                'tamanho_resposta_kb': round(tamanho_resposta_kb, 2),
-                'status_code': response.status_code,
-                'timestamp': datetime.now().isoformat(),
-                'observacoes': 'OK' if response.status_code == 200 else f'Erro {response.status_code}'
-            })
-            
-            id_execucao += 1
-            
-            time.sleep(random.uniform(1, 3))
-    
-    print("\nSalvando metricas em CSV...")
-    
-    with open('../dados/metricas_rest.csv', 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['id_execucao', 'usuario', 'consulta', 'tipo_api', 'tempo_resposta_ms', 
-                      'tamanho_resposta_kb', 'status_code', 'timestamp', 'observacoes']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(metricas_data)
-    
-    sucesso = len([m for m in metricas_data if m['status_code'] == 200])
-    print(f"\nTotal: {len(metricas_data)} | Sucesso: {sucesso} ({sucesso/len(metricas_data)*100:.1f}%)")
-    print("Experimento concluido.")
+
+    coletor.executar_coleta([sys.modules[__name__]])
 
 if __name__ == "__main__":
     main()
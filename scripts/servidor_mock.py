@@ -0,0 +1,670 @@
+"""
+Servidor local que imita a API do GitHub (REST + GraphQL)
+
+Atende /users/{u}/repos, /repos/{o}/{r}, /repos/{o}/{r}/issues, /user e
+/graphql com dados sinteticos deterministicos, latencia sorteada de
+distribuicoes configuraveis e headers de rate limit. Para apontar os
+coletores para ele:
+
+    python servidor_mock.py
+    GITHUB_BASE_URL=http://127.0.0.1:8000 GITHUB_TOKENS=mock python scriptRest.py
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from email.utils import formatdate
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+HOST = os.environ.get('MOCK_HOST', '127.0.0.1')
+PORTA = int(os.environ.get('MOCK_PORTA', 8000))
+
+# Distribuicoes: ('fixa', v), ('uniforme', a, b), ('normal', media, dp),
+# ('lognormal', mediana, sigma), ('exponencial', media)
+LATENCIAS_MS = {
+    'rest': ('lognormal', 120, 0.4),
+    'graphql': ('lognormal', 250, 0.5),
+}
+# Custo adicional por item serializado (modela latencia dependente do payload)
+CUSTO_POR_ITEM_MS = 1.5
+
+REPOS_POR_USUARIO = 30
+ISSUES_POR_REPO = 60
+TAMANHO_DESCRICAO = ('uniforme', 20, 200)
+TAMANHO_CORPO_ISSUE = ('lognormal', 800, 1.0)
+
+LIMITE_RATE_LIMIT = 5000
+JANELA_RATE_LIMIT = 3600
+
+DATA_BASE = datetime(2015, 1, 1, tzinfo=timezone.utc)
+# Os dados sinteticos nao mudam enquanto o servidor roda
+ULTIMA_MODIFICACAO = formatdate(time.time(), usegmt=True)
+LINGUAGENS = [('Go', '#00ADD8'), ('Python', '#3572A5'), ('TypeScript', '#3178c6'),
+              ('Rust', '#dea584'), ('C++', '#f34b7d'), ('Java', '#b07219')]
+LICENCAS = [('mit', 'MIT License', 'MIT'), ('apache-2.0', 'Apache License 2.0', 'Apache-2.0'),
+            ('bsd-3-clause', 'BSD 3-Clause "New" or "Revised" License', 'BSD-3-Clause')]
+PALAVRAS = ("api server client cache fast simple tool library plugin data stream "
+            "query graph config build test deploy cloud native async http").split()
+
+
+def sortear(distribuicao, rng=random):
+    tipo, *parametros = distribuicao
+    if tipo == 'fixa':
+        return parametros[0]
+    if tipo == 'uniforme':
+        return rng.uniform(*parametros)
+    if tipo == 'normal':
+        return max(0.0, rng.gauss(*parametros))
+    if tipo == 'lognormal':
+        mediana, sigma = parametros
+        return rng.lognormvariate(0, sigma) * mediana
+    if tipo == 'exponencial':
+        return rng.expovariate(1 / parametros[0])
+    raise ValueError(f"Distribuicao desconhecida: {tipo}")
+
+
+def _rng(*partes):
+    return random.Random(zlib.crc32(':'.join(map(str, partes)).encode()))
+
+
+def _texto(rng, tamanho):
+    palavras = []
+    while sum(len(p) + 1 for p in palavras) < tamanho:
+        palavras.append(rng.choice(PALAVRAS))
+    return ' '.join(palavras)
+
+
+def _data(rng, dias_max=3500):
+    return (DATA_BASE + timedelta(days=rng.uniform(0, dias_max))).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+# ---------------------------------------------------------------------------
+# Modelo de dados (unico para REST e GraphQL)
+# ---------------------------------------------------------------------------
+
+@lru_cache(maxsize=4096)
+def modelo_repo(owner, name):
+    rng = _rng(owner, name)
+    linguagem = rng.choice(LINGUAGENS)
+    licenca = rng.choice(LICENCAS)
+    return {
+        'id': zlib.crc32(f"{owner}/{name}".encode()),
+        'owner': owner,
+        'name': name,
+        'description': _texto(rng, sortear(TAMANHO_DESCRICAO, rng)),
+        'homepage': f"https://{name}.example.com" if rng.random() < 0.5 else None,
+        'stars': int(rng.paretovariate(1.2) * 50),
+        'forks': rng.randint(0, 2000),
+        'watchers': rng.randint(0, 500),
+        'linguagem': linguagem,
+        'licenca': licenca,
+        'created_at': _data(rng, 2000),
+        'updated_at': _data(rng),
+        'pushed_at': _data(rng),
+        'size': rng.randint(100, 500000),
+        'topics': rng.sample(PALAVRAS, rng.randint(0, 6)),
+        'open_issues': rng.randint(0, 300),
+        'pull_requests': rng.randint(0, 800),
+        'releases': rng.randint(0, 120),
+        'fork': rng.random() < 0.1,
+        'archived': rng.random() < 0.05,
+        'default_branch': rng.choice(['main', 'master']),
+        'commit_oid': '%040x' % rng.getrandbits(160),
+        'commit_msg': _texto(rng, 40),
+    }
+
+
+@lru_cache(maxsize=1024)
+def modelo_repos_usuario(login):
+    repos = [modelo_repo(login, f"projeto-{i}") for i in range(REPOS_POR_USUARIO)]
+    return sorted(repos, key=lambda r: r['stars'], reverse=True)
+
+
+@lru_cache(maxsize=1024)
+def modelo_issues(owner, name):
+    issues = []
+    for numero in range(ISSUES_POR_REPO, 0, -1):
+        rng = _rng(owner, name, numero)
+        fechada = rng.random() < 0.6
+        issues.append({
+            'number': numero,
+            'title': _texto(rng, rng.randint(20, 80)),
+            'body': _texto(rng, sortear(TAMANHO_CORPO_ISSUE, rng)),
+            'state': 'closed' if fechada else 'open',
+            'created_at': _data(rng),
+            'updated_at': _data(rng),
+            'closed_at': _data(rng) if fechada else None,
+            'autor': f"usuario{rng.randint(1, 5000)}",
+            'associacao': rng.choice(['NONE', 'CONTRIBUTOR', 'MEMBER', 'OWNER']),
+            'labels': [(w, '%06x' % rng.getrandbits(24), _texto(rng, 30))
+                       for w in rng.sample(PALAVRAS, rng.randint(0, 3))],
+            'assignees': [f"usuario{rng.randint(1, 5000)}" for _ in range(rng.randint(0, 2))],
+            'comments': rng.randint(0, 40),
+            'reactions': rng.randint(0, 25),
+            'milestone': (f"v{rng.randint(1, 9)}.0", rng.randint(1, 30)) if rng.random() < 0.3 else None,
+            'locked': rng.random() < 0.02,
+        })
+    return issues
+
+
+# ---------------------------------------------------------------------------
+# Visoes REST
+# ---------------------------------------------------------------------------
+
+def _usuario_rest(login):
+    base = f"https://api.github.com/users/{login}"
+    return {
+        'login': login, 'id': zlib.crc32(login.encode()), 'node_id': f"U_{login}",
+        'avatar_url': f"https://avatars.githubusercontent.com/u/{zlib.crc32(login.encode())}?v=4",
+        'gravatar_id': '', 'url': base, 'html_url': f"https://github.com/{login}",
+        'followers_url': f"{base}/followers", 'following_url': f"{base}/following{{/other_user}}",
+        'gists_url': f"{base}/gists{{/gist_id}}", 'starred_url': f"{base}/starred{{/owner}}{{/repo}}",
+        'subscriptions_url': f"{base}/subscriptions", 'organizations_url': f"{base}/orgs",
+        'repos_url': f"{base}/repos", 'events_url': f"{base}/events{{/privacy}}",
+        'received_events_url': f"{base}/received_events", 'type': 'User', 'site_admin': False,
+    }
+
+
+def repo_rest(repo, detalhado=False):
+    full_name = f"{repo['owner']}/{repo['name']}"
+    base = f"https://api.github.com/repos/{full_name}"
+    dados = {
+        'id': repo['id'], 'node_id': f"R_{repo['id']}", 'name': repo['name'], 'full_name': full_name,
+        'private': False, 'owner': _usuario_rest(repo['owner']),
+        'html_url': f"https://github.com/{full_name}", 'description': repo['description'],
+        'fork': repo['fork'], 'url': base,
+    }
+    for sufixo in ('forks', 'keys{/key_id}', 'collaborators{/collaborator}', 'teams', 'hooks',
+                   'issues/events{/number}', 'events', 'assignees{/user}', 'branches{/branch}',
+                   'tags', 'blobs{/sha}', 'git/tags{/sha}', 'git/refs{/sha}', 'git/trees{/sha}',
+                   'statuses/{sha}', 'languages', 'stargazers', 'contributors', 'subscribers',
+                   'subscription', 'commits{/sha}', 'git/commits{/sha}', 'comments{/number}',
+                   'issues/comments{/number}', 'contents/{+path}', 'compare/{base}...{head}',
+                   'merges', '{archive_format}{/ref}', 'downloads', 'issues{/number}',
+                   'pulls{/number}', 'milestones{/number}', 'notifications{?since,all,participating}',
+                   'labels{/name}', 'releases{/id}', 'deployments'):
+        chave = sufixo.split('{')[0].rstrip('/').replace('/', '_') or 'archive'
+        dados[f"{chave}_url"] = f"{base}/{sufixo}"
+    dados.update({
+        'created_at': repo['created_at'], 'updated_at': repo['updated_at'], 'pushed_at': repo['pushed_at'],
+        'git_url': f"git://github.com/{full_name}.git", 'ssh_url': f"git@github.com:{full_name}.git",
+        'clone_url': f"https://github.com/{full_name}.git", 'svn_url': f"https://github.com/{full_name}",
+        'homepage': repo['homepage'], 'size': repo['size'], 'stargazers_count': repo['stars'],
+        'watchers_count': repo['stars'], 'language': repo['linguagem'][0], 'has_issues': True,
+        'has_projects': True, 'has_downloads': True, 'has_wiki': True, 'has_pages': False,
+        'has_discussions': False, 'forks_count': repo['forks'], 'mirror_url': None,
+        'archived': repo['archived'], 'disabled': False, 'open_issues_count': repo['open_issues'],
+        'license': {'key': repo['licenca'][0], 'name': repo['licenca'][1], 'spdx_id': repo['licenca'][2],
+                    'url': f"https://api.github.com/licenses/{repo['licenca'][0]}",
+                    'node_id': f"L_{repo['licenca'][0]}"},
+        'allow_forking': True, 'is_template': False, 'web_commit_signoff_required': False,
+        'topics': repo['topics'], 'visibility': 'public', 'forks': repo['forks'],
+        'open_issues': repo['open_issues'], 'watchers': repo['stars'],
+        'default_branch': repo['default_branch'],
+    })
+    if detalhado:
+        dados.update({'temp_clone_token': None, 'network_count': repo['forks'],
+                      'subscribers_count': repo['watchers']})
+    return dados
+
+
+def issue_rest(owner, name, issue):
+    base = f"https://api.github.com/repos/{owner}/{name}/issues/{issue['number']}"
+    return {
+        'url': base, 'repository_url': f"https://api.github.com/repos/{owner}/{name}",
+        'labels_url': f"{base}/labels{{/name}}", 'comments_url': f"{base}/comments",
+        'events_url': f"{base}/events", 'html_url': f"https://github.com/{owner}/{name}/issues/{issue['number']}",
+        'id': zlib.crc32(base.encode()), 'node_id': f"I_{zlib.crc32(base.encode())}",
+        'number': issue['number'], 'title': issue['title'], 'user': _usuario_rest(issue['autor']),
+        'labels': [{'id': zlib.crc32(n.encode()), 'node_id': f"LA_{n}", 'name': n, 'color': c,
+                    'default': False, 'description': d,
+                    'url': f"https://api.github.com/repos/{owner}/{name}/labels/{n}"}
+                   for n, c, d in issue['labels']],
+        'state': issue['state'], 'locked': issue['locked'],
+        'assignee': _usuario_rest(issue['assignees'][0]) if issue['assignees'] else None,
+        'assignees': [_usuario_rest(a) for a in issue['assignees']],
+        'milestone': {'title': issue['milestone'][0], 'number': issue['milestone'][1], 'state': 'open'}
+        if issue['milestone'] else None,
+        'comments': issue['comments'], 'created_at': issue['created_at'],
+        'updated_at': issue['updated_at'], 'closed_at': issue['closed_at'],
+        'author_association': issue['associacao'], 'active_lock_reason': None, 'body': issue['body'],
+        'reactions': {'url': f"{base}/reactions", 'total_count': issue['reactions'], '+1': issue['reactions'],
+                      '-1': 0, 'laugh': 0, 'hooray': 0, 'confused': 0, 'heart': 0, 'rocket': 0, 'eyes': 0},
+        'timeline_url': f"{base}/timeline", 'performed_via_github_app': None, 'state_reason': None,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Visoes GraphQL (campos podem ser funcoes que recebem os argumentos)
+# ---------------------------------------------------------------------------
+
+def conexao(itens, args):
+    """Conexao no estilo Relay com paginacao por first/after."""
+    inicio = int(args.get('after') or 0)
+    quantidade = int(args.get('first') or len(itens))
+    pagina = itens[inicio:inicio + quantidade]
+    fim = inicio + len(pagina)
+    return {
+        'totalCount': len(itens),
+        'nodes': pagina,
+        'edges': [{'cursor': str(inicio + i + 1), 'node': item} for i, item in enumerate(pagina)],
+        'pageInfo': {'hasNextPage': fim < len(itens), 'endCursor': str(fim) if pagina else None,
+                     'hasPreviousPage': inicio > 0, 'startCursor': str(inicio + 1) if pagina else None},
+    }
+
+
+def _ator_graphql(login):
+    return {'login': login, 'url': f"https://github.com/{login}",
+            'avatarUrl': f"https://avatars.githubusercontent.com/u/{zlib.crc32(login.encode())}?v=4"}
+
+
+def issue_graphql(owner, name, issue):
+    return {
+        'number': issue['number'], 'title': issue['title'], 'body': issue['body'],
+        'createdAt': issue['created_at'], 'updatedAt': issue['updated_at'], 'closedAt': issue['closed_at'],
+        'state': issue['state'].upper(), 'url': f"https://github.com/{owner}/{name}/issues/{issue['number']}",
+        'author': _ator_graphql(issue['autor']), 'authorAssociation': issue['associacao'],
+        'labels': lambda args: conexao([{'name': n, 'color': c, 'description': d}
+                                        for n, c, d in issue['labels']], args),
+        'assignees': lambda args: conexao([_ator_graphql(a) for a in issue['assignees']], args),
+        'comments': {'totalCount': issue['comments']},
+        'reactions': {'totalCount': issue['reactions']},
+        'milestone': {'title': issue['milestone'][0], 'number': issue['milestone'][1], 'state': 'OPEN'}
+        if issue['milestone'] else None,
+        'locked': issue['locked'], 'activeLockReason': None,
+    }
+
+
+def repo_graphql(repo):
+    owner, name = repo['owner'], repo['name']
+    return {
+        'name': name, 'description': repo['description'], 'url': f"https://github.com/{owner}/{name}",
+        'homepageUrl': repo['homepage'], 'stargazerCount': repo['stars'], 'forkCount': repo['forks'],
+        'watchers': {'totalCount': repo['watchers']}, 'createdAt': repo['created_at'],
+        'updatedAt': repo['updated_at'], 'pushedAt': repo['pushed_at'], 'isPrivate': False,
+        'isFork': repo['fork'], 'isArchived': repo['archived'], 'isDisabled': False, 'isTemplate': False,
+        'primaryLanguage': {'name': repo['linguagem'][0], 'color': repo['linguagem'][1]},
+        'languages': lambda args: conexao([{'size': repo['size'], 'node': {'name': repo['linguagem'][0],
+                                                                          'color': repo['linguagem'][1]}}], args),
+        'licenseInfo': {'name': repo['licenca'][1], 'key': repo['licenca'][0], 'spdxId': repo['licenca'][2],
+                        'url': f"http://choosealicense.com/licenses/{repo['licenca'][0]}/"},
+        'owner': _ator_graphql(owner),
+        'defaultBranchRef': {'name': repo['default_branch'],
+                             'target': {'oid': repo['commit_oid'], 'messageHeadline': repo['commit_msg'],
+                                        'committedDate': repo['pushed_at']}},
+        'repositoryTopics': lambda args: conexao([{'topic': {'name': t}} for t in repo['topics']], args),
+        'issues': lambda args: conexao([issue_graphql(owner, name, i) for i in modelo_issues(owner, name)], args),
+        'pullRequests': {'totalCount': repo['pull_requests']},
+        'releases': {'totalCount': repo['releases']},
+        'diskUsage': repo['size'], 'hasIssuesEnabled': True, 'hasProjectsEnabled': True,
+        'hasWikiEnabled': True,
+        'openGraphImageUrl': f"https://opengraph.githubassets.com/1/{owner}/{name}",
+        'usesCustomOpenGraphImage': False,
+    }
+
+
+def usuario_graphql(login):
+    return {
+        'login': login,
+        'repositories': lambda args: conexao([repo_graphql(r) for r in modelo_repos_usuario(login)], args),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Interpretador GraphQL minimo (selecoes, aliases, argumentos, variaveis e
+# fragmentos inline) suficiente para as queries dos coletores
+# ---------------------------------------------------------------------------
+
+_TOKENS_GRAPHQL = re.compile(r'\.\.\.|[{}()\[\]:,!=]|\$?[A-Za-z_][\w]*|"(?:[^"\\]|\\.)*"|-?\d+(?:\.\d+)?')
+
+
+def _tokenizar(query):
+    query = re.sub(r'#[^\n]*', '', query)
+    return _TOKENS_GRAPHQL.findall(query)
+
+
+def _valor(token, variaveis):
+    if token.startswith('$'):
+        return variaveis.get(token[1:])
+    if token.startswith('"'):
+        return json.loads(token)
+    if re.fullmatch(r'-?\d+', token):
+        return int(token)
+    return token
+
+
+def _argumentos(tokens, pos, variaveis):
+    args = {}
+    pos += 1
+    while tokens[pos] != ')':
+        if tokens[pos] == ',':
+            pos += 1
+            continue
+        chave = tokens[pos]
+        pos += 2
+        if tokens[pos] in ('{', '['):
+            # Objetos de entrada (orderBy etc.) nao alteram os dados sinteticos
+            profundidade = 0
+            while True:
+                if tokens[pos] in ('{', '['):
+                    profundidade += 1
+                elif tokens[pos] in ('}', ']'):
+                    profundidade -= 1
+                pos += 1
+                if profundidade == 0:
+                    break
+            args[chave] = None
+        else:
+            args[chave] = _valor(tokens[pos], variaveis)
+            pos += 1
+    return args, pos + 1
+
+
+def _selecao(tokens, pos, variaveis):
+    campos = []
+    pos += 1
+    while tokens[pos] != '}':
+        if tokens[pos] == ',':
+            pos += 1
+            continue
+        if tokens[pos] == '...':
+            pos += 1
+            if tokens[pos] == 'on':
+                pos += 2
+            subcampos, pos = _selecao(tokens, pos, variaveis)
+            campos.extend(subcampos)
+            continue
+        nome = tokens[pos]
+        pos += 1
+        alias = nome
+        if tokens[pos] == ':':
+            nome = tokens[pos + 1]
+            pos += 2
+        args = {}
+        if tokens[pos] == '(':
+            args, pos = _argumentos(tokens, pos, variaveis)
+        subcampos = None
+        if tokens[pos] == '{':
+            subcampos, pos = _selecao(tokens, pos, variaveis)
+        campos.append((alias, nome, args, subcampos))
+    return campos, pos + 1
+
+
+def interpretar_query(query, variaveis=None):
+    """Lista de campos raiz (alias, nome, argumentos, subselecao)."""
+    tokens = _tokenizar(query)
+    pos = 0
+    if tokens[pos] in ('query', 'mutation'):
+        pos += 1
+        if tokens[pos] not in ('{', '('):
+            pos += 1
+        if tokens[pos] == '(':
+            profundidade = 0
+            while True:
+                profundidade += tokens[pos] == '('
+                profundidade -= tokens[pos] == ')'
+                pos += 1
+                if profundidade == 0:
+                    break
+    campos, _ = _selecao(tokens, pos, variaveis or {})
+    return campos
+
+
+def projetar(valor, selecao):
+    if selecao is None or valor is None:
+        return valor
+    if isinstance(valor, list):
+        return [projetar(item, selecao) for item in valor]
+    resultado = {}
+    for alias, nome, args, subcampos in selecao:
+        campo = valor.get(nome)
+        if callable(campo):
+            campo = campo(args)
+        resultado[alias] = projetar(campo, subcampos)
+    return resultado
+
+
+def _contar_itens(valor):
+    if isinstance(valor, list):
+        return len(valor) + sum(_contar_itens(v) for v in valor)
+    if isinstance(valor, dict):
+        return sum(_contar_itens(v) for v in valor.values())
+    return 0
+
+
+# ---------------------------------------------------------------------------
+# Rate limit
+# ---------------------------------------------------------------------------
+
+class ControleRateLimit:
+
+    def __init__(self, limite=LIMITE_RATE_LIMIT, janela=JANELA_RATE_LIMIT):
+        self.limite = limite
+        self.janela = janela
+        self._janelas = {}
+        self._lock = threading.Lock()
+
+    def consumir(self, token, custo=1):
+        """(permitido, restante, reset_epoch, usado)"""
+        with self._lock:
+            agora = time.time()
+            reset, usado = self._janelas.get(token, (agora + self.janela, 0))
+            if reset <= agora:
+                reset, usado = agora + self.janela, 0
+            permitido = usado + custo <= self.limite
+            if permitido:
+                usado += custo
+            self._janelas[token] = (reset, usado)
+            return permitido, self.limite - usado, int(reset), usado
+
+
+rate_limit = ControleRateLimit()
+
+
+# ---------------------------------------------------------------------------
+# Persisted queries (APQ): hash sha256 -> documento
+# ---------------------------------------------------------------------------
+
+persisted_queries = {}
+
+
+def resolver_persisted_query(requisicao):
+    """Documento da requisicao; None se so veio um hash desconhecido."""
+    persistida = (requisicao.get('extensions') or {}).get('persistedQuery')
+    if not persistida:
+        return requisicao['query']
+
+    hash_documento = persistida['sha256Hash']
+    if 'query' not in requisicao:
+        return persisted_queries.get(hash_documento)
+
+    if hashlib.sha256(requisicao['query'].encode('utf-8')).hexdigest() != hash_documento:
+        raise ValueError("hash nao corresponde ao documento")
+    persisted_queries[hash_documento] = requisicao['query']
+    return requisicao['query']
+
+
+# ---------------------------------------------------------------------------
+# Servidor HTTP
+# ---------------------------------------------------------------------------
+
+class ManipuladorGitHub(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'GitHubMock/1.0'
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _token(self):
+        return self.headers.get('Authorization', '').removeprefix('Bearer ').removeprefix('token ')
+
+    def _responder(self, status, corpo, api, recurso='core', custo=1, headers=None):
+        dados = json.dumps(corpo).encode('utf-8')
+        headers = dict(headers or {})
+
+        if api == 'rest' and status == 200:
+            etag = f'"{hashlib.sha1(dados).hexdigest()}"'
+            headers.update({'ETag': etag, 'Last-Modified': ULTIMA_MODIFICACAO})
+            if self.headers.get('If-None-Match') == etag:
+                # Como no GitHub, uma revalidacao 304 nao consome rate limit
+                status, corpo, dados, custo = 304, None, b'', 0
+
+        permitido, restante, reset, usado = rate_limit.consumir((self._token(), recurso), custo)
+        if not permitido:
+            status, corpo = 403, {'message': 'API rate limit exceeded',
+                                  'documentation_url': 'https://docs.github.com/rest/overview/rate-limits'}
+            dados = json.dumps(corpo).encode('utf-8')
+
+        time.sleep((sortear(LATENCIAS_MS[api]) + CUSTO_POR_ITEM_MS * _contar_itens(corpo)) / 1000)
+
+        codificacao = self._negociar_codificacao() if dados else None
+        if codificacao == 'br':
+            dados = brotli.compress(dados)
+        elif codificacao == 'gzip':
+            dados = gzip.compress(dados)
+        if codificacao:
+            headers.update({'Content-Encoding': codificacao, 'Vary': 'Accept-Encoding'})
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(dados)))
+        self.send_header('X-RateLimit-Limit', str(rate_limit.limite))
+        self.send_header('X-RateLimit-Remaining', str(restante))
+        self.send_header('X-RateLimit-Reset', str(reset))
+        self.send_header('X-RateLimit-Used', str(usado))
+        self.send_header('X-RateLimit-Resource', recurso)
+        for chave, valor in headers.items():
+            self.send_header(chave, valor)
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _negociar_codificacao(self):
+        aceitas = set()
+        for parte in self.headers.get('Accept-Encoding', '').split(','):
+            nome, _, parametros = parte.strip().partition(';')
+            if parametros.replace(' ', '') not in ('q=0', 'q=0.0'):
+                aceitas.add(nome.strip().lower())
+        if 'br' in aceitas and brotli is not None:
+            return 'br'
+        if 'gzip' in aceitas:
+            return 'gzip'
+        return None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        partes = [p for p in url.path.split('/') if p]
+
+        if partes == ['user']:
+            return self._responder(200, _usuario_rest('mock'), 'rest')
+
+        if len(partes) == 3 and partes[0] == 'users' and partes[2] == 'repos':
+            repos = modelo_repos_usuario(partes[1])
+            if params.get('sort') != 'stars':
+                repos = sorted(repos, key=lambda r: r['name'])
+            pagina, headers = self._pagina([repo_rest(r) for r in repos], params)
+            return self._responder(200, pagina, 'rest', headers=headers)
+
+        if len(partes) == 3 and partes[0] == 'repos':
+            return self._responder(200, repo_rest(modelo_repo(partes[1], partes[2]), detalhado=True), 'rest')
+
+        if len(partes) == 4 and partes[0] == 'repos' and partes[3] == 'issues':
+            owner, name = partes[1], partes[2]
+            issues = [issue_rest(owner, name, i) for i in modelo_issues(owner, name)]
+            if params.get('state', 'open') != 'all':
+                issues = [i for i in issues if i['state'] == params.get('state', 'open')]
+            pagina, headers = self._pagina(issues, params)
+            return self._responder(200, pagina, 'rest', headers=headers)
+
+        self._responder(404, {'message': 'Not Found'}, 'rest')
+
+    def _pagina(self, itens, params):
+        """Fatia de `itens` e o header Link (next/last/first/prev) como no GitHub"""
+        por_pagina = min(int(params.get('per_page', 30)), 100)
+        pagina = int(params.get('page', 1))
+        ultima = max(1, -(-len(itens) // por_pagina))
+        base = f"http://{self.headers.get('Host', f'{HOST}:{PORTA}')}{urlparse(self.path).path}"
+
+        def link(numero, rel):
+            return f'<{base}?{urlencode({**params, "page": numero})}>; rel="{rel}"'
+
+        links = []
+        if pagina < ultima:
+            links += [link(pagina + 1, 'next'), link(ultima, 'last')]
+        if pagina > 1:
+            links += [link(1, 'first'), link(pagina - 1, 'prev')]
+        return itens[(pagina - 1) * por_pagina:pagina * por_pagina], {'Link': ', '.join(links)} if links else {}
+
+    def do_POST(self):
+        if urlparse(self.path).path.rstrip('/') != '/graphql':
+            return self._responder(404, {'message': 'Not Found'}, 'rest')
+
+        tamanho = int(self.headers.get('Content-Length', 0))
+        try:
+            requisicao = json.loads(self.rfile.read(tamanho) or b'{}')
+            query = resolver_persisted_query(requisicao)
+            if query is None:
+                return self._responder(200, {'errors': [{'message': 'PersistedQueryNotFound'}]}, 'graphql',
+                                       recurso='graphql')
+            campos = interpretar_query(query, requisicao.get('variables'))
+        except (ValueError, KeyError, IndexError) as e:
+            return self._responder(200, {'errors': [{'message': f"Query invalida: {e}"}]}, 'graphql',
+                                   recurso='graphql')
+
+        permitido, restante, reset, _ = rate_limit.consumir((self._token(), 'graphql'), 0)
+        data = {}
+        for alias, nome, args, subcampos in campos:
+            if nome == 'user':
+                valor = usuario_graphql(args.get('login'))
+            elif nome == 'repository':
+                valor = repo_graphql(modelo_repo(args.get('owner'), args.get('name')))
+            elif nome == 'viewer':
+                valor = {'login': 'mock'}
+            elif nome == 'rateLimit':
+                valor = {'cost': 1, 'limit': rate_limit.limite, 'remaining': max(restante - 1, 0),
+                         'resetAt': datetime.fromtimestamp(reset, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                         'used': rate_limit.limite - restante + 1}
+            else:
+                valor = None
+            data[alias] = projetar(valor, subcampos)
+
+        self._responder(200, {'data': data}, 'graphql', recurso='graphql')
+
+
+def iniciar_servidor(host=HOST, porta=PORTA):
+    """Sobe o servidor numa thread e devolve a instancia (porta 0 = porta livre)."""
+    servidor = ThreadingHTTPServer((host, porta), ManipuladorGitHub)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def main():
+    servidor = ThreadingHTTPServer((HOST, PORTA), ManipuladorGitHub)
+    servidor.daemon_threads = True
+    print(f"Servidor mock do GitHub em http://{HOST}:{PORTA}")
+    print(f"Latencias (ms): {LATENCIAS_MS} | custo por item: {CUSTO_POR_ITEM_MS} ms")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
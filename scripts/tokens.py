@@ -0,0 +1,154 @@
+"""
+Pool de tokens do GitHub com orcamento por token, verificacao de saude e
+validacao concorrente
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Orcamento assumido enquanto a API ainda nao informou o restante de um token
+ORCAMENTO_PADRAO = 5000
+
+
+class PoolTokens:
+    """Entrega a cada requisicao o token com mais folga de rate limit.
+
+    Todo o estado e protegido por um lock, entao o pool pode ser usado a partir
+    de threads ou de tasks asyncio (nenhuma operacao espera com o lock preso).
+    """
+
+    def __init__(self, tokens, extrair, max_falhas=3, quarentena=60):
+        self._extrair = extrair
+        self.max_falhas = max_falhas
+        self.quarentena = quarentena
+        self._lock = threading.Lock()
+        self.estados = {
+            token: {
+                'valido': True,
+                'restante': ORCAMENTO_PADRAO,
+                'reset': 0.0,
+                'falhas': 0,
+                'suspenso_ate': 0.0,
+                'requisicoes': 0
+            }
+            for token in tokens
+        }
+
+    def _disponiveis(self, agora):
+        return [
+            (token, estado) for token, estado in self.estados.items()
+            if estado['valido'] and estado['suspenso_ate'] <= agora
+        ]
+
+    @staticmethod
+    def _folga(estado, agora):
+        # Depois do reset a janela foi renovada, mesmo sem resposta nova
+        if estado['reset'] and estado['reset'] <= agora:
+            return ORCAMENTO_PADRAO
+        return estado['restante']
+
+    def validar(self, checar):
+        """Valida todos os tokens em paralelo.
+
+        `checar(token)` devolve (valido, response). Tokens invalidos deixam de
+        ser entregues; a resposta dos validos ja inicializa o orcamento.
+        """
+        tokens = list(self.estados)
+        with ThreadPoolExecutor(max_workers=max(1, len(tokens))) as executor:
+            resultados = list(executor.map(self._checar_seguro(checar), tokens))
+
+        for token, (valido, response) in zip(tokens, resultados):
+            with self._lock:
+                self.estados[token]['valido'] = valido
+            if valido and response is not None:
+                self.registrar_resposta(response)
+
+        return sum(1 for valido, _ in resultados if valido)
+
+    @staticmethod
+    def _checar_seguro(checar):
+        def _checar(token):
+            try:
+                return checar(token)
+            except Exception:
+                return False, None
+        return _checar
+
+    def obter(self):
+        """Token valido com maior folga; o custo e descontado de forma otimista."""
+        with self._lock:
+            agora = time.time()
+            candidatos = self._disponiveis(agora) or [
+                (token, estado) for token, estado in self.estados.items() if estado['valido']
+            ]
+            if not candidatos:
+                raise RuntimeError("Nenhum token valido disponivel")
+
+            token, estado = max(candidatos, key=lambda item: self._folga(item[1], agora))
+            if estado['reset'] and estado['reset'] <= agora:
+                estado['restante'] = ORCAMENTO_PADRAO
+                estado['reset'] = 0.0
+            estado['restante'] -= 1
+            estado['requisicoes'] += 1
+            return token
+
+    def registrar_resposta(self, response):
+        """Atualiza orcamento e saude do token usado na resposta."""
+        token = response.request.headers.get('Authorization', '').removeprefix('Bearer ')
+        info = self._extrair(response)
+
+        with self._lock:
+            estado = self.estados.get(token)
+            if estado is None:
+                return
+
+            if info is not None:
+                restante, reset, _ = info
+                if reset > estado['reset']:
+                    # Janela nova: vale o valor informado pela API
+                    estado['restante'] = restante
+                else:
+                    # Mesma janela: respostas de requisicoes mais antigas podem
+                    # chegar depois e nao devem devolver orcamento ja gasto
+                    estado['restante'] = min(estado['restante'], restante)
+                estado['reset'] = reset
+
+            if response.status_code == 401:
+                estado['valido'] = False
+            elif response.status_code in (403, 429):
+                estado['falhas'] += 1
+                retry_after = response.headers.get('Retry-After')
+                if retry_after is not None:
+                    estado['suspenso_ate'] = time.time() + float(retry_after)
+                elif info is not None and info[0] == 0:
+                    estado['suspenso_ate'] = info[1] + 1
+            elif response.status_code >= 500:
+                estado['falhas'] += 1
+            else:
+                estado['falhas'] = 0
+
+            if estado['falhas'] >= self.max_falhas:
+                estado['suspenso_ate'] = max(estado['suspenso_ate'], time.time() + self.quarentena)
+                estado['falhas'] = 0
+
+    def melhor_folga(self):
+        """(folga do melhor token disponivel, instante em que algum token volta a ter orcamento)"""
+        with self._lock:
+            agora = time.time()
+            disponiveis = self._disponiveis(agora)
+            folga = max((self._folga(estado, agora) for _, estado in disponiveis), default=0)
+
+            retornos = [
+                max(estado['reset'], estado['suspenso_ate'])
+                for estado in self.estados.values()
+                if estado['valido'] and max(estado['reset'], estado['suspenso_ate']) > agora
+            ]
+            return folga, min(retornos, default=agora)
+
+    def resumo(self):
+        with self._lock:
+            return [
+                (f"...{token[-4:]}", estado['valido'], estado['restante'], estado['requisicoes'])
+                for token, estado in self.estados.items()
+            ]
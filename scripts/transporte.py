@@ -0,0 +1,346 @@
+"""
+Criacao das sessoes HTTP usadas pelos coletores (modo cold ou warm),
+rastreamento das fases de cada requisicao (DNS, conexao, TLS, TTFB, download)
+e custo de decodificacao do JSON no cliente
+
+Todos os tempos vem de time.perf_counter_ns: monotonico (imune a ajustes do
+relogio por NTP) e com a maior resolucao disponivel no sistema.
+"""
+
+import asyncio
+import contextvars
+import json
+import socket
+import sys
+import time
+from contextlib import contextmanager
+
+import httpx
+
+# cold: nova conexao TCP+TLS a cada requisicao (handshake dentro do tempo medido)
+# warm: conexoes persistentes reaproveitadas a partir de um pool (keep-alive)
+MODOS_CONEXAO = ('cold', 'warm')
+
+FASES = ('dns_ms', 'conexao_ms', 'tls_ms', 'ttfb_ms', 'download_ms')
+
+# Versoes de protocolo; em http2 o httpx negocia via ALPN (TLS) e cai para
+# HTTP/1.1 se o servidor nao suportar. Com o pool warm, requisicoes
+# concorrentes ao mesmo host sao multiplexadas numa unica conexao
+PROTOCOLOS = ('http1', 'http2')
+
+# Accept-Encoding forcado nas requisicoes; None mantem o padrao do httpx
+# (todas as codificacoes que ele sabe decodificar)
+COMPRESSOES = ('identity', 'gzip', 'br')
+
+# Eventos de trace do httpcore (sem o prefixo connection./http11./http2.)
+# que abrem e fecham cada fase
+_EVENTOS_FASES = {
+    'connect_tcp': 'conexao_ms',
+    'start_tls': 'tls_ms',
+    'receive_response_body': 'download_ms',
+}
+
+# Decodificadores de JSON para medir o custo de parsing no cliente; 'orjson'
+# requer o pacote orjson
+DECODIFICADORES_JSON = ('json', 'orjson')
+
+_rastreador_atual = contextvars.ContextVar('rastreador_fases', default=None)
+
+# Falso quando o backend de rede do httpcore nao pode ser envolvido (versao
+# diferente): dns_ms fica vazio e a resolucao entra em conexao_ms
+_dns_separado = True
+
+
+def ms_desde(inicio_ns):
+    """Milissegundos decorridos desde `inicio_ns` (time.perf_counter_ns())"""
+    return (time.perf_counter_ns() - inicio_ns) / 1e6
+
+
+class RastreadorFases:
+    """Acumula a duracao de cada fase das requisicoes feitas no contexto atual.
+
+    Com retries, as fases de todas as tentativas sao somadas, assim como o
+    tempo_resposta_ms total.
+    """
+
+    def __init__(self):
+        self.fases = dict.fromkeys(FASES, 0.0)
+        self._inicios = {}
+
+    def _acumular(self, fase, inicio):
+        self.fases[fase] += ms_desde(inicio)
+
+    def evento(self, nome):
+        nome = nome.split('.', 1)[1]
+        agora = time.perf_counter_ns()
+        etapa, _, momento = nome.rpartition('.')
+
+        if etapa in _EVENTOS_FASES:
+            if momento == 'started':
+                self._inicios[etapa] = agora
+            elif momento == 'complete' and etapa in self._inicios:
+                self._acumular(_EVENTOS_FASES[etapa], self._inicios.pop(etapa))
+        # TTFB: do envio dos headers ate o fim da leitura dos headers da resposta
+        elif etapa == 'send_request_headers' and momento == 'started':
+            self._inicios['ttfb'] = agora
+        elif etapa == 'receive_response_headers' and momento == 'complete' and 'ttfb' in self._inicios:
+            self._acumular('ttfb_ms', self._inicios.pop('ttfb'))
+
+    def registrar_dns(self, inicio):
+        self._acumular('dns_ms', inicio)
+        # connect_tcp engloba a resolucao de nomes; desconta para nao contar duas vezes
+        self.fases['conexao_ms'] -= ms_desde(inicio)
+
+    def resultado(self):
+        return {fase: None if fase == 'dns_ms' and not _dns_separado else round(valor, 2)
+                for fase, valor in self.fases.items()}
+
+
+def rastreador_atual():
+    """Rastreador de fases do contexto atual (None fora de medir_fases)"""
+    return _rastreador_atual.get()
+
+
+@contextmanager
+def medir_fases():
+    rastreador = RastreadorFases()
+    token = _rastreador_atual.set(rastreador)
+    try:
+        yield rastreador
+    finally:
+        _rastreador_atual.reset(token)
+
+
+def tamanho_requisicao(response):
+    """Bytes da requisicao HTTP/1.x enviada (linha inicial, headers e corpo),
+    na versao que a resposta informa; None em HTTP/2, onde os headers vao
+    comprimidos com HPACK e o enquadramento de texto nao vale"""
+    if not response.http_version.startswith('HTTP/1'):
+        return None
+    request = response.request
+    tamanho = len(request.method) + len(request.url.raw_path) + len(response.http_version) + 4
+    tamanho += sum(len(nome) + len(valor) + 4 for nome, valor in request.headers.raw)
+    return tamanho + 2 + len(request.content)
+
+
+def tamanho_requisicao_kb(response, partes=1):
+    """tamanho_requisicao em KB, dividido entre `partes` consultas (lotes)"""
+    tamanho = tamanho_requisicao(response)
+    return None if tamanho is None else round(tamanho / 1024 / partes, 3)
+
+
+def tamanho_cabecalhos(response):
+    """Bytes da linha de status e dos headers da resposta, como em HTTP/1.1
+    (em HTTP/2 os headers vao comprimidos com HPACK; o valor e uma estimativa)"""
+    linha = len(response.http_version) + len(str(response.status_code)) + len(response.reason_phrase) + 4
+    return linha + sum(len(nome) + len(valor) + 4 for nome, valor in response.headers.raw) + 2
+
+
+def tamanhos_resposta(response):
+    """Corpo decodificado, corpo no fio (comprimido), headers e codificacao negociada"""
+    return {
+        'tamanho_resposta_kb': round(len(response.content) / 1024, 2),
+        'tamanho_fio_kb': round(response.num_bytes_downloaded / 1024, 2),
+        'tamanho_cabecalhos_kb': round(tamanho_cabecalhos(response) / 1024, 3),
+        'content_encoding': response.headers.get('Content-Encoding', 'identity'),
+        'protocolo': response.http_version,
+    }
+
+
+def funcao_decodificar(decodificador):
+    if decodificador not in DECODIFICADORES_JSON:
+        raise ValueError(f"Decodificador JSON invalido: {decodificador} (use {' ou '.join(DECODIFICADORES_JSON)})")
+    if decodificador == 'orjson':
+        try:
+            import orjson
+        except ImportError:
+            raise RuntimeError("Decodificador 'orjson' requer o pacote orjson")
+        return orjson.loads
+    return json.loads
+
+
+def tamanho_objeto(objeto):
+    """Bytes ocupados pelo objeto decodificado e tudo o que ele referencia
+    (sys.getsizeof recursivo; objetos compartilhados contam uma vez)"""
+    vistos = set()
+    pilha = [objeto]
+    total = 0
+    while pilha:
+        atual = pilha.pop()
+        if id(atual) in vistos:
+            continue
+        vistos.add(id(atual))
+        total += sys.getsizeof(atual)
+        if isinstance(atual, dict):
+            pilha.extend(atual.keys())
+            pilha.extend(atual.values())
+        elif isinstance(atual, list):
+            pilha.extend(atual)
+    return total
+
+
+def medir_decodificacao(response, decodificador='json'):
+    """Tempo de decodificar o corpo (ja baixado) em objetos Python e memoria
+    do resultado; colunas vazias para corpos vazios (304) ou que nao sao JSON"""
+    loads = funcao_decodificar(decodificador)
+    if not response.content:
+        return {'decodificacao_ms': None, 'memoria_objeto_kb': None, 'decodificador_json': decodificador}
+
+    inicio = time.perf_counter_ns()
+    try:
+        objeto = loads(response.content)
+    except ValueError:
+        return {'decodificacao_ms': None, 'memoria_objeto_kb': None, 'decodificador_json': decodificador}
+    decodificacao_ms = ms_desde(inicio)
+
+    return {
+        'decodificacao_ms': round(decodificacao_ms, 3),
+        'memoria_objeto_kb': round(tamanho_objeto(objeto) / 1024, 2),
+        'decodificador_json': decodificador
+    }
+
+
+def _trace(nome, info):
+    rastreador = _rastreador_atual.get()
+    if rastreador is not None:
+        rastreador.evento(nome)
+
+
+async def _trace_async(nome, info):
+    _trace(nome, info)
+
+
+def _instalar_trace(request):
+    request.extensions['trace'] = _trace
+
+
+async def _instalar_trace_async(request):
+    request.extensions['trace'] = _trace_async
+
+
+class _BackendComDNS:
+    """Backend de rede do httpcore que resolve o host antes de conectar,
+    separando o tempo de DNS do tempo de conexao TCP."""
+
+    def __init__(self, backend):
+        self._backend = backend
+
+    def connect_tcp(self, host, port, **kwargs):
+        inicio = time.perf_counter_ns()
+        endereco = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0][4][0]
+        rastreador = _rastreador_atual.get()
+        if rastreador is not None:
+            rastreador.registrar_dns(inicio)
+        return self._backend.connect_tcp(endereco, port, **kwargs)
+
+    def __getattr__(self, nome):
+        return getattr(self._backend, nome)
+
+
+class _BackendComDNSAsync(_BackendComDNS):
+
+    async def connect_tcp(self, host, port, **kwargs):
+        inicio = time.perf_counter_ns()
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        rastreador = _rastreador_atual.get()
+        if rastreador is not None:
+            rastreador.registrar_dns(inicio)
+        return await self._backend.connect_tcp(infos[0][4][0], port, **kwargs)
+
+
+def _validar_modo(modo):
+    if modo not in MODOS_CONEXAO:
+        raise ValueError(f"Modo de conexao invalido: {modo} (use {' ou '.join(MODOS_CONEXAO)})")
+
+
+def _limites(modo, tamanho_pool, keepalive_expiry):
+    if modo == 'cold':
+        return httpx.Limits(max_connections=tamanho_pool, max_keepalive_connections=0)
+    return httpx.Limits(
+        max_connections=tamanho_pool,
+        max_keepalive_connections=tamanho_pool,
+        keepalive_expiry=keepalive_expiry
+    )
+
+
+def _envolver_backend(client, classe_backend):
+    # O httpx nao expoe o backend de rede; o pool do httpcore guarda a
+    # referencia usada para abrir cada conexao nova. Atributos privados,
+    # testados com httpx 0.28.1 / httpcore 1.0.9: em outras versoes a coleta
+    # segue sem separar o DNS
+    global _dns_separado
+
+    pool = getattr(getattr(client, '_transport', None), '_pool', None)
+    if getattr(pool, '_network_backend', None) is None:
+        if _dns_separado:
+            print("AVISO: backend de rede do httpcore inacessivel; dns_ms ficara vazio")
+        _dns_separado = False
+        return client
+    pool._network_backend = classe_backend(pool._network_backend)
+    return client
+
+
+def _usar_http2(protocolo):
+    if protocolo not in PROTOCOLOS:
+        raise ValueError(f"Protocolo invalido: {protocolo} (use {' ou '.join(PROTOCOLOS)})")
+    if protocolo == 'http2':
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            raise RuntimeError("Protocolo 'http2' requer o pacote h2 (pip install httpx[http2])")
+    return protocolo == 'http2'
+
+
+def _cabecalhos_compressao(compressao):
+    if compressao is None:
+        return {}
+    if compressao not in COMPRESSOES:
+        raise ValueError(f"Compressao invalida: {compressao} (use {', '.join(COMPRESSOES)} ou None)")
+    if compressao == 'br':
+        try:
+            import brotli  # noqa: F401 (o httpx so decodifica br com o pacote instalado)
+        except ImportError:
+            try:
+                import brotlicffi  # noqa: F401
+            except ImportError:
+                raise RuntimeError("Compressao 'br' requer o pacote brotli ou brotlicffi")
+    return {'Accept-Encoding': compressao}
+
+
+def criar_sessao(modo='cold', tamanho_pool=10, keepalive_expiry=30, timeout=30, compressao=None, protocolo='http1',
+                 cassete=None, **kwargs):
+    """Cliente httpx para a coleta sincrona; com `cassete` (cassete.Cassete)
+    as respostas sao gravadas ou reproduzidas sem rede."""
+    _validar_modo(modo)
+
+    client = httpx.Client(
+        limits=_limites(modo, tamanho_pool, keepalive_expiry),
+        timeout=timeout,
+        headers=_cabecalhos_compressao(compressao),
+        http2=_usar_http2(protocolo),
+        event_hooks={'request': [_instalar_trace]},
+        **kwargs
+    )
+    _envolver_backend(client, _BackendComDNS)
+    if cassete is not None:
+        client._transport = cassete.transporte(client._transport)
+    return client
+
+
+def criar_cliente_async(modo='cold', tamanho_pool=10, keepalive_expiry=30, timeout=30, compressao=None, protocolo='http1',
+                        cassete=None, **kwargs):
+    """Cliente httpx para a coleta assincrona (`cassete` como em criar_sessao)."""
+    _validar_modo(modo)
+
+    client = httpx.AsyncClient(
+        limits=_limites(modo, tamanho_pool, keepalive_expiry),
+        timeout=timeout,
+        headers=_cabecalhos_compressao(compressao),
+        http2=_usar_http2(protocolo),
+        event_hooks={'request': [_instalar_trace_async]},
+        **kwargs
+    )
+    _envolver_backend(client, _BackendComDNSAsync)
+    if cassete is not None:
+        client._transport = cassete.transporte_async(client._transport)
+    return client
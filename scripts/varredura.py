@@ -0,0 +1,106 @@
+"""
+Varredura paginada: percorre todas as paginas de uma colecao seguindo o
+cursor de cada backend (Link rel="next" no REST, pageInfo.endCursor no
+GraphQL), medindo cada pagina e o tempo acumulado da varredura
+"""
+
+import asyncio
+import random
+import time
+
+from transporte import criar_cliente_async, medir_fases, ms_desde
+
+
+async def _buscar(client, enviar, backend, montar):
+    # A espera pelo orcamento de rate limit fica fora do tempo medido
+    await backend.agendador.aguardar_async()
+    with medir_fases() as rastreador:
+        inicio = time.perf_counter_ns()
+        response = await enviar(client, backend, montar)
+        tempo_resposta_ms = ms_desde(inicio)
+    backend.agendador.observar(response)
+    return response, tempo_resposta_ms, rastreador.resultado()
+
+
+async def _varrer(client, id_varredura, varredura, backend, enviar, registrar, tamanho_pagina, prefetch, max_paginas):
+    _, _, func_name, user, repo, _ = varredura
+    inicio = time.perf_counter_ns()
+
+    async def pagina(numero, cursor, janela):
+        montar = lambda: backend.montar_requisicao_pagina(func_name, user, repo, tamanho_pagina, cursor)
+        response, tempo_resposta_ms, fases = await _buscar(client, enviar, backend, montar)
+        registrar(id_varredura, varredura, numero, {
+            'itens': backend.itens_pagina(func_name, response),
+            'janela_prefetch': janela,
+            'tempo_resposta_ms': tempo_resposta_ms,
+            'tempo_acumulado_ms': ms_desde(inicio)
+        }, response, fases)
+        return response
+
+    response = await pagina(1, None, 1)
+
+    # Paginacao previsivel (numeros de pagina): ate `prefetch` paginas em voo
+    seguintes = []
+    if prefetch > 1 and hasattr(backend, 'paginas_seguintes'):
+        seguintes = backend.paginas_seguintes(func_name, response)
+    if seguintes:
+        if max_paginas:
+            seguintes = seguintes[:max_paginas - 1]
+        limite = asyncio.Semaphore(prefetch)
+
+        async def limitada(numero, cursor):
+            async with limite:
+                await pagina(numero, cursor, prefetch)
+
+        await asyncio.gather(*(limitada(numero, cursor) for numero, cursor in enumerate(seguintes, start=2)))
+        return
+
+    numero, cursor = 1, backend.proxima_pagina(func_name, response)
+    while cursor and not (max_paginas and numero >= max_paginas):
+        numero += 1
+        response = await pagina(numero, cursor, 1)
+        cursor = backend.proxima_pagina(func_name, response)
+
+
+async def _executar_varreduras(varreduras, obter_backend, enviar, registrar, tamanho_pagina, prefetch, max_paginas,
+                               pausa, opcoes_cliente):
+    async with criar_cliente_async(**opcoes_cliente) as client:
+        # Uma varredura por vez: o paralelismo medido e so o do prefetch
+        for id_varredura, varredura in enumerate(varreduras, start=1):
+            backend = obter_backend(varredura)
+            try:
+                await _varrer(client, id_varredura, varredura, backend, enviar, registrar,
+                              tamanho_pagina, prefetch, max_paginas)
+            except Exception as e:
+                print(f"   Falha na varredura {varredura}: {e}")
+
+            # Ritmo fixo: pausa entre varreduras, nunca entre paginas (entraria no tempo acumulado)
+            if not backend.agendador.adaptativo and pausa and pausa[1] > 0:
+                await asyncio.sleep(random.uniform(*pausa))
+
+
+def executar_varreduras(varreduras, obter_backend, enviar, registrar, tamanho_pagina=100, prefetch=1,
+                        max_paginas=None, pausa=(0, 0), timeout=30, modo_conexao='warm', tamanho_pool=10,
+                        keepalive_expiry=30, compressao=None, protocolo='http1', cassete=None):
+    """Varre cada (tipo_api, consulta, func_name, user, repo, repeticao) ate a ultima pagina.
+
+    O backend expoe montar_requisicao_pagina(func_name, user, repo,
+    tamanho_pagina, cursor), proxima_pagina(func_name, response) e
+    itens_pagina(func_name, response), e opcionalmente
+    paginas_seguintes(func_name, response) quando as paginas restantes podem
+    ser previstas pela primeira. `enviar(client, backend, montar)` devolve a
+    resposta (com retries); `registrar(id_varredura, varredura, pagina,
+    medidas, response, fases)` recebe itens, janela_prefetch,
+    tempo_resposta_ms e tempo_acumulado_ms (desde o inicio da varredura).
+    """
+    opcoes_cliente = {
+        'modo': modo_conexao,
+        'tamanho_pool': tamanho_pool,
+        'keepalive_expiry': keepalive_expiry,
+        'timeout': timeout,
+        'compressao': compressao,
+        'protocolo': protocolo,
+        'cassete': cassete
+    }
+    asyncio.run(_executar_varreduras(varreduras, obter_backend, enviar, registrar, tamanho_pagina, prefetch,
+                                     max_paginas, pausa, opcoes_cliente))